@@ -2,10 +2,27 @@
 JAC-V1 Architecture Diagrams Generator
 Run: pip install diagrams && python generate-all-diagrams.py
 Output: 4 PNG files in current directory
+
+Each diagram is a separate function rendered in its own process. The hash of a
+diagram's definition is stored in its PNG, and diagrams whose definition has not
+changed since the PNG was rendered are skipped.
+
+Usage:
+  python generate-all-diagrams.py                 # render changed diagrams
+  python generate-all-diagrams.py phase-03        # render only the matching diagram(s)
+  python generate-all-diagrams.py --force         # render everything again
+  python generate-all-diagrams.py --list          # show each diagram and whether it is up to date
 """
 
+import argparse
+import hashlib
+import inspect
 import os
+import struct
 import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.metadata import PackageNotFoundError, version
 
 # Add Graphviz to PATH on Windows
 graphviz_path = r"C:\Program Files\Graphviz\bin"
@@ -20,149 +37,294 @@ from diagrams.onprem.database import MongoDB
 from diagrams.aws.ml import Bedrock
 from diagrams.programming.flowchart import Action, Decision, StartEnd, InputOutput
 
+# Diagram name (PNG file name without extension) -> function drawing it
+DIAGRAMS = {}
+
+# PNG text chunk keyword holding the definition hash
+HASH_KEYWORD = b"jac-diagram-hash"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def diagram(name):
+    """Register a function that draws one diagram into `filename` (without extension)"""
+    def register(function):
+        DIAGRAMS[name] = function
+        return function
+    return register
+
+
+def definition_hash(name):
+    """Hash a diagram's source code together with the diagrams package version"""
+    try:
+        diagrams_version = version("diagrams")
+    except PackageNotFoundError:
+        diagrams_version = "unknown"
+    source = inspect.getsource(DIAGRAMS[name])
+    return hashlib.sha256(f"{diagrams_version}\n{source}".encode("utf-8")).hexdigest()
+
+
+def _png_chunks(data):
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        yield kind, data[offset + 8:offset + 8 + length], data[offset:offset + 12 + length]
+        offset += 12 + length
+
+
+def read_png_hash(path):
+    """Return the definition hash stored in a PNG, or None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    for kind, content, _ in _png_chunks(data):
+        if kind == b"tEXt" and content.startswith(HASH_KEYWORD + b"\0"):
+            return content[len(HASH_KEYWORD) + 1:].decode("latin-1")
+    return None
+
+
+def write_png_hash(path, value):
+    """Store a definition hash in a PNG as a tEXt chunk (replacing an older one)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    content = HASH_KEYWORD + b"\0" + value.encode("latin-1")
+    chunk = struct.pack(">I4s", len(content), b"tEXt") + content
+    chunk += struct.pack(">I", zlib.crc32(b"tEXt" + content) & 0xFFFFFFFF)
+    parts = [PNG_SIGNATURE]
+    for kind, content_, raw in _png_chunks(data):
+        if kind == b"tEXt" and content_.startswith(HASH_KEYWORD + b"\0"):
+            continue
+        if kind == b"IEND":
+            parts.append(chunk)
+        parts.append(raw)
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(temp, path)
+
+
+def render(name, output_dir):
+    """Render one diagram and stamp its definition hash into the PNG (runs in a worker process)"""
+    filename = os.path.join(output_dir, name)
+    DIAGRAMS[name](filename)
+    write_png_hash(filename + ".png", definition_hash(name))
+    return name
+
+
 # Phase 1: System Architecture
-with Diagram("JAC-V1 System Architecture", show=False, direction="LR", filename="phase-01-system-architecture"):
-    user = User("User")
+@diagram("phase-01-system-architecture")
+def phase_01_system_architecture(filename):
+    with Diagram("JAC-V1 System Architecture", show=False, direction="LR", filename=filename):
+        user = User("User")
 
-    with Cluster("Frontend (Next.js 15)"):
-        nextjs = NextJs("Next.js App")
-        components = React("UI Components")
-        threejs = React("Three.js 3D")
+        with Cluster("Frontend (Next.js 15)"):
+            nextjs = NextJs("Next.js App")
+            components = React("UI Components")
+            threejs = React("Three.js 3D")
 
-    with Cluster("API Layer"):
-        api_form = NodeJS("/api/form-submission")
-        api_chat = NodeJS("/api/chat")
-        api_projects = NodeJS("/api/projects")
+        with Cluster("API Layer"):
+            api_form = NodeJS("/api/form-submission")
+            api_chat = NodeJS("/api/chat")
+            api_projects = NodeJS("/api/projects")
 
-    with Cluster("Business Logic"):
-        flow_engine = TypeScript("FlowEngine")
-        zod = TypeScript("Zod Validator")
-        evaluator = TypeScript("Conditional Evaluator")
+        with Cluster("Business Logic"):
+            flow_engine = TypeScript("FlowEngine")
+            zod = TypeScript("Zod Validator")
+            evaluator = TypeScript("Conditional Evaluator")
 
-    with Cluster("Data Layer"):
-        mongo_projects = MongoDB("projects")
-        mongo_items = MongoDB("items")
-        mongo_forms = MongoDB("form_submissions")
+        with Cluster("Data Layer"):
+            mongo_projects = MongoDB("projects")
+            mongo_items = MongoDB("items")
+            mongo_forms = MongoDB("form_submissions")
 
-    claude = Bedrock("Claude API")
+        claude = Bedrock("Claude API")
 
-    user >> Edge(label="browse") >> nextjs
-    nextjs >> components
-    components >> threejs
+        user >> Edge(label="browse") >> nextjs
+        nextjs >> components
+        components >> threejs
 
-    components >> Edge(label="fetch") >> api_form
-    components >> Edge(label="chat") >> api_chat
-    components >> Edge(label="GET") >> api_projects
+        components >> Edge(label="fetch") >> api_form
+        components >> Edge(label="chat") >> api_chat
+        components >> Edge(label="GET") >> api_projects
 
-    api_form >> Edge(label="validate") >> zod
-    zod >> Edge(label="execute") >> flow_engine
-    flow_engine >> Edge(label="evaluate") >> evaluator
+        api_form >> Edge(label="validate") >> zod
+        zod >> Edge(label="execute") >> flow_engine
+        flow_engine >> Edge(label="evaluate") >> evaluator
 
-    api_form >> Edge(label="save") >> mongo_forms
-    api_projects >> Edge(label="query") >> mongo_projects
-    flow_engine >> Edge(label="reference") >> mongo_items
+        api_form >> Edge(label="save") >> mongo_forms
+        api_projects >> Edge(label="query") >> mongo_projects
+        flow_engine >> Edge(label="reference") >> mongo_items
 
-    api_chat >> Edge(label="prompt") >> claude
-    claude >> Edge(label="response") >> api_chat
+        api_chat >> Edge(label="prompt") >> claude
+        claude >> Edge(label="response") >> api_chat
 
-print("[OK] Phase 1: System Architecture generated")
 
 # Phase 2: Database Schema
-with Diagram("JAC-V1 Database Schema", show=False, direction="LR", filename="phase-02-database-schema"):
-    with Cluster("MongoDB Collections"):
-        projects = MongoDB("projects\n_id (PK)\nsalesOrderNumber\njobName")
-        items = MongoDB("items\n_id (PK)\nprojectId (FK)\nitemNumber")
-        forms = MongoDB("form_submissions\nsessionId\nprojectId (FK)\nitemId (FK)\nformData")
+@diagram("phase-02-database-schema")
+def phase_02_database_schema(filename):
+    with Diagram("JAC-V1 Database Schema", show=False, direction="LR", filename=filename):
+        with Cluster("MongoDB Collections"):
+            projects = MongoDB("projects\n_id (PK)\nsalesOrderNumber\njobName")
+            items = MongoDB("items\n_id (PK)\nprojectId (FK)\nitemNumber")
+            forms = MongoDB("form_submissions\nsessionId\nprojectId (FK)\nitemId (FK)\nformData")
 
-    templates = Javascript("Form Templates\n(JSON files)\n57 templates")
+        templates = Javascript("Form Templates\n(JSON files)\n57 templates")
 
-    projects >> Edge(label="1:N", style="bold") >> items
-    projects >> Edge(label="1:N", style="bold") >> forms
-    items >> Edge(label="1:N", style="bold") >> forms
-    forms >> Edge(label="references", style="dashed") >> templates
+        projects >> Edge(label="1:N", style="bold") >> items
+        projects >> Edge(label="1:N", style="bold") >> forms
+        items >> Edge(label="1:N", style="bold") >> forms
+        forms >> Edge(label="references", style="dashed") >> templates
 
-print("[OK] Phase 2: Database Schema generated")
 
 # Phase 3: Form Flow
-with Diagram("JAC-V1 Form Flow Execution", show=False, direction="LR", filename="phase-03-form-flow"):
-    start = StartEnd("Start:\nproject-header")
-
-    with Cluster("Phase 1: Initialization"):
-        load_project = Action("Load Project")
-        check_opening = Decision("OPENING_TYPE?")
-
-    with Cluster("Phase 2: Data Collection"):
-        options_form = InputOutput("Options Form")
-        door_branch = Action("Door Info\n(type=1,3)")
-        frame_branch = Action("Frame Info\n(type=2,3,4)")
-        hardware_check = Decision("Hardware\nEnabled?")
-        hardware_forms = InputOutput("Locks/Hinges/Closers\n(15 forms)")
-
-    with Cluster("Phase 3: Model Building"):
-        build_door = Action("Door Assembly\nModel")
-        build_frame = Action("Frame Assembly\nModel")
-
-    with Cluster("Phase 4: Drawing Generation"):
-        creo_drawing = Action("Creo Drawing\nGeneration")
-
-    with Cluster("Phase 5: Export"):
-        bom_export = Action("BOM Export")
-        smartassembly = Action("SmartAssembly\nData")
-
-    end = StartEnd("End:\nComplete")
-
-    start >> load_project >> check_opening
-    check_opening >> Edge(label="1,3 (door)") >> door_branch
-    check_opening >> Edge(label="2,3,4 (frame)") >> frame_branch
-    door_branch >> options_form
-    frame_branch >> options_form
-    options_form >> hardware_check
-    hardware_check >> Edge(label="yes") >> hardware_forms
-    hardware_check >> Edge(label="no") >> build_door
-    hardware_forms >> build_door
-    build_door >> build_frame
-    build_frame >> creo_drawing
-    creo_drawing >> bom_export
-    bom_export >> smartassembly >> end
-
-print("[OK] Phase 3: Form Flow generated")
+@diagram("phase-03-form-flow")
+def phase_03_form_flow(filename):
+    with Diagram("JAC-V1 Form Flow Execution", show=False, direction="LR", filename=filename):
+        start = StartEnd("Start:\nproject-header")
+
+        with Cluster("Phase 1: Initialization"):
+            load_project = Action("Load Project")
+            check_opening = Decision("OPENING_TYPE?")
+
+        with Cluster("Phase 2: Data Collection"):
+            options_form = InputOutput("Options Form")
+            door_branch = Action("Door Info\n(type=1,3)")
+            frame_branch = Action("Frame Info\n(type=2,3,4)")
+            hardware_check = Decision("Hardware\nEnabled?")
+            hardware_forms = InputOutput("Locks/Hinges/Closers\n(15 forms)")
+
+        with Cluster("Phase 3: Model Building"):
+            build_door = Action("Door Assembly\nModel")
+            build_frame = Action("Frame Assembly\nModel")
+
+        with Cluster("Phase 4: Drawing Generation"):
+            creo_drawing = Action("Creo Drawing\nGeneration")
+
+        with Cluster("Phase 5: Export"):
+            bom_export = Action("BOM Export")
+            smartassembly = Action("SmartAssembly\nData")
+
+        end = StartEnd("End:\nComplete")
+
+        start >> load_project >> check_opening
+        check_opening >> Edge(label="1,3 (door)") >> door_branch
+        check_opening >> Edge(label="2,3,4 (frame)") >> frame_branch
+        door_branch >> options_form
+        frame_branch >> options_form
+        options_form >> hardware_check
+        hardware_check >> Edge(label="yes") >> hardware_forms
+        hardware_check >> Edge(label="no") >> build_door
+        hardware_forms >> build_door
+        build_door >> build_frame
+        build_frame >> creo_drawing
+        creo_drawing >> bom_export
+        bom_export >> smartassembly >> end
+
 
 # Phase 4: Component Relationships
-with Diagram("JAC-V1 Component Relationships", show=False, direction="LR", filename="phase-04-component-relationships"):
-    with Cluster("Flow Orchestration"):
-        claude_chat = React("ClaudeChat.tsx\n(orchestrator)")
-
-    with Cluster("Form Rendering"):
-        form_renderer = React("DynamicFormRenderer.tsx")
-        conditional_eval = TypeScript("Conditional\nEvaluator")
-        zod_builder = TypeScript("Zod Schema\nBuilder")
-
-    with Cluster("State Management"):
-        flow_engine = TypeScript("FlowEngine\n(executor.ts)")
-        safe_eval = TypeScript("safeEval()\n(evaluator.ts)")
-
-    with Cluster("Data Sources"):
-        form_templates = Javascript("Form Templates\n(57 JSON files)")
-        flow_defs = Javascript("Flow Definition\n(SDI-form-flow.json)")
-
-    claude_chat >> Edge(label="load") >> flow_defs
-    claude_chat >> Edge(label="initialize") >> flow_engine
-    flow_engine >> Edge(label="evaluate") >> safe_eval
-    flow_engine >> Edge(label="next step") >> claude_chat
-
-    claude_chat >> Edge(label="render") >> form_renderer
-    form_renderer >> Edge(label="load template") >> form_templates
-    form_renderer >> Edge(label="check visibility") >> conditional_eval
-    conditional_eval >> Edge(label="read state") >> flow_engine
-
-    form_renderer >> Edge(label="submit") >> zod_builder
-    zod_builder >> Edge(label="validate with context") >> flow_engine
-    zod_builder >> Edge(label="success/errors") >> claude_chat
-
-print("[OK] Phase 4: Component Relationships generated")
-print("\n[SUCCESS] All diagrams generated successfully!")
-print("Files created:")
-print("  - phase-01-system-architecture.png")
-print("  - phase-02-database-schema.png")
-print("  - phase-03-form-flow.png")
-print("  - phase-04-component-relationships.png")
+@diagram("phase-04-component-relationships")
+def phase_04_component_relationships(filename):
+    with Diagram("JAC-V1 Component Relationships", show=False, direction="LR", filename=filename):
+        with Cluster("Flow Orchestration"):
+            claude_chat = React("ClaudeChat.tsx\n(orchestrator)")
+
+        with Cluster("Form Rendering"):
+            form_renderer = React("DynamicFormRenderer.tsx")
+            conditional_eval = TypeScript("Conditional\nEvaluator")
+            zod_builder = TypeScript("Zod Schema\nBuilder")
+
+        with Cluster("State Management"):
+            flow_engine = TypeScript("FlowEngine\n(executor.ts)")
+            safe_eval = TypeScript("safeEval()\n(evaluator.ts)")
+
+        with Cluster("Data Sources"):
+            form_templates = Javascript("Form Templates\n(57 JSON files)")
+            flow_defs = Javascript("Flow Definition\n(SDI-form-flow.json)")
+
+        claude_chat >> Edge(label="load") >> flow_defs
+        claude_chat >> Edge(label="initialize") >> flow_engine
+        flow_engine >> Edge(label="evaluate") >> safe_eval
+        flow_engine >> Edge(label="next step") >> claude_chat
+
+        claude_chat >> Edge(label="render") >> form_renderer
+        form_renderer >> Edge(label="load template") >> form_templates
+        form_renderer >> Edge(label="check visibility") >> conditional_eval
+        conditional_eval >> Edge(label="read state") >> flow_engine
+
+        form_renderer >> Edge(label="submit") >> zod_builder
+        zod_builder >> Edge(label="validate with context") >> flow_engine
+        zod_builder >> Edge(label="success/errors") >> claude_chat
+
+
+def select(patterns):
+    """Return the diagram names matching any pattern (all diagrams when none are given)"""
+    if not patterns:
+        return list(DIAGRAMS)
+    selected = [name for name in DIAGRAMS if any(pattern in name for pattern in patterns)]
+    unknown = [pattern for pattern in patterns if not any(pattern in name for name in DIAGRAMS)]
+    if unknown:
+        print(f"ERROR: No diagram matches: {', '.join(unknown)}")
+        print("Available: " + ", ".join(DIAGRAMS))
+        sys.exit(1)
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the JAC-V1 architecture diagrams",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1]
+    )
+    parser.add_argument("diagrams", nargs="*", metavar="NAME",
+                        help="Render only diagrams whose name contains NAME (e.g. phase-03)")
+    parser.add_argument("--force", action="store_true",
+                        help="Render even if the PNG matches the current definition")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Diagrams rendered at once, one process each (default: CPU count)")
+    parser.add_argument("--output-dir", default=".",
+                        help="Directory for the PNG files (default: current directory)")
+    parser.add_argument("--list", action="store_true",
+                        help="List the diagrams and whether their PNG is up to date")
+    args = parser.parse_args()
+
+    names = select(args.diagrams)
+    stale = [name for name in names
+             if args.force or read_png_hash(os.path.join(args.output_dir, name + ".png")) != definition_hash(name)]
+
+    if args.list:
+        for name in names:
+            status = "changed" if name in stale else "up to date"
+            print(f"  {status:<10}  {name}.png")
+        return
+
+    for name in names:
+        if name not in stale:
+            print(f"[SKIP] {name}.png is up to date")
+    if not stale:
+        print("\n[SUCCESS] All diagrams are up to date")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(stale)))) as pool:
+        futures = {pool.submit(render, name, args.output_dir): name for name in stale}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                print(f"[OK] {name}.png generated")
+            except Exception as e:
+                failed.append(name)
+                print(f"[FAILED] {name}.png: {e}")
+
+    if failed:
+        print(f"\n[ERROR] {len(failed)} diagram(s) failed")
+        sys.exit(1)
+    print(f"\n[SUCCESS] {len(stale)} diagram(s) generated")
+
+
+if __name__ == "__main__":
+    main()
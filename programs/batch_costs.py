@@ -0,0 +1,134 @@
+"""
+Conversion cost model for batch ordering
+Predicts how long each file will take so a batch can start the longest files first
+(longest-processing-time scheduling): a large top-level assembly that starts last keeps
+one worker busy long after the others have run out of work.
+
+A file's prediction comes from its own timing in earlier batches when there is one
+(scaled by the change in file size), otherwise from a per-type (part / assembly) linear
+fit of seconds against file size over every timing recorded so far. The history is a
+JSON file in the output directory, updated after every batch.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+from creo_files import parse_creo_name
+
+TIMINGS_NAME = ".keyshot-timings.json"
+
+# Starting point before any timings are recorded: (seconds, seconds per MB)
+DEFAULT_COSTS = {"prt": (5.0, 1.0), "asm": (15.0, 3.0)}
+
+# Weight of the newest timing when a file already has history
+HISTORY_WEIGHT = 0.5
+
+
+def creo_kind(creo_file):
+    """Return "asm" for assemblies and "prt" for parts (and anything unrecognised)"""
+    parsed = parse_creo_name(Path(creo_file).name)
+    return "asm" if parsed and parsed[0].lower().endswith(".asm") else "prt"
+
+
+def _history_key(creo_file):
+    # Timings carry over to the next iteration of the same model
+    creo_file = Path(creo_file)
+    parsed = parse_creo_name(creo_file.name)
+    return str(creo_file.with_name(parsed[0])) if parsed else str(creo_file)
+
+
+def _fit(points, default):
+    # Least-squares line through (MB, seconds); with too little spread the default
+    # slope is scaled to the observed times instead
+    if not points:
+        return default
+    mean_mb = sum(mb for mb, _ in points) / len(points)
+    mean_seconds = sum(seconds for _, seconds in points) / len(points)
+    spread = sum((mb - mean_mb) ** 2 for mb, _ in points)
+    if len(points) >= 3 and spread > 1e-6:
+        slope = sum((mb - mean_mb) * (seconds - mean_seconds) for mb, seconds in points) / spread
+        slope = max(slope, 0.0)
+        return max(mean_seconds - slope * mean_mb, 0.0), slope
+    expected = default[0] + default[1] * mean_mb
+    scale = mean_seconds / expected if expected > 0 else 1.0
+    return default[0] * scale, default[1] * scale
+
+
+class CostModel:
+    """Per-output-directory timing history and the predictions derived from it"""
+
+    def __init__(self, output_dir):
+        """
+        Args:
+            output_dir: Batch output directory (the history lives here)
+        """
+        self.path = Path(output_dir) / TIMINGS_NAME
+        self.history = {}
+        self._lock = threading.Lock()
+        self.load()
+        self.coefficients = self._fit_all()
+
+    def load(self):
+        """Read the history; an unreadable file is treated as empty"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.history = json.load(f)
+        except (OSError, ValueError):
+            self.history = {}
+
+    def _fit_all(self):
+        coefficients = {}
+        for kind, default in DEFAULT_COSTS.items():
+            points = [(entry["size"] / 1e6, entry["seconds"]) for entry in self.history.values()
+                      if entry.get("kind") == kind and entry.get("size")]
+            coefficients[kind] = _fit(points, default)
+        return coefficients
+
+    def predict(self, creo_file):
+        """
+        Estimate the conversion time of one file
+
+        Args:
+            creo_file: Creo file path
+
+        Returns:
+            float: Predicted seconds
+        """
+        try:
+            size = os.path.getsize(creo_file)
+        except OSError:
+            size = 0
+        entry = self.history.get(_history_key(creo_file))
+        if entry and entry.get("size"):
+            return entry["seconds"] * (size / entry["size"] if size else 1.0)
+        base, per_mb = self.coefficients[creo_kind(creo_file)]
+        return base + per_mb * size / 1e6
+
+    def record(self, creo_file, seconds):
+        """
+        Add the measured time of a successful conversion to the history
+
+        Args:
+            creo_file: Creo file path
+            seconds: Conversion time (all variants of the file)
+        """
+        try:
+            size = os.path.getsize(creo_file)
+        except OSError:
+            return
+        key = _history_key(creo_file)
+        with self._lock:
+            entry = self.history.get(key)
+            if entry and entry.get("size") == size:
+                seconds = HISTORY_WEIGHT * seconds + (1 - HISTORY_WEIGHT) * entry["seconds"]
+            self.history[key] = {"kind": creo_kind(creo_file), "size": size, "seconds": round(seconds, 3)}
+
+    def save(self):
+        """Write the history atomically"""
+        with self._lock:
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f, indent=2)
+            os.replace(temp, self.path)
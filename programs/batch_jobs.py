@@ -0,0 +1,192 @@
+"""
+Job lists for batches with per-file settings
+A batch can be given a CSV or JSON-lines file instead of an input directory, listing the
+files to convert from anywhere together with each file's material and quality:
+
+    input,output,material,dpi,samples
+    /vault/doors/door.asm,doors/door.glb,Stainless Steel Brushed Fine 90°,150,32
+    /vault/frames/frame.asm,,Paint Gloss RAL 9016,,
+
+    {"input": "/vault/doors/door.asm", "material": "Steel", "dpi": 300, "variants": "lod"}
+
+Columns (only input is required, empty values use the batch's command line settings):
+    input         Creo file; relative paths are relative to the job list. Without an
+                  iteration the newest iteration on disk is converted
+    output        Output file; relative paths are relative to the batch output directory
+                  (default: <output directory>/<model>.glb)
+    material      Material applied to all geometry
+    material_map  Material mapping file (see material_rules.py)
+    dpi, samples  Texture resolution and baking samples
+    occlusion     true/false
+    compression   true/false (Draco)
+    variants      Quality variants (see export_variants.py)
+
+The list is read one line at a time, so lists of any length need constant memory.
+"""
+
+import csv
+import json
+from pathlib import Path
+
+from creo_files import find_creo_files, model_stem, parse_creo_name
+from export_variants import parse_variants
+from material_rules import load_material_rules
+
+JOB_FILE_SUFFIXES = ('.csv', '.jsonl')
+FIELDS = ("input", "output", "material", "material_map", "dpi", "samples", "occlusion", "compression",
+          "variants")
+BOOLEANS = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+
+class JobFileError(ValueError):
+    """Raised for a job list line that cannot be converted"""
+
+
+def is_job_file(path):
+    """Return True if a batch input is a job list rather than a directory"""
+    path = Path(path)
+    return path.is_file() and path.suffix.lower() in JOB_FILE_SUFFIXES
+
+
+def _rows(job_file):
+    # (line number, dict of raw values) in file order
+    with open(job_file, encoding='utf-8-sig', newline='') as f:
+        if Path(job_file).suffix.lower() == '.csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {key.strip().lower(): value for key, value in row.items() if key}
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, JobFileError(f"Invalid JSON: {e}")
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, JobFileError("Expected a JSON object")
+                    continue
+                yield line_number, {key.lower(): value for key, value in row.items()}
+
+
+def _value(row, field):
+    value = row.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, "") else value
+
+
+def _resolve_input(path, newest_by_dir):
+    if path.exists():
+        return path
+    parsed = parse_creo_name(path.name)
+    if parsed and parsed[1] == 0:
+        # Each directory is listed once per job list, not once per job
+        newest = newest_by_dir.get(path.parent)
+        if newest is None:
+            newest = {}
+            if path.parent.is_dir():
+                for f in find_creo_files(path.parent):
+                    newest.setdefault(parse_creo_name(f.name)[0].lower(), f)
+            newest_by_dir[path.parent] = newest
+        if parsed[0].lower() in newest:
+            return newest[parsed[0].lower()]
+    raise JobFileError(f"Input file not found: {path}")
+
+
+def _parse_row(row, base_dir, output_dir, newest_by_dir):
+    unknown = sorted(set(row) - set(FIELDS))
+    if unknown:
+        raise JobFileError(f"Unknown column(s): {', '.join(unknown)}")
+    if not _value(row, "input"):
+        raise JobFileError("Missing input")
+    creo_file = _resolve_input((base_dir / _value(row, "input")).resolve(), newest_by_dir)
+
+    output = _value(row, "output")
+    output_file = (Path(output_dir) / output).resolve() if output else Path(output_dir) / f"{model_stem(creo_file)}.glb"
+
+    export_options = {}
+    for field, option in (("dpi", "dpi"), ("samples", "num_samples")):
+        if _value(row, field) is not None:
+            try:
+                export_options[option] = int(_value(row, field))
+            except (TypeError, ValueError):
+                raise JobFileError(f"Invalid {field}: {row[field]!r}")
+    for field, option in (("occlusion", "occlusion"), ("compression", "draco_compression")):
+        value = _value(row, field)
+        if value is not None:
+            if not isinstance(value, bool):
+                value = BOOLEANS.get(str(value).lower())
+            if value is None:
+                raise JobFileError(f"Invalid {field}: {row[field]!r}, expected true or false")
+            export_options[option] = value
+
+    material_map = _value(row, "material_map")
+    if material_map:
+        material_map = str((base_dir / material_map).resolve())
+    variants = _value(row, "variants")
+    return {
+        "input": creo_file,
+        "output": output_file,
+        "material": _value(row, "material"),
+        "material_map": material_map,
+        "export_options": export_options,
+        "variants": variants,
+    }
+
+
+def read_job_file(job_file, output_dir):
+    """
+    Stream the jobs of a job list
+
+    Args:
+        job_file: CSV or JSON-lines job list
+        output_dir: Batch output directory (base of relative outputs)
+
+    Yields:
+        tuple: (line number, job dict with input, output, material, material_map,
+               export_options and variants; or a JobFileError for a line that is invalid)
+    """
+    base_dir = Path(job_file).resolve().parent
+    material_maps = set()
+    newest_by_dir = {}
+    for line_number, row in _rows(job_file):
+        if isinstance(row, JobFileError):
+            yield line_number, row
+            continue
+        try:
+            job = _parse_row(row, base_dir, output_dir, newest_by_dir)
+            if job["variants"]:
+                job["variants"] = parse_variants(job["variants"])
+            # Check each material map once, not once per job
+            if job["material_map"] and job["material_map"] not in material_maps:
+                load_material_rules(job["material_map"])
+                material_maps.add(job["material_map"])
+        except JobFileError as e:
+            yield line_number, e
+        except (OSError, ValueError) as e:
+            yield line_number, JobFileError(str(e))
+        else:
+            yield line_number, job
+
+
+def job_settings(job, export_options=None, material_name=None, material_map=None, variants=None):
+    """
+    Merge a job's settings over the batch's command line settings
+
+    Args:
+        job: Job from read_job_file()
+        export_options: Batch export options
+        material_name: Batch material
+        material_map: Batch material mapping file
+        variants: Batch variants
+
+    Returns:
+        tuple: (material_name, material_map, export_options, variants)
+    """
+    options = dict(export_options or {})
+    options.update(job["export_options"])
+    return (job["material"] or material_name, job["material_map"] or material_map, options,
+            job["variants"] or variants)
@@ -0,0 +1,165 @@
+"""
+Persistent batch manifest for incremental conversion
+Records what was converted into an output directory so later runs can skip files that
+are already up to date and resume a batch that was interrupted.
+
+The manifest is a JSON-lines file in the output directory. A line is appended as soon
+as each file finishes, so at most the files in flight are lost when a run is killed.
+Entries are kept per source and output (a job list may convert one source to several
+outputs); the last line for each wins and the file is compacted at the end of every batch.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from conversion_cache import DEFAULT_EXPORT_OPTIONS
+
+MANIFEST_NAME = ".keyshot-manifest.jsonl"
+
+
+def options_hash(export_options=None, material_name=None, postprocess=None, variants=None):
+    """
+    Hash the settings that affect a conversion's output
+
+    Args:
+        export_options: Dictionary of user export options (merged with defaults)
+        material_name: Optional material name applied to all geometry
+        postprocess: Dictionary of wrapper post-export settings (e.g. {"optimize": True})
+        variants: Optional list of export variants
+
+    Returns:
+        str: Short hex hash
+    """
+    options = dict(DEFAULT_EXPORT_OPTIONS)
+    if export_options:
+        options.update(export_options)
+    description = {"export_options": options, "material": material_name}
+    if postprocess:
+        description["postprocess"] = postprocess
+    if variants:
+        description["variants"] = variants
+    description = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()[:16]
+
+
+class BatchManifest:
+    """Per-output-directory record of converted sources"""
+
+    def __init__(self, output_dir, option_hash):
+        """
+        Args:
+            output_dir: Batch output directory (the manifest lives here)
+            option_hash: options_hash() of the current run's settings
+        """
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.option_hash = option_hash
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the manifest, ignoring a truncated last line from an interrupted run"""
+        if not self.path.exists():
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[(entry["source"], entry["output"])] = entry
+
+    def is_up_to_date(self, source, output_file, option_hash=None):
+        """
+        Check whether a source was already converted with the current settings
+
+        Args:
+            source: Creo file path
+            output_file: Expected output path
+            option_hash: options_hash() of this file's settings when they differ from the
+                         run's (job lists)
+
+        Returns:
+            bool: True if the source, settings and output are unchanged since the last success
+        """
+        entry = self.entries.get((str(source), str(output_file)))
+        if not entry or entry.get("status") != "ok":
+            return False
+        if entry.get("option_hash") != (option_hash or self.option_hash):
+            return False
+        try:
+            source_stat = os.stat(source)
+            output_size = os.path.getsize(output_file)
+        except OSError:
+            return False
+        return (entry.get("size") == source_stat.st_size
+                and entry.get("mtime") == source_stat.st_mtime
+                and entry.get("output_size") == output_size)
+
+    def record(self, source, output_file, ok, option_hash=None):
+        """
+        Append the outcome of one conversion
+
+        Args:
+            source: Creo file path
+            output_file: Output path
+            ok: True if the conversion succeeded
+            option_hash: options_hash() of this file's settings when they differ from the
+                         run's (job lists)
+        """
+        try:
+            source_stat = os.stat(source)
+            size, mtime = source_stat.st_size, source_stat.st_mtime
+        except OSError:
+            size, mtime = None, None
+        try:
+            output_size = os.path.getsize(output_file) if ok else None
+        except OSError:
+            output_size = None
+
+        entry = {
+            "source": str(source),
+            "size": size,
+            "mtime": mtime,
+            "option_hash": option_hash or self.option_hash,
+            "output": str(output_file),
+            "output_size": output_size,
+            "status": "ok" if ok else "failed",
+            "converted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+        with self._lock:
+            self.entries[(entry["source"], entry["output"])] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def refresh_outputs(self, output_files):
+        """
+        Record the current size of outputs rewritten after conversion (e.g. by the part
+        library), so they still count as up to date
+
+        Args:
+            output_files: Output paths that changed
+        """
+        changed = {Path(path).resolve() for path in output_files}
+        with self._lock:
+            for entry in self.entries.values():
+                if entry.get("status") == "ok" and Path(entry["output"]).resolve() in changed:
+                    try:
+                        entry["output_size"] = os.path.getsize(entry["output"])
+                    except OSError:
+                        entry["output_size"] = None
+        self.compact()
+
+    def compact(self):
+        """Rewrite the manifest with one line per source and output"""
+        with self._lock:
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(temp, self.path)
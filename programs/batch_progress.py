@@ -0,0 +1,231 @@
+"""
+Live batch progress
+Follows the progress events written by the KeyShot workers (started, stage, finished,
+failed) and the wrapper's own discovery, and turns them into a periodic status line with
+throughput, ETA and per-worker status. The same numbers can be written as a Prometheus
+textfile (node_exporter textfile collector) for monitoring.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# Throughput is measured over the files finished in this many recent seconds
+RATE_WINDOW_SECONDS = 600
+
+
+def format_duration(seconds):
+    """
+    Format seconds as a short duration ("42s", "3m 05s", "2h 10m")
+
+    Args:
+        seconds: Duration in seconds, or None
+
+    Returns:
+        str: Human-readable duration, "-" for None
+    """
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+class BatchProgress:
+    """Thread-safe progress counters for one batch"""
+
+    def __init__(self, jobs, metrics_file=None):
+        """
+        Args:
+            jobs: Number of KeyShot workers
+            metrics_file: Optional path of a Prometheus textfile to keep up to date
+        """
+        self.jobs = jobs
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.started = time.monotonic()
+        self.found = 0
+        self.queued = 0
+        self.discovering = True
+        self.counts = {"ok": 0, "failed": 0, "cached": 0}
+        self.stage_seconds = {}
+        self.recent = deque()
+        self.workers = {n + 1: None for n in range(jobs)}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def discovered(self, queued=True):
+        """Count a file found by discovery (queued=False for skipped files)"""
+        with self._lock:
+            self.found += 1
+            if queued:
+                self.queued += 1
+
+    def discovery_finished(self):
+        """Mark the total number of files as known"""
+        with self._lock:
+            self.discovering = False
+
+    def worker_event(self, worker_id, event):
+        """
+        Update a worker's status from one KeyShot progress event
+
+        Args:
+            worker_id: Worker number
+            event: Parsed event dict
+        """
+        name = event.get("event")
+        with self._lock:
+            if name == "started":
+                self.workers[worker_id] = {"file": Path(event["input"]).name, "stage": "import",
+                                           "since": time.monotonic()}
+            elif name == "stage" and self.workers.get(worker_id):
+                self.stage_seconds[event["stage"]] = self.stage_seconds.get(event["stage"], 0.0) + event["seconds"]
+                self.workers[worker_id]["stage"] = f"{event['stage']} done"
+
+    def file_done(self, worker_id, result):
+        """
+        Count a finished file
+
+        Args:
+            worker_id: Worker number
+            result: Result dict from the batch
+        """
+        with self._lock:
+            if result.get("cached"):
+                self.counts["cached"] += 1
+            else:
+                self.counts["ok" if result["ok"] else "failed"] += 1
+            self.recent.append(time.monotonic())
+            self.workers[worker_id] = None
+
+    def _done(self):
+        return sum(self.counts.values())
+
+    def _rate(self):
+        # Files per minute over the recent window
+        now = time.monotonic()
+        while self.recent and self.recent[0] < now - RATE_WINDOW_SECONDS:
+            self.recent.popleft()
+        span = min(RATE_WINDOW_SECONDS, now - self.started)
+        return len(self.recent) / span * 60 if span > 0 else 0.0
+
+    def snapshot(self):
+        """
+        Return the current numbers
+
+        Returns:
+            dict: found, queued, done, counts, files_per_minute, eta_seconds and worker status
+        """
+        with self._lock:
+            rate = self._rate()
+            remaining = self.queued - self._done()
+            now = time.monotonic()
+            return {
+                "found": self.found,
+                "queued": self.queued,
+                "discovering": self.discovering,
+                "done": self._done(),
+                "counts": dict(self.counts),
+                "files_per_minute": rate,
+                "eta_seconds": remaining / rate * 60 if rate > 0 else None,
+                "elapsed_seconds": now - self.started,
+                "stage_seconds": dict(self.stage_seconds),
+                "workers": {worker_id: dict(status, seconds=now - status["since"]) if status else None
+                            for worker_id, status in self.workers.items()},
+            }
+
+    def status_lines(self):
+        """Return the human-readable status: one summary line and one line per worker"""
+        snap = self.snapshot()
+        total = f"{snap['queued']}+" if snap["discovering"] else str(snap["queued"])
+        eta = "-" if snap["discovering"] else format_duration(snap["eta_seconds"])
+        lines = [f"Progress: {snap['done']}/{total} files ({snap['counts']['failed']} failed, "
+                 f"{snap['counts']['cached']} cached) | {snap['files_per_minute']:.1f} files/min | "
+                 f"elapsed {format_duration(snap['elapsed_seconds'])} | ETA {eta}"]
+        for worker_id, status in snap["workers"].items():
+            if status:
+                lines.append(f"  worker {worker_id}: {status['file']} - {status['stage']} "
+                             f"({format_duration(status['seconds'])})")
+            else:
+                lines.append(f"  worker {worker_id}: idle")
+        return lines
+
+    def write_metrics(self):
+        """Write the Prometheus textfile atomically (no-op without a metrics file)"""
+        if not self.metrics_file:
+            return
+        snap = self.snapshot()
+        lines = [
+            "# HELP keyshot_batch_files Creo files found, queued and finished in the current batch",
+            "# TYPE keyshot_batch_files gauge",
+            f'keyshot_batch_files{{state="found"}} {snap["found"]}',
+            f'keyshot_batch_files{{state="queued"}} {snap["queued"]}',
+        ]
+        for state, count in snap["counts"].items():
+            lines.append(f'keyshot_batch_files{{state="{state}"}} {count}')
+        lines += [
+            "# HELP keyshot_batch_files_per_minute Files finished per minute over the last 10 minutes",
+            "# TYPE keyshot_batch_files_per_minute gauge",
+            f"keyshot_batch_files_per_minute {snap['files_per_minute']:.3f}",
+            "# HELP keyshot_batch_eta_seconds Estimated seconds until the batch finishes (-1 if unknown)",
+            "# TYPE keyshot_batch_eta_seconds gauge",
+            f"keyshot_batch_eta_seconds {-1 if snap['eta_seconds'] is None or snap['discovering'] else round(snap['eta_seconds'], 1)}",
+            "# HELP keyshot_batch_elapsed_seconds Seconds since the batch started",
+            "# TYPE keyshot_batch_elapsed_seconds gauge",
+            f"keyshot_batch_elapsed_seconds {snap['elapsed_seconds']:.1f}",
+            "# HELP keyshot_batch_stage_seconds_total Seconds spent per conversion stage",
+            "# TYPE keyshot_batch_stage_seconds_total counter",
+        ]
+        for stage, seconds in sorted(snap["stage_seconds"].items()):
+            lines.append(f'keyshot_batch_stage_seconds_total{{stage="{stage}"}} {seconds:.3f}')
+        lines += [
+            "# HELP keyshot_batch_worker_busy_seconds Seconds the worker has spent on its current file (0 if idle)",
+            "# TYPE keyshot_batch_worker_busy_seconds gauge",
+        ]
+        for worker_id, status in snap["workers"].items():
+            lines.append(f'keyshot_batch_worker_busy_seconds{{worker="{worker_id}"}} '
+                         f'{status["seconds"] if status else 0:.1f}')
+        lines += [
+            "# HELP keyshot_batch_last_update_timestamp_seconds When this file was written",
+            "# TYPE keyshot_batch_last_update_timestamp_seconds gauge",
+            f"keyshot_batch_last_update_timestamp_seconds {time.time():.0f}",
+        ]
+
+        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.metrics_file.with_name(self.metrics_file.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp, self.metrics_file)
+
+    def start(self, interval, print_lock):
+        """
+        Print the status and refresh the metrics file every `interval` seconds
+
+        Args:
+            interval: Seconds between updates (0 disables the status line)
+            print_lock: Lock shared with the workers' output
+        """
+        def tick():
+            while not self._stop.wait(interval or 5):
+                if interval:
+                    with print_lock:
+                        print("\n".join(self.status_lines()))
+                        print()
+                self.write_metrics()
+
+        if interval or self.metrics_file:
+            self._thread = threading.Thread(target=tick, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the periodic updates and write the final metrics"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.write_metrics()
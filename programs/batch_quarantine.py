@@ -0,0 +1,96 @@
+"""
+Quarantine list for batch conversion
+Tracks Creo files that keep failing so later batches skip them instead of spending
+their full timeout and retries on them every night.
+
+A file is quarantined after failing in `threshold` consecutive batches. It is released
+when it converts successfully (e.g. with --retry-quarantined) or when the source file
+changes. The list is a JSON file in the output directory, rewritten after every change.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+QUARANTINE_NAME = ".keyshot-quarantine.json"
+DEFAULT_QUARANTINE_AFTER = 3
+
+
+class Quarantine:
+    """Per-output-directory record of repeatedly failing sources"""
+
+    def __init__(self, output_dir, threshold=DEFAULT_QUARANTINE_AFTER):
+        """
+        Args:
+            output_dir: Batch output directory (the list lives here)
+            threshold: Consecutive failed batches before a file is skipped (0 disables skipping)
+        """
+        self.path = Path(output_dir) / QUARANTINE_NAME
+        self.threshold = threshold
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the list; an unreadable file is treated as empty"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self):
+        temp = self.path.with_name(self.path.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp, self.path)
+
+    def _source_state(self, source):
+        try:
+            source_stat = os.stat(source)
+        except OSError:
+            return None, None
+        return source_stat.st_size, source_stat.st_mtime
+
+    def is_quarantined(self, source):
+        """
+        Check whether a source should be skipped
+
+        Args:
+            source: Creo file path
+
+        Returns:
+            bool: True if the unchanged source failed in `threshold` consecutive batches
+        """
+        entry = self.entries.get(str(source))
+        if not entry or not self.threshold or entry["failures"] < self.threshold:
+            return False
+        size, mtime = self._source_state(source)
+        return entry.get("size") == size and entry.get("mtime") == mtime
+
+    def record(self, source, ok, error=None):
+        """
+        Record the final outcome of one file in this batch (after retries)
+
+        Args:
+            source: Creo file path
+            ok: True if the conversion succeeded
+            error: Error message of the last attempt
+        """
+        source = str(source)
+        with self._lock:
+            if ok:
+                if self.entries.pop(source, None) is None:
+                    return
+            else:
+                size, mtime = self._source_state(source)
+                entry = self.entries.get(source)
+                if not entry or entry.get("size") != size or entry.get("mtime") != mtime:
+                    entry = {"failures": 0, "size": size, "mtime": mtime}
+                entry["failures"] += 1
+                entry["last_error"] = error
+                entry["last_failed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                self.entries[source] = entry
+            self._save()
@@ -0,0 +1,226 @@
+"""
+Batch performance report
+Summarises per-stage timings reported by the KeyShot script (import, material, export)
+into percentiles, throughput and the slowest inputs, for capacity planning, and lists
+the export settings each file ended up with.
+"""
+
+import json
+import math
+import time
+from pathlib import Path
+
+STAGES = ("import", "material", "export")
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile
+
+    Args:
+        values: Numbers to summarise
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """
+    Return count, p50, p95 and max of a list of numbers
+
+    Args:
+        values: Numbers to summarise
+
+    Returns:
+        dict: {"count", "p50", "p95", "max"}
+    """
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else None,
+    }
+
+
+def prediction_accuracy(results):
+    """
+    Compare predicted and measured conversion times
+
+    Args:
+        results: Successful, converted result dicts with "predicted_seconds"
+
+    Returns:
+        dict: {"count", "predicted_seconds", "actual_seconds", "mean_abs_error_seconds",
+               "abs_error_pct"}; abs_error_pct is the summed absolute error as a percentage
+               of the summed actual time
+    """
+    errors = [abs(r["seconds"] - r["predicted_seconds"]) for r in results]
+    actual = sum(r["seconds"] for r in results)
+    return {
+        "count": len(results),
+        "predicted_seconds": round(sum(r["predicted_seconds"] for r in results), 1),
+        "actual_seconds": round(actual, 1),
+        "mean_abs_error_seconds": round(sum(errors) / len(errors), 1) if errors else None,
+        "abs_error_pct": round(sum(errors) / actual * 100, 1) if actual > 0 else None,
+    }
+
+
+def settings_label(settings):
+    """Short form of export settings, e.g. 150 dpi / 32 samples / Draco"""
+    label = f"{settings['dpi']} dpi / {settings['num_samples']} samples"
+    return label + (" / Draco" if settings["draco_compression"] else "")
+
+
+def quality_summary(results):
+    """
+    Summarise the export settings files ended up with and whether they met the budget
+
+    Args:
+        results: Converted result dicts with "quality" (see quality_budget.py)
+
+    Returns:
+        dict: {"count", "met", "missed", "reexports", "settings" (files per settings label),
+               "files" (input, settings, output_bytes, seconds, exports, budget_met per file)}
+    """
+    files = [{
+        "input": r["input"],
+        "settings": r["quality"]["settings"],
+        "output_bytes": r.get("output_bytes"),
+        "seconds": r["seconds"],
+        "exports": r["quality"]["exports"],
+        "budget_met": r["quality"]["budget_met"],
+    } for r in results]
+    settings = {}
+    for f in files:
+        label = settings_label(f["settings"])
+        settings[label] = settings.get(label, 0) + 1
+    return {
+        "count": len(files),
+        "met": sum(1 for f in files if f["budget_met"] is True),
+        "missed": sum(1 for f in files if f["budget_met"] is False),
+        "reexports": sum(f["exports"] - 1 for f in files),
+        "settings": settings,
+        "files": files,
+    }
+
+
+def build_report(results, wall_seconds, slowest=10):
+    """
+    Build the machine-readable report for a finished batch
+
+    Args:
+        results: Per-file result dicts from the batch (with "stages" and "output_bytes")
+        wall_seconds: Wall-clock duration of the batch
+        slowest: Number of slowest inputs to list
+
+    Returns:
+        dict: JSON-serialisable report
+    """
+    converted = [r for r in results if not r.get("cached")]
+
+    stages = {}
+    for stage in STAGES:
+        stages[stage] = summarize([r["stages"][stage] for r in converted
+                                   if stage in r.get("stages", {})])
+    stages["total"] = summarize([r["seconds"] for r in converted])
+
+    output_sizes = [r["output_bytes"] for r in converted if r.get("output_bytes") is not None]
+
+    slowest_results = sorted(converted, key=lambda r: r["seconds"], reverse=True)[:slowest]
+
+    predicted = [r for r in converted if r["ok"] and r.get("predicted_seconds") is not None]
+
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": len(results),
+        "converted": len(converted),
+        "cached": len(results) - len(converted),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "wall_seconds": round(wall_seconds, 3),
+        "files_per_hour": round(len(results) / wall_seconds * 3600, 1) if wall_seconds > 0 else None,
+        "stages": stages,
+        "output_bytes": summarize(output_sizes),
+        "optimizer_bytes_saved": sum(r.get("bytes_saved", 0) for r in results),
+        "prediction": prediction_accuracy(predicted),
+        "quality": quality_summary([r for r in converted if r["ok"] and r.get("quality")]),
+        "slowest": [{
+            "input": r["input"],
+            "ok": r["ok"],
+            "seconds": r["seconds"],
+            "predicted_seconds": r.get("predicted_seconds"),
+            "stages": r.get("stages", {}),
+            "output_bytes": r.get("output_bytes"),
+            "settings": (r.get("quality") or {}).get("settings"),
+        } for r in slowest_results],
+    }
+
+
+def print_report(report):
+    """
+    Print the human-readable form of a report
+
+    Args:
+        report: Report from build_report()
+    """
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print("Performance report:")
+    print(f"  Files per hour: {fmt(report['files_per_hour'])}")
+    print(f"  {'Stage':<10} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<10} {stats['count']:>6} {fmt(stats['p50']):>8} {fmt(stats['p95']):>8} {fmt(stats['max']):>8}")
+
+    sizes = report["output_bytes"]
+    if sizes["count"]:
+        print(f"  Output size: p50 {sizes['p50'] / 1e6:.2f} MB, p95 {sizes['p95'] / 1e6:.2f} MB, "
+              f"max {sizes['max'] / 1e6:.2f} MB")
+
+    if report["optimizer_bytes_saved"]:
+        print(f"  Optimizer saved: {report['optimizer_bytes_saved'] / 1e6:.2f} MB")
+
+    prediction = report.get("prediction")
+    if prediction and prediction["count"]:
+        print(f"  Predicted vs actual: {prediction['predicted_seconds']:.1f}s vs "
+              f"{prediction['actual_seconds']:.1f}s of conversion, mean error "
+              f"{fmt(prediction['mean_abs_error_seconds'])}s ({fmt(prediction['abs_error_pct'])}%)")
+
+    quality = report.get("quality")
+    if quality and quality["count"]:
+        if quality["met"] or quality["missed"]:
+            print(f"  Budget: {quality['met']} met, {quality['missed']} missed, "
+                  f"{quality['reexports']} re-export(s)")
+        print("  Settings: " + ", ".join(f"{label} ({count})" for label, count in
+                                         sorted(quality["settings"].items(), key=lambda item: -item[1])))
+        missed = [f for f in quality["files"] if f["budget_met"] is False]
+        for f in missed[:10]:
+            size = "-" if f["output_bytes"] is None else f"{f['output_bytes'] / 1e6:.2f} MB"
+            print(f"    ✗ {Path(f['input']).name}: {size} in {f['seconds']:.1f}s at {settings_label(f['settings'])}")
+
+    if report["slowest"]:
+        print(f"  Slowest {len(report['slowest'])}:")
+        for r in report["slowest"]:
+            status = "✓" if r["ok"] else "✗"
+            predicted = "" if r.get("predicted_seconds") is None else f"  (predicted {r['predicted_seconds']:.1f}s)"
+            print(f"    {status} {r['seconds']:>8.1f}s  {Path(r['input']).name}{predicted}")
+
+
+def write_report(report, path):
+    """
+    Write a report as JSON
+
+    Args:
+        report: Report from build_report()
+        path: Destination file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
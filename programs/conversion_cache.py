@@ -0,0 +1,191 @@
+"""
+Content-addressed cache of converted GLB files
+Lets the KeyShot wrapper skip KeyShot entirely when the same input has already been
+converted with the same export options, material and KeyShot version.
+
+Cache layout:
+    <cache_dir>/objects/<key[:2]>/<key>.glb
+
+The modification time of each cached file is its last use; when the cache grows past
+its size cap the least recently used entries are removed first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# Must match default_export_options in creo_to_gltf_keyshot.py
+DEFAULT_EXPORT_OPTIONS = {
+    "dpi": 150,
+    "num_samples": 32,
+    "occlusion": True,
+    "draco_compression": True,
+}
+
+DEFAULT_CACHE_SIZE_MB = 10240
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 of a file's contents
+
+    Args:
+        path: File to hash
+        chunk_size: Read size in bytes
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """GLB cache keyed on input bytes, export options, material and KeyShot version"""
+
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_CACHE_SIZE_MB, keyshot_version="unknown"):
+        """
+        Args:
+            cache_dir: Directory holding the cache
+            max_size_mb: Size cap in megabytes; least recently used entries are evicted above it
+            keyshot_version: KeyShot version string, part of every key
+        """
+        self.objects_dir = Path(cache_dir).resolve() / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.keyshot_version = keyshot_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, input_file, export_options=None, material_name=None, input_sha256=None):
+        """
+        Build the cache key for a conversion
+
+        Args:
+            input_file: Creo file to convert
+            export_options: Dictionary of user export options (merged with defaults)
+            material_name: Optional material name applied to all geometry
+            input_sha256: hash_file(input_file), if already computed
+
+        Returns:
+            str: Hex cache key
+        """
+        options = dict(DEFAULT_EXPORT_OPTIONS)
+        if export_options:
+            options.update(export_options)
+
+        description = json.dumps({
+            "input_sha256": input_sha256 or hash_file(input_file),
+            "export_options": options,
+            "material": material_name,
+            "keyshot_version": self.keyshot_version,
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.objects_dir / key[:2] / f"{key}.glb"
+
+    def fetch(self, key, output_file):
+        """
+        Place a cached GLB at output_file if one exists
+
+        The file is hard-linked when possible and copied otherwise.
+
+        Args:
+            key: Cache key from key()
+            output_file: Destination path
+
+        Returns:
+            bool: True on a cache hit
+        """
+        entry = self._entry_path(key)
+        output_path = Path(output_file)
+
+        try:
+            os.utime(entry)  # mark as recently used
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            if output_path.exists():
+                output_path.unlink()
+            try:
+                os.link(entry, output_path)
+            except OSError:
+                shutil.copyfile(entry, output_path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def release(self, output_file):
+        """
+        Detach an output file from the cache before KeyShot overwrites it
+
+        A hard-linked output shares its bytes with the cache entry, so writing a new
+        conversion into it in place would corrupt the cached copy.
+
+        Args:
+            output_file: Output path about to be written
+        """
+        output_path = Path(output_file)
+        try:
+            if output_path.stat().st_nlink > 1:
+                output_path.unlink()
+        except OSError:
+            pass
+
+    def store(self, key, output_file):
+        """
+        Add a freshly converted GLB to the cache and enforce the size cap
+
+        Args:
+            key: Cache key from key()
+            output_file: The converted GLB
+        """
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Copy to a temporary name first so readers never see a partial file
+        temp = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            shutil.copyfile(output_file, temp)
+            os.replace(temp, entry)
+        except OSError as e:
+            print(f"WARNING: Could not add {output_file} to cache: {e}")
+            if temp.exists():
+                temp.unlink()
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size cap"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.objects_dir.glob("*/*.glb"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    continue
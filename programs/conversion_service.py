@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Local KeyShot conversion service
+A small HTTP daemon that accepts conversion jobs from the web app and runs them on a
+bounded pool of persistent KeyShot workers.
+
+- Identical requests that are queued or running are merged into one conversion
+- Interactive requests (the 3D view) run before batch work
+- /stats reports queue depth and wait/run latency
+
+Listens on 127.0.0.1 only: requests name files on this machine.
+
+API:
+  POST /jobs        {"input": "door.asm", "output": "door.glb" (optional), "material": "Steel",
+                     "material_map": "materials.json",
+                     "export_options": {"dpi": 150}, "variants": "lod",
+                     "priority": "interactive" | "batch",
+                     "wait": true (block until finished), "timeout": 600}
+  GET  /jobs/<id>   Job status and result
+  GET  /stats       Queue depth, in-flight jobs and latency percentiles
+  GET  /health      Liveness check
+
+Examples:
+  python conversion_service.py --output-dir ./public/models/generated --workers 2
+  curl -X POST localhost:8765/jobs -d '{"input": "/vault/door.asm", "priority": "interactive", "wait": true}'
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from batch_report import summarize
+from conversion_cache import ConversionCache, DEFAULT_CACHE_SIZE_MB
+from creo_files import model_stem
+from export_variants import parse_variants
+from material_rules import load_material_rules, material_key
+from keyshot_install import find_keyshot, get_keyshot_version
+from keyshot_worker import KeyShotWorker
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 1024 * 1024
+HISTORY_SIZE = 1000
+# Seconds before a conversion's KeyShot is killed, so a hung import cannot hold a worker forever
+DEFAULT_JOB_TIMEOUT = 1800
+STRING_FIELDS = ("input", "output", "material", "material_map", "priority", "variants")
+
+
+class Job:
+    """One conversion request and its outcome"""
+
+    def __init__(self, job_id, key, request, output, priority):
+        self.id = job_id
+        self.key = key
+        self.input = request["input"]
+        self.output = output
+        self.material = request.get("material")
+        self.material_map = request.get("material_map")
+        self.export_options = request.get("export_options") or {}
+        self.variants = request.get("variants")
+        self.priority = priority
+        self.status = "queued"
+        self.result = None
+        self.requests = 1
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input": self.input,
+            "output": self.output,
+            "priority": self.priority,
+            "requests": self.requests,
+            "wait_seconds": round((self.started_at or time.time()) - self.queued_at, 3),
+            "run_seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "result": self.result,
+        }
+
+
+class ConversionService:
+    """Job queue, in-flight deduplication and the KeyShot worker pool"""
+
+    def __init__(self, keyshot_path, script_path, output_dir, workers=1, cache=None,
+                 recycle_after=None, max_rss_mb=None, job_timeout=DEFAULT_JOB_TIMEOUT):
+        """
+        Args:
+            keyshot_path: Path to KeyShot executable
+            script_path: Path to the KeyShot Python script
+            output_dir: Where outputs go when a request does not name one
+            workers: Number of concurrent KeyShot processes
+            cache: Optional ConversionCache
+            recycle_after: Restart a worker's KeyShot after this many files
+            max_rss_mb: Restart a worker's KeyShot once its resident memory exceeds this many MB
+            job_timeout: Seconds a conversion may take before its KeyShot is killed, None for no limit
+        """
+        self.keyshot_path = keyshot_path
+        self.script_path = script_path
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.job_timeout = job_timeout
+        self.output_dir = Path(output_dir).resolve()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = cache
+        self.queue = queue.PriorityQueue()
+        self.jobs = {}
+        self.in_flight = {}
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.counters = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+        self._job_ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, request):
+        """
+        Queue a conversion, or join an identical one that is already queued or running
+
+        Args:
+            request: Decoded POST /jobs body
+
+        Returns:
+            tuple: (Job, True if merged into an existing job)
+        """
+        for field in STRING_FIELDS:
+            if request.get(field) is not None and not isinstance(request[field], str):
+                raise ValueError(f"'{field}' must be a string")
+        if request.get("export_options") is not None and not isinstance(request["export_options"], dict):
+            raise ValueError("'export_options' must be an object")
+        if not request.get("input"):
+            raise ValueError("'input' is required")
+        priority = request.get("priority", "interactive")
+        if priority not in PRIORITIES:
+            raise ValueError(f"'priority' must be one of {', '.join(PRIORITIES)}")
+
+        input_path = str(Path(request["input"]).resolve())
+        request = dict(request, input=input_path)
+        if request.get("variants"):
+            request["variants"] = parse_variants(request["variants"])
+        if request.get("material_map"):
+            request["material_map"] = str(Path(request["material_map"]).resolve())
+        settings = {k: request.get(k) for k in ("material", "material_map", "export_options", "variants")}
+        key = hashlib.sha256(json.dumps([input_path, request.get("output"), settings],
+                                        sort_keys=True).encode('utf-8')).hexdigest()
+
+        with self._lock:
+            self.counters["submitted"] += 1
+            job = self.in_flight.get(key)
+            if job:
+                job.requests += 1
+                self.counters["deduplicated"] += 1
+                # An interactive request promotes queued batch work
+                if PRIORITIES[priority] < PRIORITIES[job.priority] and job.status == "queued":
+                    job.priority = priority
+                    self.queue.put((PRIORITIES[priority], next(self._sequence), job))
+                return job, True
+
+            output = request.get("output") or str(self.output_dir / f"{model_stem(input_path)}-{key[:12]}.glb")
+            job = Job(str(next(self._job_ids)), key, request, output, priority)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+            self.queue.put((PRIORITIES[priority], next(self._sequence), job))
+            return job, False
+
+    def _worker(self):
+        keyshot = KeyShotWorker(self.keyshot_path, self.script_path, self.recycle_after, self.max_rss_mb)
+        while True:
+            _, _, job = keyshot.take(self.queue)
+            if job is None:
+                keyshot.close()
+                return
+            with self._lock:
+                if job.status != "queued":
+                    continue  # a promoted job is queued twice; run it once
+                job.status = "running"
+                job.started_at = time.time()
+
+            try:
+                result = self._convert(keyshot, job)
+            except Exception as e:
+                # Fail the job, not the worker: requests merged into it must not wait forever
+                result = {"ok": False, "error": f"Conversion error: {e}"}
+
+            with self._lock:
+                job.result = result
+                job.status = "done" if result["ok"] else "failed"
+                job.finished_at = time.time()
+                self.counters["completed" if result["ok"] else "failed"] += 1
+                self.in_flight.pop(job.key, None)
+                self.history.append((job.started_at - job.queued_at, job.finished_at - job.started_at))
+                self._forget_old_jobs()
+            job.done.set()
+
+    def _convert(self, keyshot, job):
+        Path(job.output).parent.mkdir(parents=True, exist_ok=True)
+
+        cache_key = None
+        if self.cache and not job.variants and Path(job.output).suffix.lower() == '.glb':
+            try:
+                rules = load_material_rules(job.material_map) if job.material_map else None
+                cache_key = self.cache.key(job.input, job.export_options, material_key(job.material, rules, job.input))
+            except (OSError, ValueError) as e:
+                return {"ok": False, "error": str(e)}
+            if self.cache.fetch(cache_key, job.output):
+                return {"ok": True, "cached": True, "output": job.output}
+            self.cache.release(job.output)
+
+        result, lines = keyshot.convert(job.input, job.output, job.material, job.export_options, job.variants,
+                                        timeout=self.job_timeout, material_map=job.material_map)
+        if not result["ok"]:
+            result["log"] = lines[-20:]
+        elif cache_key:
+            self.cache.store(cache_key, job.output)
+        return result
+
+    def _forget_old_jobs(self):
+        finished = [j for j in self.jobs.values() if j.done.is_set()]
+        for job in finished[:max(0, len(finished) - HISTORY_SIZE)]:
+            del self.jobs[job.id]
+
+    def stats(self):
+        """Queue depth, in-flight work and latency percentiles"""
+        with self._lock:
+            queued = [j for j in self.in_flight.values() if j.status == "queued"]
+            waits = [w for w, _ in self.history]
+            runs = [r for _, r in self.history]
+            return {
+                "workers": len(self.threads),
+                "queue_depth": {name: sum(1 for j in queued if j.priority == name) for name in PRIORITIES},
+                "running": sum(1 for j in self.in_flight.values() if j.status == "running"),
+                "counters": dict(self.counters),
+                "wait_seconds": summarize(waits),
+                "run_seconds": summarize(runs),
+            }
+
+    def shutdown(self):
+        """Let running conversions finish and stop the KeyShot workers"""
+        for _ in self.threads:
+            self.queue.put((len(PRIORITIES), next(self._sequence), None))
+        for thread in self.threads:
+            thread.join()
+
+
+def make_handler(service):
+    """Build the HTTP request handler bound to a service"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {"ok": True})
+            elif self.path == '/stats':
+                self._send(200, service.stats())
+            elif self.path.startswith('/jobs/'):
+                job = service.jobs.get(self.path[len('/jobs/'):])
+                if job:
+                    self._send(200, job.to_dict())
+                else:
+                    self._send(404, {"error": "Unknown job"})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                self._send(404, {"error": "Not found"})
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_REQUEST_BYTES:
+                self._send(413, {"error": "Request too large"})
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(request, dict):
+                    raise ValueError("Request body must be a JSON object")
+                timeout = request.get("timeout")
+                if timeout is not None:
+                    try:
+                        timeout = None if isinstance(timeout, bool) else float(timeout)
+                    except (TypeError, ValueError):
+                        timeout = None
+                    if timeout is None or not timeout >= 0:
+                        raise ValueError("timeout must be a non-negative number of seconds")
+                job, merged = service.submit(request)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+
+            if request.get("wait"):
+                job.done.wait(timeout)
+            body = job.to_dict()
+            body["deduplicated"] = merged
+            self._send(200 if job.done.is_set() else 202, body)
+
+        def log_message(self, format, *args):
+            print(f"[{self.log_date_time_string()}] {format % args}")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Local KeyShot conversion service',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("API:", 1)[1]
+    )
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                       help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of KeyShot processes (default: 1)')
+    parser.add_argument('--output-dir', required=True,
+                       help='Where outputs go when a request does not name one')
+    parser.add_argument('--keyshot',
+                       help='Path to KeyShot executable')
+    parser.add_argument('--script',
+                       help='Path to KeyShot conversion script (default: creo_to_gltf_keyshot.py)')
+    parser.add_argument('--cache-dir',
+                       help='Reuse cached GLBs for unchanged inputs and options')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB,
+                       help=f'Cache size limit in MB (default: {DEFAULT_CACHE_SIZE_MB})')
+    parser.add_argument('--recycle-after', type=int,
+                       help='Restart a worker\'s KeyShot after this many files')
+    parser.add_argument('--max-rss', type=float, metavar='MB',
+                       help='Restart a worker\'s KeyShot once its resident memory exceeds this many MB')
+    parser.add_argument('--job-timeout', type=float, default=DEFAULT_JOB_TIMEOUT,
+                       help=f'Kill a conversion\'s KeyShot after this many seconds, 0 for no limit '
+                            f'(default: {DEFAULT_JOB_TIMEOUT})')
+    args = parser.parse_args()
+
+    if args.recycle_after is not None and args.recycle_after < 1:
+        print("ERROR: --recycle-after must be at least 1")
+        sys.exit(1)
+    if args.max_rss is not None and args.max_rss <= 0:
+        print("ERROR: --max-rss must be greater than 0")
+        sys.exit(1)
+    if args.job_timeout < 0:
+        print("ERROR: --job-timeout cannot be negative")
+        sys.exit(1)
+
+    keyshot_path = args.keyshot or find_keyshot()
+    if not keyshot_path:
+        print("ERROR: Could not find KeyShot. Specify the path with --keyshot")
+        sys.exit(1)
+    keyshot_version = get_keyshot_version(keyshot_path)
+
+    script_path = Path(args.script) if args.script else Path(__file__).parent / "creo_to_gltf_keyshot.py"
+
+    cache = None
+    if args.cache_dir:
+        cache = ConversionCache(args.cache_dir, args.cache_size, keyshot_version)
+
+    service = ConversionService(keyshot_path, script_path, args.output_dir, args.workers, cache,
+                                args.recycle_after, args.max_rss, args.job_timeout or None)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(service))
+
+    print(f"Using KeyShot: {keyshot_path} ({keyshot_version})")
+    print(f"Conversion service listening on http://127.0.0.1:{args.port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+        print("Shutting down...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
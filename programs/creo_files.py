@@ -0,0 +1,140 @@
+"""
+Creo file discovery
+Finds Creo parts and assemblies in one os.scandir pass per directory and keeps only the
+newest iteration of each model (part.prt, part.prt.1 ... part.prt.137 -> part.prt.137).
+
+Used by both the wrapper (keyshot_convert.py) and the KeyShot script
+(creo_to_gltf_keyshot.py), so it must only depend on the standard library.
+"""
+
+import os
+import re
+from pathlib import Path
+
+# model name with optional Creo iteration number, e.g. "door_frame.asm.12"
+CREO_NAME_PATTERN = re.compile(r'^(?P<model>.+\.(?:prt|asm))(?:\.(?P<iteration>\d+))?$', re.IGNORECASE)
+
+
+def parse_creo_name(filename):
+    """
+    Split a Creo file name into model name and iteration
+
+    Args:
+        filename: File name such as "bracket.prt" or "bracket.prt.12"
+
+    Returns:
+        tuple: (model name, iteration) with iteration 0 for unnumbered files,
+               or None if the name is not a Creo part or assembly
+    """
+    match = CREO_NAME_PATTERN.match(filename)
+    if not match:
+        return None
+    return match.group('model'), int(match.group('iteration') or 0)
+
+
+def model_stem(creo_file):
+    """
+    Return the model name without extension or iteration ("bracket.prt.12" -> "bracket")
+
+    Args:
+        creo_file: Creo file path or name
+
+    Returns:
+        str: Base name used for output files
+    """
+    name = Path(creo_file).name
+    parsed = parse_creo_name(name)
+    model = parsed[0] if parsed else name
+    return model.rsplit('.', 1)[0]
+
+
+def model_key(creo_file):
+    """
+    Identify a model independent of its iteration
+
+    Args:
+        creo_file: Creo file path
+
+    Returns:
+        tuple: ((directory, lower-case model name with extension), iteration), e.g.
+               "door.asm.12" -> ((dir, "door.asm"), 12); a part and an assembly of the
+               same name are different models
+    """
+    creo_path = Path(creo_file)
+    parsed = parse_creo_name(creo_path.name)
+    model, iteration = parsed if parsed else (creo_path.name, 0)
+    return (creo_path.parent, model.lower()), iteration
+
+
+def find_creo_files(input_dir, recursive=False):
+    """
+    Yield the newest iteration of every Creo model under a directory
+
+    Each directory is read once with os.scandir. Its models are yielded as soon as that
+    directory has been scanned, before descending into subdirectories, so callers can
+    start converting while discovery continues.
+
+    Args:
+        input_dir: Directory containing Creo files
+        recursive: Also search subdirectories
+
+    Yields:
+        Path: Creo file, one per model per directory
+    """
+    pending_dirs = [Path(input_dir).resolve()]
+
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        newest = {}
+        subdirs = []
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if recursive:
+                                subdirs.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    parsed = parse_creo_name(entry.name)
+                    if not parsed:
+                        continue
+                    model, iteration = parsed
+                    key = model.lower()
+                    if key not in newest or iteration > newest[key][0]:
+                        newest[key] = (iteration, entry.path)
+        except OSError as e:
+            print(f"WARNING: Cannot read directory {directory}: {e}")
+            continue
+
+        for key in sorted(newest):
+            yield Path(newest[key][1])
+
+        # Reverse so subdirectories are visited in name order
+        pending_dirs.extend(Path(d) for d in sorted(subdirs, reverse=True))
+
+
+def output_file_for(creo_file, input_dir, output_dir, suffix=".glb"):
+    """
+    Map a Creo file to its output path, mirroring subdirectories of input_dir
+
+    Args:
+        creo_file: Creo file found under input_dir
+        input_dir: Root input directory
+        output_dir: Root output directory
+        suffix: Output file extension
+
+    Returns:
+        Path: Output file path
+    """
+    creo_path = Path(creo_file)
+    try:
+        relative_dir = creo_path.parent.relative_to(Path(input_dir).resolve())
+    except ValueError:
+        relative_dir = Path()
+    return Path(output_dir) / relative_dir / f"{model_stem(creo_path)}{suffix}"
@@ -5,6 +5,9 @@ This script runs inside KeyShot's Python environment to convert Creo files to gl
 This script should be run with KeyShot headless mode:
 keyshot -script creo_to_gltf_keyshot.py <input_file> <output_file> [options]
 
+It can also run as a long-lived worker that reads conversion jobs from stdin:
+keyshot -script creo_to_gltf_keyshot.py --worker
+
 Requirements:
 - KeyShot Pro (scripting is a Pro feature)
 - KeyShot 10 or later (for glTF export support)
@@ -13,8 +16,161 @@ Requirements:
 import lux
 import sys
 import os
+import json
+import time
 from pathlib import Path
 
+# Shared helpers (creo_files.py) live next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(globals().get("__file__") or sys.argv[0])))
+
+from creo_files import find_creo_files, output_file_for
+from export_variants import parse_variants, variant_outputs
+from material_rules import load_material_rules
+from quality_budget import cheaper, quality_of, scale_seconds
+
+
+# Prefix for machine-readable lines written to stdout; everything else is human-readable log output
+EVENT_PREFIX = "@@keyshot "
+
+
+def emit_event(event, **fields):
+    """
+    Write a machine-readable event line for the wrapper
+
+    Args:
+        event: Event name (e.g., "result")
+        **fields: JSON-serialisable event data
+    """
+    fields["event"] = event
+    print(EVENT_PREFIX + json.dumps(fields), flush=True)
+
+
+def emit_stages(input_path, output_path, stages, ok, outputs=None, error=None, quality=None):
+    """
+    Write the per-stage timing event for one conversion, followed by its
+    "finished" or "failed" progress event
+
+    Args:
+        input_path: Creo file that was converted
+        output_path: Output glTF file
+        stages: Seconds spent per stage, e.g. {"import": 4.2, "export": 31.0}
+        ok: True if the conversion succeeded
+        outputs: Per-file export results ({"output", "ok", "seconds", "bytes"}) when
+                 several variants were exported
+        error: Why the conversion failed
+        quality: Settings the output ended up with ({"settings", "exports", "budget_met"})
+    """
+    if outputs:
+        output_bytes = sum(o["bytes"] for o in outputs if o["bytes"] is not None) if ok else None
+    else:
+        try:
+            output_bytes = os.path.getsize(output_path) if ok else None
+        except OSError:
+            output_bytes = None
+    emit_event("stages", input=input_path, output=output_path, ok=ok,
+               stages=stages, output_bytes=output_bytes, outputs=outputs or [], quality=quality)
+    if ok:
+        emit_event("finished", input=input_path, output=output_path,
+                   seconds=round(sum(stages.values()), 3), output_bytes=output_bytes)
+    else:
+        emit_event("failed", input=input_path, output=output_path,
+                   seconds=round(sum(stages.values()), 3), error=error or "Export failed")
+
+
+def emit_stage_done(input_path, stage, seconds):
+    """
+    Write a progress event when one stage of a conversion finishes
+
+    Args:
+        input_path: Creo file being converted
+        stage: "import", "material" or "export"
+        seconds: Time spent in the stage
+    """
+    emit_event("stage", input=input_path, stage=stage, seconds=seconds)
+
+
+# Material assignment method that works on this KeyShot version, per kind of assignment
+# ("uniform" or "rules"); detected on the first file and reused for the rest of the session
+_material_methods = {}
+
+# Material mapping files already loaded in this session, by path
+_material_rules = {}
+
+
+def _set_scene_tree(mapping, material_name):
+    scene_tree = lux.getSceneTree()
+    if not scene_tree:
+        raise RuntimeError("No scene tree")
+    scene_tree.setMaterial(material_name, link=False)
+
+
+def _objects_mapping(mapping, material_name):
+    # One material for everything: list the scene objects only when a method needs them
+    if mapping is None:
+        mapping = {obj: material_name for obj in lux.getObjects() or []}
+    return mapping
+
+
+def _set_mapping(mapping, material_name):
+    mapping = _objects_mapping(mapping, material_name)
+    if not mapping:
+        raise RuntimeError("No objects in scene")
+    lux.applyMaterialMapping(mapping, link=False)
+
+
+def _set_direct(mapping, material_name):
+    mapping = _objects_mapping(mapping, material_name)
+    if not mapping:
+        raise RuntimeError("No objects in scene")
+    for obj, name in mapping.items():
+        lux.setObjectMaterial(name, obj, link=False)
+
+
+# Assignment methods in the order they are tried; the scene tree can only set one material
+MATERIAL_METHODS = {
+    "uniform": [("scene tree", _set_scene_tree), ("mapping", _set_mapping), ("direct assignment", _set_direct)],
+    "rules": [("mapping", _set_mapping), ("direct assignment", _set_direct)],
+}
+
+
+def _assign_materials(kind, mapping, material_name=None):
+    """
+    Assign materials with the method remembered for this session, detecting it if needed
+
+    Args:
+        kind: "uniform" (one material for everything) or "rules"
+        mapping: {object: material name}, or None to give every object material_name
+        material_name: The single material for "uniform"
+
+    Returns:
+        str: Name of the method used, or None if every method failed
+    """
+    remembered = _material_methods.get(kind)
+    methods = sorted(MATERIAL_METHODS[kind], key=lambda method: method[0] != remembered)
+    for method_name, method in methods:
+        try:
+            method(mapping, material_name)
+        except Exception as e:
+            print(f"Material {method_name} method failed: {e}")
+            continue
+        if method_name != remembered:
+            print(f"Using material {method_name} method for the rest of this session")
+            _material_methods[kind] = method_name
+        return method_name
+    _material_methods.pop(kind, None)
+    return None
+
+
+def _object_name(obj):
+    """Return the part name of a scene object"""
+    for attribute in ("getName", "name"):
+        value = getattr(obj, attribute, None)
+        if callable(value):
+            value = value()
+        if isinstance(value, str):
+            return value
+    return str(obj)
+
 
 def apply_material_to_all_geometry(material_name):
     """
@@ -28,43 +184,139 @@ def apply_material_to_all_geometry(material_name):
     """
     print(f"Applying material '{material_name}' to all geometry...")
 
-    try:
-        # Method 1: Use scene tree to apply material to root (applies to all children)
-        scene_tree = lux.getSceneTree()
-        if scene_tree:
-            scene_tree.setMaterial(material_name, link=False)
-            print(f"✓ Material '{material_name}' applied via scene tree")
-            return True
-    except Exception as e:
-        print(f"Scene tree method failed: {e}")
+    method_name = _assign_materials("uniform", None, material_name)
+    if method_name:
+        print(f"✓ Material '{material_name}' applied via {method_name}")
+        return True
+
+    print(f"✗ Failed to apply material '{material_name}'")
+    return False
+
+
+def apply_material_rules(material_rules):
+    """
+    Apply a rule-based material mapping to the scene in a single assignment
+
+    Args:
+        material_rules: MaterialRules resolving part names to materials
+
+    Returns:
+        bool: True if the materials were applied (or no part matched), False otherwise
+    """
+    mapping = {}
+    for obj in lux.getObjects() or []:
+        material_name = material_rules.resolve(_object_name(obj))
+        if material_name:
+            mapping[obj] = material_name
+
+    if not mapping:
+        print("No parts matched the material rules")
+        return True
+
+    print(f"Applying {len(set(mapping.values()))} material(s) to {len(mapping)} parts...")
+    method_name = _assign_materials("rules", mapping)
+    if method_name:
+        print(f"✓ Materials applied via {method_name}")
+        return True
+
+    print("✗ Failed to apply material rules")
+    return False
+
+
+def get_material_rules(path, material_name=None):
+    """
+    Load a material mapping file once per session
 
+    Args:
+        path: Material mapping JSON file
+        material_name: Optional --material used for parts no rule matches
+
+    Returns:
+        MaterialRules: The rules
+    """
+    key = (path, material_name)
+    if key not in _material_rules:
+        _material_rules[key] = load_material_rules(path).with_default(material_name)
+    return _material_rules[key]
+
+
+def reset_scene():
+    """
+    Start an empty scene so objects (and their memory) from earlier files in this
+    session are not kept and exported again with the next file
+
+    Returns:
+        bool: True if the scene was cleared
+    """
     try:
-        # Method 2: Get all objects and apply via mapping
-        objects = lux.getObjects()
-        if objects:
-            material_mapping = {obj: material_name for obj in objects}
-            lux.applyMaterialMapping(material_mapping, link=False)
-            print(f"✓ Material '{material_name}' applied to {len(objects)} objects via mapping")
-            return True
+        lux.newScene()
+        return True
     except Exception as e:
-        print(f"Object mapping method failed: {e}")
+        print(f"WARNING: Could not clear the scene: {e}")
+        return False
 
+def record_in_index(index, input_path, outputs, export_options, material, stages):
+    """
+    Add the exported GLBs to the metadata index; a failure is only a warning
+
+    Args:
+        index: SQLite index file
+        input_path: Creo file that was converted
+        outputs: Per-file export results ({"output", "ok", "seconds", "bytes"})
+        export_options: Export options that were used
+        material: Material name or material map that was applied
+        stages: Seconds spent per stage
+    """
     try:
-        # Method 3: Direct object material assignment
-        objects = lux.getObjects()
-        if objects:
-            for obj in objects:
-                lux.setObjectMaterial(material_name, obj, link=False)
-            print(f"✓ Material '{material_name}' applied to {len(objects)} objects directly")
-            return True
-    except Exception as e:
-        print(f"Direct assignment method failed: {e}")
+        from glb_index import record_conversion
+    except ImportError as e:
+        print(f"WARNING: GLB index not available: {e}")
+        return False
+    # Keep only the JSON-serialisable options (the lux constants are plain values)
+    options = {key: value for key, value in export_options.items()
+               if isinstance(value, (str, int, float, bool, type(None)))}
+    return record_conversion(index, input_path, [o["output"] for o in outputs], options, material, stages,
+                             round(sum(stages.values()), 3))
 
-    print(f"✗ Failed to apply material '{material_name}'")
-    return False
+def export_gltf(export_path, options, export_format, variant=None):
+    """
+    Export the current scene once
+
+    Args:
+        export_path: Output glTF file
+        options: KeyShot export options
+        export_format: lux export format
+        variant: Variant name to print, if any
+
+    Returns:
+        dict: {"output", "ok", "seconds", "bytes"}
+    """
+    print("Exporting to glTF format...")
+    if variant:
+        print(f"  Variant: {variant}")
+    print(f"  DPI: {options['dpi']}")
+    print(f"  Samples: {options['num_samples']}")
+    print(f"  Ambient Occlusion: {options['occlusion']}")
+    print(f"  Draco Compression: {options['draco_compression']}")
+    print()
 
+    export_started = time.time()
+    try:
+        lux.exportFile(str(export_path), format=export_format, mode=options)
+        print(f"✓ Export successful: {export_path}")
+        exported = True
+    except Exception as e:
+        print(f"✗ Export failed: {e}")
+        exported = False
+    try:
+        output_bytes = os.path.getsize(export_path) if exported else None
+    except OSError:
+        output_bytes = None
+    return {"output": str(export_path), "ok": exported,
+            "seconds": round(time.time() - export_started, 3), "bytes": output_bytes}
 
-def convert_creo_to_gltf(input_file, output_file, export_options=None, material_name=None):
+def convert_creo_to_gltf(input_file, output_file, export_options=None, material_name=None, variants=None,
+                         material_map=None, index=None, budget=None):
     """
     Convert a Creo file to glTF using KeyShot
 
@@ -73,22 +325,42 @@ def convert_creo_to_gltf(input_file, output_file, export_options=None, material_
         output_file: Path to output .glb or .gltf file
         export_options: Dictionary of export options
         material_name: Optional material name to apply to all geometry before export
+        variants: Optional list of export variants (see export_variants.py); the model is
+                  imported once and exported once per variant to <output>_<name>.glb
+        material_map: Optional material mapping file (see material_rules.py); material_name
+                      is then used for parts no rule matches
+        index: Optional SQLite GLB index (see glb_index.py) the exported GLBs are added to
+        budget: Optional {"max_bytes", "max_seconds", "allow_draco"} (see quality_budget.py);
+                an output over max_bytes is exported again with cheaper settings from the
+                same import while the time budget allows (not with variants)
+
+    A "stages" event with the seconds spent in import, material and export
+    and the output size is written once the conversion finishes or fails.
+
+    Returns:
+        bool: True if every output was exported; failures are reported, never raised,
+              so a batch continues with the next file
     """
     input_path = str(Path(input_file).resolve())
     output_path = str(Path(output_file).resolve())
+    stages = {}
     
     print(f"KeyShot Creo to glTF Converter")
     print(f"Input:  {input_path}")
     print(f"Output: {output_path}")
     print()
+    emit_event("started", input=input_path, output=output_path)
     
     # Check if input file exists
     if not os.path.exists(input_path):
         print(f"ERROR: Input file not found: {input_path}")
-        sys.exit(1)
+        emit_stages(input_path, output_path, stages, ok=False, error="Input file not found")
+        return False
     
-    # Import the Creo file
+    # Import the Creo file into an empty scene
     print("Importing Creo file into KeyShot...")
+    stage_started = time.time()
+    reset_scene()
     try:
         import_opts = lux.getImportOptions()
         import_opts["snap_to_ground"] = True
@@ -96,15 +368,33 @@ def convert_creo_to_gltf(input_file, output_file, export_options=None, material_
         import_opts["adjust_camera_look_at"] = True
         
         lux.importFile(input_path, opts=import_opts)
+        stages["import"] = round(time.time() - stage_started, 3)
         print("✓ Import successful")
+        emit_stage_done(input_path, "import", stages["import"])
     except Exception as e:
+        stages["import"] = round(time.time() - stage_started, 3)
         print(f"✗ Import failed: {e}")
-        sys.exit(1)
+        emit_stages(input_path, output_path, stages, ok=False, error=f"Import failed: {e}")
+        return False
 
-    # Apply material to all geometry if specified
-    if material_name:
+    # Apply the material rules, or one material to all geometry, if specified
+    if material_map:
+        stage_started = time.time()
+        try:
+            applied = apply_material_rules(get_material_rules(material_map, material_name))
+        except (OSError, ValueError) as e:
+            print(f"Could not read material map {material_map}: {e}")
+            applied = False
+        if not applied:
+            print("WARNING: Could not apply material rules, continuing with default materials")
+        stages["material"] = round(time.time() - stage_started, 3)
+        emit_stage_done(input_path, "material", stages["material"])
+    elif material_name:
+        stage_started = time.time()
         if not apply_material_to_all_geometry(material_name):
             print(f"WARNING: Could not apply material '{material_name}', continuing with default materials")
+        stages["material"] = round(time.time() - stage_started, 3)
+        emit_stage_done(input_path, "material", stages["material"])
 
     # Set default export options
     default_export_options = {
@@ -123,45 +413,76 @@ def convert_creo_to_gltf(input_file, output_file, export_options=None, material_
     # Determine export format (GLB vs glTF)
     export_format = lux.EXPORT_GLTF
     
-    # Export to glTF
-    print("Exporting to glTF format...")
-    print(f"  DPI: {default_export_options['dpi']}")
-    print(f"  Samples: {default_export_options['num_samples']}")
-    print(f"  Ambient Occlusion: {default_export_options['occlusion']}")
-    print(f"  Draco Compression: {default_export_options['draco_compression']}")
-    print()
-    
-    try:
-        lux.exportFile(output_path, format=export_format, mode=default_export_options)
-        print(f"✓ Export successful: {output_path}")
-        return True
-    except Exception as e:
-        print(f"✗ Export failed: {e}")
-        return False
+    # Export to glTF, once per variant, all from the same import
+    exports = variant_outputs(output_path, default_export_options, variants)
+    outputs = []
+    stage_started = time.time()
+    for export_path, options in exports:
+        outputs.append(export_gltf(export_path, options, export_format, export_path.name if variants else None))
+
+    # Export again with cheaper settings, without importing again, while the GLB is over the size budget
+    quality = None
+    if not variants:
+        settings = default_export_options
+        exported = 1
+        max_bytes = (budget or {}).get("max_bytes")
+        max_seconds = (budget or {}).get("max_seconds")
+        while max_bytes and outputs[-1]["ok"] and (outputs[-1]["bytes"] or 0) > max_bytes:
+            next_settings = cheaper(settings, budget.get("allow_draco", True))
+            if next_settings is None:
+                print("Output is over the size budget, but there are no cheaper settings left")
+                break
+            elapsed = sum(stages.values()) + time.time() - stage_started
+            if max_seconds and elapsed + scale_seconds(outputs[-1]["seconds"], quality_of(settings),
+                                                       next_settings) > max_seconds:
+                print("Output is over the size budget, but another export would exceed the time budget")
+                break
+            print(f"Output is {outputs[-1]['bytes']} bytes, over the {max_bytes} byte budget; exporting again")
+            settings = dict(settings, **next_settings)
+            outputs[-1] = export_gltf(output_path, settings, export_format)
+            exported += 1
+        default_export_options = settings
+        if budget:
+            seconds = sum(stages.values()) + time.time() - stage_started
+            budget_met = (outputs[-1]["ok"] and (not max_bytes or (outputs[-1]["bytes"] or 0) <= max_bytes)
+                          and (not max_seconds or seconds <= max_seconds))
+        else:
+            budget_met = None
+        quality = {"settings": quality_of(settings), "exports": exported, "budget_met": budget_met}
+    stages["export"] = round(time.time() - stage_started, 3)
+    emit_stage_done(input_path, "export", stages["export"])
 
-def batch_convert(input_dir, output_dir, export_options=None, material_name=None):
+    ok = all(o["ok"] for o in outputs)
+    if ok and index:
+        record_in_index(index, input_path, outputs, default_export_options, material_map or material_name, stages)
+    emit_stages(input_path, output_path, stages, ok, outputs if variants else None, quality=quality)
+    return ok
+
+def batch_convert(input_dir, output_dir, export_options=None, material_name=None, recursive=False,
+                  variants=None, material_map=None, index=None, budget=None):
     """
     Batch convert all Creo files in a directory
 
+    Only the newest iteration of each model is converted.
+
     Args:
         input_dir: Directory containing Creo files
         output_dir: Output directory for glTF files
         export_options: Dictionary of export options
         material_name: Optional material name to apply to all geometry before export
+        recursive: Also convert Creo files in subdirectories
+        variants: Optional list of export variants written for every file
+        material_map: Optional material mapping file applied to every file
+        index: Optional SQLite GLB index every exported GLB is added to
+        budget: Optional size/time budget applied to every file
     """
-    input_path = Path(input_dir).resolve()
     output_path = Path(output_dir).resolve()
     
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Find all Creo files (.prt and .asm)
-    creo_files = list(input_path.glob("*.prt")) + list(input_path.glob("*.asm"))
-    
-    # Also look for numbered versions (e.g., .prt.1, .asm.2)
-    for i in range(1, 100):
-        creo_files.extend(input_path.glob(f"*.prt.{i}"))
-        creo_files.extend(input_path.glob(f"*.asm.{i}"))
+    # Find the newest iteration of every Creo model (.prt and .asm)
+    creo_files = list(find_creo_files(input_dir, recursive))
     
     if not creo_files:
         print(f"No Creo files found in {input_dir}")
@@ -169,18 +490,21 @@ def batch_convert(input_dir, output_dir, export_options=None, material_name=None
     
     print(f"Found {len(creo_files)} Creo files")
     print()
+    emit_event("discovered", count=len(creo_files))
     
     success_count = 0
     failed_count = 0
     
     for creo_file in creo_files:
         # Determine output filename
-        output_file = output_path / f"{creo_file.stem}.glb"
+        output_file = output_file_for(creo_file, input_dir, output_path)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
         
         print(f"Converting: {creo_file.name}")
         
         try:
-            if convert_creo_to_gltf(str(creo_file), str(output_file), export_options, material_name):
+            if convert_creo_to_gltf(str(creo_file), str(output_file), export_options, material_name, variants,
+                                    material_map, index, budget):
                 success_count += 1
             else:
                 failed_count += 1
@@ -194,22 +518,75 @@ def batch_convert(input_dir, output_dir, export_options=None, material_name=None
     print(f"  Successful: {success_count}")
     print(f"  Failed: {failed_count}")
 
+def run_worker():
+    """
+    Convert a stream of jobs read from stdin in this KeyShot session
+
+    Each stdin line is a JSON job:
+        {"id": 1, "input": "part.prt", "output": "part.glb",
+         "material": "Steel", "material_map": "materials.json", "export_options": {"dpi": 150},
+         "variants": [{"name": "low", "export_options": {"dpi": 72}}],   (variants optional)
+         "index": "models.sqlite",   (index optional)
+         "budget": {"max_bytes": 5242880, "max_seconds": 60, "allow_draco": true}}   (budget optional)
+
+    One "result" event is written per job. The worker exits at end of input.
+    """
+    emit_event("ready")
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            emit_event("result", id=None, ok=False, error=f"Invalid job: {e}")
+            continue
+
+        started = time.time()
+        error = None
+        try:
+            ok = convert_creo_to_gltf(job["input"], job["output"],
+                                      job.get("export_options"), job.get("material"),
+                                      job.get("variants"), job.get("material_map"), job.get("index"),
+                                      job.get("budget"))
+        except Exception as e:
+            ok = False
+            error = str(e)
+
+        emit_event("result", id=job.get("id"), input=job.get("input"), output=job.get("output"),
+                   ok=bool(ok), error=error, seconds=round(time.time() - started, 3))
+
 def main():
     """Main entry point for the script"""
 
+    if sys.argv[1:2] == ["--worker"]:
+        run_worker()
+        return
+
     # Parse command line arguments
     if len(sys.argv) < 3:
         print("Usage:")
         print("  Single file: <input.prt> <output.glb> [options]")
         print("  Batch:       --batch <input_dir> <output_dir> [options]")
+        print("  Worker:      --worker  (reads JSON jobs from stdin)")
         print()
         print("Options:")
         print("  --material NAME  Material to apply to all geometry before export")
         print("                   Example: --material \"Stainless Steel Brushed Fine 90°\"")
+        print("  --material-map F JSON rules mapping part names/globs to materials")
         print("  --dpi N          Texture resolution (default: 150)")
         print("  --samples N      Baking samples for quality (default: 32)")
         print("  --no-occlusion   Disable ambient occlusion")
         print("  --no-compression Disable Draco compression")
+        print("  --recursive      Batch: also convert files in subdirectories")
+        print("  --variants SPEC  Export several quality levels from one import, e.g.")
+        print("                   \"low:dpi=72,samples=8;high:dpi=300,samples=64\" or \"lod\"")
+        print("  --index FILE     Add the exported GLBs to a SQLite metadata index (glb_index.py)")
+        print("  --max-size BYTES Export again with cheaper settings while the GLB is larger")
+        print("  --max-seconds N  Stop exporting again once the conversion would take longer")
+        print("  --budget-no-draco Never turn Draco on when exporting again (the user disabled it)")
         print()
         print("Examples:")
         print("  Single:  mypart.prt output.glb")
@@ -236,9 +613,35 @@ def main():
     # Parse export options and material
     export_options = {}
     material_name = None
+    material_map = None
+    recursive = False
+    variants = None
+    index = None
+    budget = {}
     i = 0
     while i < len(args):
-        if args[i] == "--material" and i + 1 < len(args):
+        if args[i] == "--recursive":
+            recursive = True
+            i += 1
+        elif args[i] == "--variants" and i + 1 < len(args):
+            variants = parse_variants(args[i + 1])
+            i += 2
+        elif args[i] == "--index" and i + 1 < len(args):
+            index = args[i + 1]
+            i += 2
+        elif args[i] == "--max-size" and i + 1 < len(args):
+            budget["max_bytes"] = int(args[i + 1])
+            i += 2
+        elif args[i] == "--max-seconds" and i + 1 < len(args):
+            budget["max_seconds"] = float(args[i + 1])
+            i += 2
+        elif args[i] == "--budget-no-draco":
+            budget["allow_draco"] = False
+            i += 1
+        elif args[i] == "--material-map" and i + 1 < len(args):
+            material_map = args[i + 1]
+            i += 2
+        elif args[i] == "--material" and i + 1 < len(args):
             material_name = args[i + 1]
             i += 2
         elif args[i] == "--dpi" and i + 1 < len(args):
@@ -258,9 +661,11 @@ def main():
 
     # Run conversion
     if batch_mode:
-        batch_convert(input_path, output_path, export_options, material_name)
+        batch_convert(input_path, output_path, export_options, material_name, recursive, variants,
+                      material_map, index, budget or None)
     else:
-        if not convert_creo_to_gltf(input_file, output_file, export_options, material_name):
+        if not convert_creo_to_gltf(input_file, output_file, export_options, material_name, variants,
+                                    material_map, index, budget or None):
             sys.exit(1)
 
 if __name__ == "__main__":
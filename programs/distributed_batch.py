@@ -0,0 +1,703 @@
+"""
+Distributed batch conversion
+Spreads one batch over several workstations, each using its own KeyShot licenses.
+
+The coordinator (keyshot_convert.py --batch IN OUT --listen PORT) walks the input tree and
+hands out jobs over TCP. Each node (keyshot_convert.py --join HOST:PORT --jobs N) runs N
+persistent KeyShot workers and streams progress events and results back.
+
+- Nodes pull work: a node is only sent a job when one of its KeyShot workers is free,
+  so fast nodes convert more files than slow ones
+- A node that disconnects or stops sending heartbeats has its jobs put back on the queue
+- Once the queue is empty, a file that has been running much longer than usual is also
+  started on an idle node; the first copy to finish is kept and the other is cancelled
+
+Paths are sent as the coordinator sees them, so every node needs the same shared drive;
+--path-map translates path prefixes on nodes that mount it elsewhere.
+
+Protocol, one JSON object per line:
+  node -> coordinator: hello {node, slots, token}, event {job, event}, result {job, result}, heartbeat
+  coordinator -> node: job {job, input, output, ...}, cancel {job}, done, error {error}
+"""
+
+import heapq
+import hmac
+import ipaddress
+import itertools
+import json
+import math
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+from keyshot_worker import KeyShotWorker
+from batch_manifest import BatchManifest, options_hash
+from batch_report import build_report, print_report, write_report, percentile
+from creo_files import find_creo_files, output_file_for
+from export_variants import variant_outputs
+from material_rules import load_material_rules, material_key
+from batch_costs import CostModel
+from glb_index import record_conversion
+
+DEFAULT_PORT = 7700
+HEARTBEAT_SECONDS = 10
+DEFAULT_NODE_TIMEOUT = 60
+# How long a node keeps trying to reach a coordinator that is not up (yet or any more)
+CONNECT_TIMEOUT_SECONDS = 300
+CONNECT_ATTEMPT_SECONDS = 10
+MAX_CONNECT_BACKOFF_SECONDS = 30
+# Start a second copy of a file once it runs this many times longer than the median file
+SPECULATE_FACTOR = 3.0
+SPECULATE_MIN_SECONDS = 60
+SPECULATIVE_SUFFIX = "~spec"
+REPORT_NAME = ".keyshot-report.json"
+
+
+def parse_address(address, default_host=""):
+    """
+    Parse "host:port", ":port" or "port"
+
+    Args:
+        address: Address string
+        default_host: Host used when only a port is given
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, _, port = str(address).rpartition(':')
+    return host or default_host, int(port)
+
+
+def is_local_host(host):
+    """Return True if a listen address only accepts connections from this machine"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _send(sock, lock, message):
+    data = (json.dumps(message) + "\n").encode('utf-8')
+    with lock:
+        sock.sendall(data)
+
+
+def _speculative_output(output_file):
+    output_path = Path(output_file)
+    return output_path.with_name(f"{output_path.stem}{SPECULATIVE_SUFFIX}{output_path.suffix}")
+
+
+class _Node:
+    """A connected node as seen by the coordinator"""
+
+    def __init__(self, name, slots, sock):
+        self.name = name
+        self.slots = slots
+        self.sock = sock
+        self.jobs = {}  # job id -> (output path, speculative)
+        self.last_seen = time.monotonic()
+        self.alive = True
+        self.converted = 0
+        self._send_lock = threading.Lock()
+
+    def send(self, message):
+        _send(self.sock, self._send_lock, message)
+
+    def free_slots(self):
+        return self.slots - len(self.jobs)
+
+
+class Coordinator:
+    """Owns the job list and hands jobs to connected nodes"""
+
+    def __init__(self, settings, manifest, token=None, node_timeout=DEFAULT_NODE_TIMEOUT,
+                 speculate_factor=SPECULATE_FACTOR):
+        """
+        Args:
+            settings: Job fields sent with every job (material, export_options, variants, ...)
+            manifest: BatchManifest that records each finished file
+            token: Optional shared secret nodes must present
+            node_timeout: Seconds without a message before a node is considered lost
+            speculate_factor: Duplicate a straggler once it runs this many times longer than the
+                              median file (0 disables speculative copies)
+        """
+        self.settings = settings
+        self.manifest = manifest
+        self.token = token
+        self.node_timeout = node_timeout
+        self.speculate_factor = speculate_factor
+        self.pending = []  # heap of (-predicted seconds, order, job)
+        self.running = {}  # job id -> {"job": job, "nodes": {node: started}}
+        self.deferred = {}  # job id -> output placement waiting for a cancelled copy to stop
+        self.results = []
+        self.durations = []
+        self.nodes = []
+        self.discovery_done = False
+        self.cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._order = itertools.count()
+
+    # Called with self.cond held --------------------------------------------------------
+
+    def _log(self, message):
+        print(message, flush=True)
+
+    def _requeue(self, job):
+        # Jobs taken back from a node go ahead of everything not yet started
+        heapq.heappush(self.pending, (-math.inf, next(self._order), job))
+
+    def _assign(self, node, job, speculative=False):
+        output = str(_speculative_output(job["output"])) if speculative else job["output"]
+        message = dict(self.settings, type="job", job=job["id"], input=job["input"], output=output)
+        try:
+            node.send(message)
+        except OSError:
+            if not speculative:
+                self._requeue(job)
+            self._lose(node, "connection lost")
+            return False
+        node.jobs[job["id"]] = (output, speculative)
+        entry = self.running.setdefault(job["id"], {"job": job, "nodes": {}})
+        entry["nodes"][node] = time.monotonic()
+        if speculative:
+            self._log(f"[node {node.name}] also starting slow file {Path(job['input']).name}")
+        return True
+
+    def _straggler(self, node):
+        # The longest-running file that only one other node is working on, if it is overdue
+        if not self.speculate_factor or len(self.durations) < 3:
+            return None
+        limit = max(SPECULATE_MIN_SECONDS, self.speculate_factor * percentile(self.durations, 50))
+        now = time.monotonic()
+        candidates = [(now - started, entry["job"]) for entry in self.running.values()
+                      if len(entry["nodes"]) == 1 and node not in entry["nodes"]
+                      for started in entry["nodes"].values()]
+        candidates = [(elapsed, job) for elapsed, job in candidates if elapsed > limit]
+        return max(candidates, key=lambda c: c[0])[1] if candidates else None
+
+    def _dispatch(self):
+        for node in list(self.nodes):
+            while node.alive and node.free_slots() > 0:
+                if self.pending:
+                    if not self._assign(node, heapq.heappop(self.pending)[2]):
+                        break
+                elif self.discovery_done:
+                    job = self._straggler(node)
+                    if not job or not self._assign(node, job, speculative=True):
+                        break
+                else:
+                    break
+
+    def _lose(self, node, reason):
+        if not node.alive:
+            return
+        node.alive = False
+        if node in self.nodes:
+            self.nodes.remove(node)
+        requeued = 0
+        for job_id in list(node.jobs):
+            self._release_deferred(job_id)
+            entry = self.running.get(job_id)
+            if not entry:
+                continue
+            entry["nodes"].pop(node, None)
+            if not entry["nodes"]:
+                del self.running[job_id]
+                self._requeue(entry["job"])
+                requeued += 1
+        node.jobs.clear()
+        try:
+            node.sock.close()
+        except OSError:
+            pass
+        self._log(f"[node {node.name}] lost ({reason}), {requeued} job(s) put back on the queue")
+        self.cond.notify_all()
+
+    def _remove_outputs(self, output):
+        for path, _ in variant_outputs(output, None, self.settings.get("variants")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _place(self, job, spec_output, ok):
+        # Move a winning speculative copy over the real output once no other KeyShot writes it
+        variants = self.settings.get("variants")
+        if spec_output:
+            for (spec_path, _), (final_path, _) in zip(variant_outputs(spec_output, None, variants),
+                                                       variant_outputs(job["output"], None, variants)):
+                try:
+                    os.replace(spec_path, final_path)
+                except OSError as e:
+                    self._log(f"WARNING: Could not move {spec_path} into place: {e}")
+        self.manifest.record(job["input"], variant_outputs(job["output"], None, variants)[0][0], ok)
+
+    def _release_deferred(self, job_id):
+        deferred = self.deferred.pop(job_id, None)
+        if deferred:
+            self._place(*deferred)
+
+    def _finish(self, node, job_id, result):
+        output, speculative = node.jobs.pop(job_id, (None, False))
+        entry = self.running.get(job_id)
+        if entry is None or node not in entry["nodes"]:
+            # Another copy already finished (this one was cancelled) or the job was handed
+            # to another node; drop its output and finish placing the winner's
+            if speculative and output:
+                self._remove_outputs(output)
+            self._release_deferred(job_id)
+            return
+        entry["nodes"].pop(node)
+        if not result.get("ok") and entry["nodes"]:
+            if speculative:
+                self._remove_outputs(output)
+            return  # the other copy may still succeed
+
+        del self.running[job_id]
+        job = entry["job"]
+        for other in entry["nodes"]:
+            try:
+                other.send({"type": "cancel", "job": job_id})
+            except OSError:
+                pass
+        placement = (job, output if result.get("ok") and speculative else None, bool(result.get("ok")))
+        if entry["nodes"]:
+            self.deferred[job_id] = placement
+        else:
+            self._place(*placement)
+
+        result.update(input=job["input"], output=job["output"], node=node.name,
+                      predicted_seconds=job["predicted_seconds"])
+        result.setdefault("seconds", 0.0)
+        self.results.append(result)
+        if result.get("ok"):
+            node.converted += 1
+            self.durations.append(result["seconds"])
+
+        status = "✓" if result.get("ok") else "✗"
+        self._log(f"[node {node.name}] {status} {Path(job['input']).name} ({result['seconds']:.1f}s)"
+                  + (f" {result['error']}" if result.get("error") else ""))
+        self.cond.notify_all()
+
+    # Public -------------------------------------------------------------------------------
+
+    def add(self, creo_file, output_file, predicted_seconds=0.0):
+        """Queue one file for conversion; files predicted to take longest are handed out first"""
+        with self.cond:
+            job = {"id": next(self._ids), "input": str(creo_file), "output": str(output_file),
+                   "predicted_seconds": round(predicted_seconds, 1)}
+            heapq.heappush(self.pending, (-predicted_seconds, next(self._order), job))
+            self._dispatch()
+
+    def discovery_finished(self):
+        """Mark the file list as complete"""
+        with self.cond:
+            self.discovery_done = True
+            self._dispatch()
+            self.cond.notify_all()
+
+    def is_finished(self):
+        return self.discovery_done and not self.pending and not self.running and not self.deferred
+
+    def serve_node(self, sock, address):
+        """
+        Talk to one node until it disconnects
+
+        Args:
+            sock: Connected socket
+            address: Peer address
+        """
+        reader = sock.makefile('rb')
+        node = None
+        try:
+            for line in reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                kind = message.get("type")
+                with self.cond:
+                    if node is None:
+                        if kind != "hello" or (self.token and not hmac.compare_digest(
+                                str(message.get("token") or "").encode('utf-8'), self.token.encode('utf-8'))):
+                            _send(sock, threading.Lock(), {"type": "error", "error": "Invalid hello or token"})
+                            return
+                        slots = message.get("slots", 1)
+                        if isinstance(slots, bool) or not isinstance(slots, int) or slots < 1:
+                            _send(sock, threading.Lock(), {"type": "error", "error": f"Invalid slots: {slots!r}"})
+                            return
+                        node = _Node(f"{message.get('node') or address[0]}", slots, sock)
+                        if self.is_finished():
+                            node.send({"type": "done"})
+                            return
+                        self.nodes.append(node)
+                        self._log(f"[node {node.name}] joined from {address[0]} with {node.slots} KeyShot worker(s)")
+                        self._dispatch()
+                        continue
+                    if not node.alive:
+                        return
+                    node.last_seen = time.monotonic()
+                    if kind == "result":
+                        self._finish(node, message["job"], message.get("result", {}))
+                        self._dispatch()
+        except OSError:
+            pass
+        finally:
+            with self.cond:
+                if node is not None and node.alive:
+                    if self.is_finished():
+                        node.alive = False
+                        if node in self.nodes:
+                            self.nodes.remove(node)
+                    else:
+                        self._lose(node, "disconnected")
+                        self._dispatch()
+
+    def monitor(self):
+        """Drop silent nodes and start speculative copies; run until the batch is finished"""
+        with self.cond:
+            while not self.is_finished():
+                now = time.monotonic()
+                for node in list(self.nodes):
+                    if now - node.last_seen > self.node_timeout:
+                        self._lose(node, f"no heartbeat for {self.node_timeout}s")
+                self._dispatch()
+                self.cond.wait(1)
+            for node in list(self.nodes):
+                try:
+                    node.send({"type": "done"})
+                except OSError:
+                    pass
+
+
+def run_coordinator(listen, input_dir, output_dir, export_options, material_name, token=None,
+                    incremental=False, recursive=False, report_file=None, slowest=10, variants=None,
+                    timeout=None, material_map=None, node_timeout=DEFAULT_NODE_TIMEOUT, index=None):
+    """
+    Coordinate a batch over the nodes that connect to this machine
+
+    Args:
+        listen: "host:port" or "port" to accept nodes on
+        input_dir: Directory containing Creo files (on a drive every node can reach)
+        output_dir: Output directory for glTF files (on a drive every node can reach)
+        export_options: Dictionary of export options
+        material_name: Optional material name to apply to all geometry before export
+        token: Optional shared secret nodes must present; without one the coordinator
+               only listens on localhost
+        incremental: Skip files the output directory's manifest records as up to date
+        recursive: Also convert Creo files in subdirectories
+        report_file: Where to write the JSON performance report
+        slowest: Number of slowest inputs listed in the report
+        variants: Optional list of export variants
+        timeout: Optional per-file wall-clock limit in seconds, enforced on the nodes
+        material_map: Optional material mapping file
+        node_timeout: Seconds without a heartbeat before a node's jobs are reassigned
+        index: Optional SQLite GLB index (see glb_index.py); the coordinator adds every
+               converted output to it at the end of the batch, so nodes never write to it
+
+    Returns:
+        int: 0 if every file converted, 1 otherwise
+    """
+    # Anyone who can reach the port could otherwise join as a node
+    host, port = parse_address(listen, "" if token else "127.0.0.1")
+    if not token and not is_local_host(host):
+        print("ERROR: Set --cluster-token to accept nodes from other machines; "
+              "without a token the coordinator only listens on localhost")
+        return 1
+
+    output_path = Path(output_dir).resolve()
+    output_path.mkdir(parents=True, exist_ok=True)
+    if material_map:
+        material_map = str(Path(material_map).resolve())
+    materials = material_key(material_name, load_material_rules(material_map) if material_map else None)
+    manifest = BatchManifest(output_path, options_hash(export_options, materials, None, variants))
+    costs = CostModel(output_path)
+
+    settings = {"material": material_name, "material_map": material_map,
+                "export_options": export_options or {}, "variants": variants, "timeout": timeout}
+    coordinator = Coordinator(settings, manifest, token, node_timeout)
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            coordinator.serve_node(self.request, self.client_address)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Coordinator listening on {host or '0.0.0.0'}:{port}")
+    print(f"Start nodes with: python keyshot_convert.py --join <this host>:{port} --jobs N")
+    print()
+
+    started = time.monotonic()
+    monitor = threading.Thread(target=coordinator.monitor, daemon=True)
+    monitor.start()
+
+    found_count = 0
+    queued_count = 0
+    # Discovery yields one iteration per model, so an output seen twice is written by two
+    # models (door.prt next to door.asm)
+    claims = {}
+    clashes = []
+    try:
+        for creo_file in find_creo_files(input_dir, recursive):
+            found_count += 1
+            output_file = output_file_for(creo_file, input_dir, output_path)
+            if output_file in claims:
+                clashes.append(f"{creo_file.name}: {output_file.name} is already written by {claims[output_file]}")
+                continue
+            claims[output_file] = creo_file
+            first_output = variant_outputs(output_file, None, variants)[0][0]
+            if incremental and manifest.is_up_to_date(creo_file, first_output):
+                continue
+            queued_count += 1
+            coordinator.add(creo_file, output_file, costs.predict(creo_file))
+    finally:
+        coordinator.discovery_finished()
+    print(f"Found {found_count} Creo files, {queued_count} to convert", flush=True)
+    if clashes:
+        print(f"WARNING: Skipped {len(clashes)} file(s) whose output another model already writes:")
+        for clash in clashes[:10]:
+            print(f"  {clash}")
+
+    try:
+        while monitor.is_alive():
+            monitor.join(1)
+    except KeyboardInterrupt:
+        print("Interrupted, stopping coordinator")
+    server.shutdown()
+    server.server_close()
+    elapsed = time.monotonic() - started
+    manifest.compact()
+
+    results = coordinator.results
+    for r in results:
+        if r["ok"]:
+            costs.record(r["input"], r["seconds"])
+            if index:
+                record_conversion(index, r["input"], [path for path, _ in variant_outputs(r["output"], None, variants)],
+                                  export_options, material_map or material_name, r.get("stages"), r["seconds"])
+    costs.save()
+    failed = [r for r in results if not r["ok"]]
+    nodes = {}
+    for r in results:
+        nodes[r["node"]] = nodes.get(r["node"], 0) + 1
+
+    print()
+    print(f"Distributed batch complete:")
+    print(f"  Successful: {len(results) - len(failed)}")
+    print(f"  Failed: {len(failed)}")
+    if clashes:
+        print(f"  Output clashes: {len(clashes)}")
+    print(f"  Wall time: {elapsed:.1f}s")
+    for name, count in sorted(nodes.items()):
+        print(f"  Node {name}: {count} file(s)")
+    for r in failed:
+        print(f"  ✗ {Path(r['input']).name}" + (f" ({r['error']})" if r.get("error") else ""))
+
+    report = build_report(results, elapsed, slowest)
+    report_path = Path(report_file) if report_file else output_path / REPORT_NAME
+    print()
+    print_report(report)
+    write_report(report, report_path)
+    print(f"  Report written to {report_path}")
+
+    return 1 if failed or clashes or not coordinator.is_finished() else 0
+
+
+def map_path(path, path_map):
+    """
+    Translate a coordinator path to this node's mount point
+
+    Args:
+        path: Path as the coordinator sees it (None or empty is returned unchanged)
+        path_map: List of (coordinator prefix, local prefix) pairs; the first prefix the
+                  path starts with is replaced and separators are converted to this OS's
+
+    Returns:
+        str: Local path (unchanged if no prefix matches)
+    """
+    if not path:
+        return path
+    for remote, local in path_map:
+        if path.startswith(remote):
+            rest = path[len(remote):].replace('/', os.sep).replace('\\', os.sep)
+            return local + rest
+    return path
+
+
+def _connect(host, port, timeout):
+    """
+    Connect to the coordinator, retrying with backoff while it is not reachable yet
+
+    Returns:
+        socket: The connection, or None if the coordinator could not be reached in time
+    """
+    deadline = time.monotonic() + timeout
+    delay = 1.0
+    waiting = False
+    while True:
+        try:
+            return socket.create_connection((host, port), timeout=CONNECT_ATTEMPT_SECONDS)
+        except OSError as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"ERROR: cannot reach coordinator {host}:{port}: {e}")
+                return None
+            if not waiting:
+                print(f"Waiting for coordinator {host}:{port} ({e})", flush=True)
+                waiting = True
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, MAX_CONNECT_BACKOFF_SECONDS)
+
+
+def run_node(coordinator, keyshot_path, script_path, slots=1, name=None, token=None, path_map=None,
+             recycle_after=None, max_rss_mb=None, connect_timeout=CONNECT_TIMEOUT_SECONDS):
+    """
+    Convert jobs handed out by a coordinator until it says the batch is done
+
+    A coordinator that is not running yet, or a connection that drops during the batch,
+    is retried with backoff for up to connect_timeout seconds; files that were running
+    when the connection dropped are reassigned by the coordinator.
+
+    Args:
+        coordinator: "host:port" of the coordinator
+        keyshot_path: Path to KeyShot executable
+        script_path: Path to the KeyShot Python script
+        slots: Number of KeyShot workers on this node
+        name: Node name shown by the coordinator (default: host name)
+        token: Shared secret, if the coordinator requires one
+        path_map: List of (coordinator prefix, local prefix) pairs
+        recycle_after: Restart a worker's KeyShot after this many files
+        max_rss_mb: Restart a worker's KeyShot once its resident memory exceeds this many MB
+        connect_timeout: Seconds to keep trying to reach the coordinator
+
+    Returns:
+        int: 0 when the coordinator finished the batch, 1 if it refused this node or
+             could not be reached
+    """
+    host, port = parse_address(coordinator, "localhost")
+    name = name or socket.gethostname()
+    while True:
+        sock = _connect(host, port, connect_timeout)
+        if sock is None:
+            return 1
+        sock.settimeout(None)
+        exit_code = _node_session(sock, host, port, keyshot_path, script_path, slots, name, token,
+                                  path_map or [], recycle_after, max_rss_mb)
+        if exit_code is not None:
+            return exit_code
+        print("Connection to the coordinator lost, reconnecting", flush=True)
+
+
+def _node_session(sock, host, port, keyshot_path, script_path, slots, name, token, path_map,
+                  recycle_after, max_rss_mb):
+    """
+    Run one connection to the coordinator
+
+    Returns:
+        int: 0 when the batch is done, 1 if the coordinator refused this node,
+             None if the connection was lost
+    """
+    send_lock = threading.Lock()
+
+    def send(message):
+        try:
+            _send(sock, send_lock, message)
+        except OSError:
+            pass
+
+    send({"type": "hello", "node": name, "slots": slots, "token": token})
+    print(f"Joined coordinator {host}:{port} as {name} with {slots} KeyShot worker(s)", flush=True)
+
+    jobs = queue.Queue()
+    running = {}
+    running_lock = threading.Lock()
+    stopped = threading.Event()
+
+    def worker():
+        keyshot = KeyShotWorker(keyshot_path, script_path, recycle_after, max_rss_mb)
+        try:
+            while True:
+                job = keyshot.take(jobs)
+                if job is None:
+                    return
+                job_id = job["job"]
+                output_file = map_path(job["output"], path_map)
+                Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+                with running_lock:
+                    running[job_id] = keyshot
+
+                def on_event(event, job_id=job_id):
+                    send({"type": "event", "job": job_id, "event": event})
+
+                try:
+                    result, lines = keyshot.convert(map_path(job["input"], path_map), output_file,
+                                                    job.get("material"), job.get("export_options"),
+                                                    job.get("variants"), job.get("timeout"),
+                                                    map_path(job.get("material_map"), path_map), on_event)
+                except Exception as e:
+                    result = {"ok": False, "error": str(e), "seconds": 0.0, "stages": {}}
+                with running_lock:
+                    running.pop(job_id, None)
+                status = "✓" if result["ok"] else "✗"
+                print(f"{status} {Path(job['input']).name} ({result.get('seconds', 0):.1f}s)", flush=True)
+                send({"type": "result", "job": job_id, "result": result})
+        finally:
+            keyshot.close()
+
+    def heartbeat():
+        while not stopped.wait(HEARTBEAT_SECONDS):
+            send({"type": "heartbeat"})
+
+    threads = [threading.Thread(target=worker) for _ in range(slots)]
+    for thread in threads:
+        thread.start()
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    exit_code = None
+    try:
+        for line in sock.makefile('rb'):
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            kind = message.get("type")
+            if kind == "job":
+                jobs.put(message)
+            elif kind == "cancel":
+                with running_lock:
+                    keyshot = running.get(message["job"])
+                if keyshot:
+                    keyshot.kill()
+            elif kind == "done":
+                exit_code = 0
+                break
+            elif kind == "error":
+                print(f"ERROR: Coordinator refused this node: {message.get('error')}")
+                exit_code = 1
+                break
+    except OSError:
+        pass
+    finally:
+        stopped.set()
+        if exit_code != 0:
+            while not jobs.empty():
+                jobs.get_nowait()
+            # Nobody will collect the results; stop the running conversions
+            with running_lock:
+                for keyshot in running.values():
+                    keyshot.kill()
+        for _ in threads:
+            jobs.put(None)
+        for thread in threads:
+            thread.join()
+        sock.close()
+
+    return exit_code
@@ -0,0 +1,113 @@
+"""
+Export variant specifications
+Parses --variants, which exports several quality levels of a model from one KeyShot
+import, e.g. for progressive loading in the web viewer:
+
+    --variants "low:dpi=72,samples=8;medium:dpi=150,samples=32;high:dpi=300,samples=64"
+    --variants lod      (shorthand for the three levels above)
+
+Each variant is written next to the requested output with its name appended:
+part.glb -> part_low.glb, part_medium.glb, part_high.glb
+
+Used by both the wrapper and the KeyShot script, so it must only depend on the standard library.
+"""
+
+from pathlib import Path
+
+VARIANT_PRESETS = {
+    "lod": "low:dpi=72,samples=8;medium:dpi=150,samples=32;high:dpi=300,samples=64",
+}
+
+# variant key -> (KeyShot export option, value type)
+VARIANT_OPTIONS = {
+    "dpi": ("dpi", int),
+    "samples": ("num_samples", int),
+    "occlusion": ("occlusion", bool),
+    "compression": ("draco_compression", bool),
+}
+
+
+def _parse_bool(value):
+    value = value.strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Expected on/off, got '{value}'")
+
+
+def parse_variants(spec):
+    """
+    Parse a variant specification
+
+    Args:
+        spec: "name:key=value,...;name:..." or a preset name such as "lod"
+
+    Returns:
+        list: [{"name": "low", "export_options": {"dpi": 72, "num_samples": 8}}, ...]
+    """
+    spec = VARIANT_PRESETS.get(spec.strip(), spec)
+
+    variants = []
+    for part in spec.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, settings = part.partition(':')
+        name = name.strip()
+        if not name:
+            raise ValueError(f"Variant without a name: '{part}'")
+
+        export_options = {}
+        for setting in settings.split(','):
+            if not setting.strip():
+                continue
+            key, _, value = setting.partition('=')
+            key = key.strip()
+            if key not in VARIANT_OPTIONS:
+                raise ValueError(f"Unknown variant option '{key}' (use {', '.join(VARIANT_OPTIONS)})")
+            option, value_type = VARIANT_OPTIONS[key]
+            export_options[option] = _parse_bool(value) if value_type is bool else value_type(value)
+
+        variants.append({"name": name, "export_options": export_options})
+
+    names = [v["name"] for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique")
+    if not variants:
+        raise ValueError("No variants given")
+    return variants
+
+
+def variant_output_file(output_file, name):
+    """
+    Return the output path for one variant ("part.glb", "low" -> "part_low.glb")
+
+    Args:
+        output_file: Requested output path
+        name: Variant name
+
+    Returns:
+        Path: Variant output path
+    """
+    output_path = Path(output_file)
+    return output_path.with_name(f"{output_path.stem}_{name}{output_path.suffix}")
+
+
+def variant_outputs(output_file, export_options=None, variants=None):
+    """
+    List every file a conversion will write, with its export options
+
+    Args:
+        output_file: Requested output path
+        export_options: Options shared by all variants
+        variants: Parsed variants, or None for a single output
+
+    Returns:
+        list: (output path, export options) pairs
+    """
+    export_options = export_options or {}
+    if not variants:
+        return [(Path(output_file), dict(export_options))]
+    return [(variant_output_file(output_file, v["name"]), dict(export_options, **v["export_options"]))
+            for v in variants]
@@ -0,0 +1,253 @@
+"""
+Watch a Creo input tree for newly saved iterations
+Turns file system events into a stream of Creo files that are ready to convert, so a
+long-running batch picks up a new `bracket.prt.12` seconds after Creo saves it instead
+of waiting for the next scheduled rescan of the whole vault.
+
+On Linux the tree is watched with inotify (through ctypes, no extra package); elsewhere,
+on network shares (where inotify does not see writes made by other machines) and when
+the inotify watch limit is reached, the tree is polled instead.
+
+A file is reported once it has had no events and kept the same size and modification
+time for the settle time. When Creo writes several iterations of a model in a burst,
+only the newest one is reported once all of them have settled.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from creo_files import find_creo_files, parse_creo_name
+
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_SECONDS = 10.0
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _model_key(path):
+    parsed = parse_creo_name(path.name)
+    return path.parent, parsed[0].lower()
+
+
+class _Inotify:
+    """Minimal inotify binding: one watch per directory"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.directories = {}
+
+    def add(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Cannot watch {directory}: {os.strerror(errno)}")
+        self.directories[wd] = Path(directory)
+
+    def read(self, timeout):
+        """Return (directory, name, mask) for the events that arrive within timeout seconds"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            events.append((self.directories.get(wd), os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Reports Creo files under a directory as they are saved"""
+
+    def __init__(self, input_dir, recursive=False, settle=DEFAULT_SETTLE_SECONDS, poll_interval=None):
+        """
+        Args:
+            input_dir: Directory to watch
+            recursive: Also watch subdirectories (including ones created later)
+            settle: Seconds a file must stay unchanged before it is reported
+            poll_interval: Poll the tree every N seconds instead of using inotify
+                           (default: inotify where available, else poll every 10s)
+        """
+        self.input_dir = Path(input_dir).resolve()
+        self.recursive = recursive
+        self.settle = settle
+        self.poll_interval = poll_interval or DEFAULT_POLL_SECONDS
+        self.mode = "polling"
+        self._inotify = None
+        self._snapshot = {}
+        if poll_interval is None and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(self.input_dir)
+                self.mode = "inotify"
+            except (OSError, AttributeError) as e:
+                print(f"WARNING: inotify not available ({e}), polling every {self.poll_interval:g}s")
+                self._close_inotify()
+        if self._inotify is None:
+            self._snapshot = self._scan()
+
+    def _close_inotify(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _watch_tree(self, directory):
+        # Returns the Creo files already in the newly watched directories
+        found = []
+        pending = [Path(directory)]
+        while pending:
+            current = pending.pop()
+            self._inotify.add(current)
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                pending.append(Path(entry.path))
+                        elif parse_creo_name(entry.name):
+                            found.append(Path(entry.path))
+            except OSError:
+                continue
+        return found
+
+    def _scan(self):
+        snapshot = {}
+        pending = [self.input_dir]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.recursive:
+                                    pending.append(Path(entry.path))
+                            elif parse_creo_name(entry.name):
+                                stat = entry.stat()
+                                snapshot[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return snapshot
+
+    def _events(self, timeout):
+        """Return Creo files that changed, waiting up to timeout seconds"""
+        if self._inotify is None:
+            time.sleep(timeout)
+            snapshot = self._scan()
+            changed = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+            self._snapshot = snapshot
+            return changed
+
+        changed = []
+        for directory, name, mask in self._inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; anything may have changed
+                print("WARNING: Watch event queue overflowed, rescanning the input tree")
+                changed.extend(find_creo_files(self.input_dir, self.recursive))
+            elif directory is None:
+                continue
+            elif mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        changed.extend(self._watch_tree(directory / name))
+                    except OSError as e:
+                        print(f"WARNING: {e}, switching to polling every {self.poll_interval:g}s")
+                        self._close_inotify()
+                        self._snapshot = self._scan()
+                        return list(self._snapshot)
+            elif parse_creo_name(name):
+                changed.append(directory / name)
+        return changed
+
+    def changes(self):
+        """
+        Yield Creo files as they become ready to convert; runs until interrupted
+
+        Yields:
+            Path: Newest iteration of a model that was saved, once it has settled
+        """
+        pending = {}  # path -> (time of last event, (size, mtime) at that time)
+        while True:
+            if self._inotify is None:
+                timeout = self.poll_interval
+            elif pending:
+                oldest = min(seen for seen, _ in pending.values())
+                timeout = max(min(self.settle - (time.monotonic() - oldest), 1.0), 0.05)
+            else:
+                timeout = 1.0
+            for path in self._events(timeout):
+                pending[path] = (time.monotonic(), _signature(path))
+
+            now = time.monotonic()
+            ready = []
+            for path, (seen, signature) in list(pending.items()):
+                if now - seen < self.settle:
+                    continue
+                current = _signature(path)
+                if current is None:
+                    del pending[path]  # deleted or renamed away
+                elif current != signature:
+                    pending[path] = (now, current)
+                else:
+                    ready.append(path)
+
+            # Wait until every iteration of a model that is still being written has settled
+            busy = {_model_key(path) for path in pending if path not in ready}
+            models = set()
+            for path in ready:
+                if _model_key(path) not in busy:
+                    del pending[path]
+                    models.add(_model_key(path))
+
+            for directory, model in sorted(models):
+                newest = next((path for path in find_creo_files(directory)
+                               if parse_creo_name(path.name)[0].lower() == model), None)
+                if newest is not None:
+                    yield newest
+
+    def close(self):
+        """Stop watching"""
+        self._close_inotify()
@@ -0,0 +1,391 @@
+"""
+Indexed GLB bundles
+Packs many per-part GLBs into one file with an offset index, so the viewer's parts can
+be served from a single file with byte-range reads instead of hundreds of small files.
+
+Bundle layout (all little-endian):
+    header   magic "GLBUNDLE", version 1 (uint32), reserved (uint32)
+    parts    each GLB stored unchanged, starting on an 8-byte boundary
+    index    UTF-8 JSON: {"version": 1, "parts": {name: {"offset", "length", "mtime"}}}
+    trailer  magic "GLBINDEX", index offset (uint64), index length (uint64)
+
+A reader takes the last 24 bytes, reads the index they point to and can then return any
+part as `bundle[offset:offset + length]`. Appending writes the new parts, a new index
+and a new trailer after the existing ones, so the bundle is never rewritten; parts that
+are replaced or superseded indexes stay behind as dead space until `compact`. If an
+append is still running or was interrupted, readers use the last complete trailer and
+the next append truncates the bundle back to it. Appends and compaction hold an OS lock
+on `<bundle>.lock`, so concurrent packs of the same bundle run one after the other.
+
+Usage:
+  python glb_bundle.py pack project.glbundle ./gltf_output    # add new and changed GLBs
+  python glb_bundle.py list project.glbundle
+  python glb_bundle.py extract project.glbundle sub/door.glb -o door.glb
+  python glb_bundle.py compact project.glbundle
+"""
+
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+from pathlib import Path
+
+from glb_container import GLB_MAGIC
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _try_lock(f):
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(f):
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+BUNDLE_MAGIC = b'GLBUNDLE'
+INDEX_MAGIC = b'GLBINDEX'
+BUNDLE_VERSION = 1
+HEADER = struct.Struct('<8sII')
+TRAILER = struct.Struct('<8sQQ')
+ALIGNMENT = 8
+
+
+class BundleError(ValueError):
+    """Raised when a file is not a valid GLB bundle"""
+
+
+def _parse_index(data, trailer_offset):
+    # Returns the index the trailer at trailer_offset points to, or None if it is not valid
+    magic, index_offset, index_length = TRAILER.unpack_from(data, trailer_offset)
+    if magic != INDEX_MAGIC or index_offset + index_length != trailer_offset or index_offset < HEADER.size:
+        return None
+    try:
+        index = json.loads(bytes(data[index_offset:trailer_offset]).decode('utf-8'))
+    except ValueError:
+        return None
+    return index if isinstance(index, dict) and isinstance(index.get("parts"), dict) else None
+
+
+def _read_index(data):
+    """
+    Find the bundle index, looking back for the last complete trailer if the file ends
+    in an append that is still running or was interrupted
+
+    Args:
+        data: Bundle contents (bytes or mmap)
+
+    Returns:
+        tuple: (index dict, end offset of the trailer that was used)
+    """
+    if len(data) < HEADER.size or bytes(data[:8]) != BUNDLE_MAGIC:
+        raise BundleError("Not a GLB bundle")
+    version = HEADER.unpack_from(data, 0)[1]
+    if version != BUNDLE_VERSION:
+        raise BundleError(f"Unsupported bundle version {version}")
+    if len(data) == HEADER.size:
+        return {"version": BUNDLE_VERSION, "parts": {}}, HEADER.size
+
+    end = len(data)
+    while end >= HEADER.size + TRAILER.size:
+        index = _parse_index(data, end - TRAILER.size)
+        if index is not None:
+            return index, end
+        # The previous trailer must end before this one starts
+        previous = data.rfind(INDEX_MAGIC, HEADER.size, end - TRAILER.size - 1 + len(INDEX_MAGIC))
+        if previous < 0:
+            break
+        end = previous + TRAILER.size
+    return {"version": BUNDLE_VERSION, "parts": {}}, HEADER.size
+
+
+class GLBBundle:
+    """Read-only, memory-mapped view of a bundle"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Bundle file
+
+        Raises:
+            BundleError: If the file is not a valid bundle
+        """
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.index, _ = _read_index(self._map)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        self.parts = self.index["parts"]
+
+    def names(self):
+        """Return the part names in the bundle"""
+        return sorted(self.parts)
+
+    def locate(self, name):
+        """
+        Return where a part is stored, e.g. for an HTTP byte-range response
+
+        Args:
+            name: Part name (path of the GLB relative to the packed directory)
+
+        Returns:
+            tuple: (offset, length) in bytes
+
+        Raises:
+            KeyError: If the bundle has no such part
+        """
+        entry = self.parts[name]
+        return entry["offset"], entry["length"]
+
+    def read(self, name):
+        """
+        Return a part's GLB without copying it
+
+        Args:
+            name: Part name
+
+        Returns:
+            memoryview: The GLB bytes; release it before closing the bundle
+        """
+        offset, length = self.locate(name)
+        return memoryview(self._map)[offset:offset + length]
+
+    def stats(self):
+        """Return the number of parts, live bytes and total bundle size"""
+        live = sum(entry["length"] for entry in self.parts.values())
+        return {"parts": len(self.parts), "live_bytes": live, "file_bytes": len(self._map)}
+
+    def close(self):
+        """Unmap the bundle"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextlib.contextmanager
+def bundle_lock(bundle_path):
+    """Hold the bundle's inter-process write lock (<bundle>.lock), waiting for it if needed"""
+    lock_path = Path(bundle_path).with_name(Path(bundle_path).name + ".lock")
+    with open(lock_path, 'a+b') as lock_file:
+        while not _try_lock(lock_file):
+            time.sleep(0.1)
+        try:
+            yield
+        finally:
+            _unlock(lock_file)
+
+
+def append_parts(bundle_path, parts):
+    """
+    Add GLBs to a bundle (created if missing) without rewriting what is already there
+
+    Args:
+        bundle_path: Bundle file
+        parts: Iterable of (name, GLB file path); a name already in the bundle is replaced
+
+    Returns:
+        list: Names that were written
+
+    Raises:
+        BundleError: If a source is not a GLB or the existing file is not a bundle
+    """
+    with bundle_lock(bundle_path):
+        return _append_parts(Path(bundle_path), parts)
+
+
+def _append_parts(bundle_path, parts):
+    # Caller holds the bundle lock: the file is truncated to the last trailer first
+    if not bundle_path.exists() or bundle_path.stat().st_size == 0:
+        with open(bundle_path, 'wb') as f:
+            f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0))
+
+    written = []
+    with open(bundle_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            index, end = _read_index(data)
+        f.truncate(end)
+        f.seek(end)
+
+        for name, source in parts:
+            with open(source, 'rb') as src:
+                if src.read(4) != GLB_MAGIC:
+                    raise BundleError(f"{source} is not a GLB file")
+                src.seek(0)
+                f.write(b'\0' * (-f.tell() % ALIGNMENT))
+                offset = f.tell()
+                shutil.copyfileobj(src, f, 1024 * 1024)
+            index["parts"][name] = {"offset": offset, "length": f.tell() - offset,
+                                    "mtime": os.path.getmtime(source)}
+            written.append(name)
+
+        index["version"] = BUNDLE_VERSION
+        index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index_bytes)
+        f.write(TRAILER.pack(INDEX_MAGIC, index_offset, len(index_bytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    return written
+
+
+def pack_directory(bundle_path, directory):
+    """
+    Add every GLB under a directory that is new or changed since it was last bundled
+
+    Args:
+        bundle_path: Bundle file
+        directory: Directory with GLBs (e.g. a batch output directory); part names are
+                   paths relative to it
+
+    Returns:
+        list: Names that were written
+    """
+    directory = Path(directory)
+    bundle_path = Path(bundle_path)
+    with bundle_lock(bundle_path):
+        known = {}
+        if bundle_path.exists() and bundle_path.stat().st_size:
+            with open(bundle_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                known = _read_index(data)[0]["parts"]
+
+        changed = []
+        for path in sorted(directory.rglob('*.glb')):
+            name = path.relative_to(directory).as_posix()
+            entry = known.get(name)
+            if entry and entry["length"] == path.stat().st_size and entry.get("mtime") == path.stat().st_mtime:
+                continue
+            changed.append((name, path))
+        return _append_parts(bundle_path, changed) if changed else []
+
+
+def compact(bundle_path):
+    """
+    Rewrite a bundle without replaced parts and old indexes
+
+    Args:
+        bundle_path: Bundle file
+
+    Returns:
+        tuple: (size before, size after) in bytes
+    """
+    bundle_path = Path(bundle_path)
+    with bundle_lock(bundle_path):
+        return _compact(bundle_path)
+
+
+def _compact(bundle_path):
+    temp = bundle_path.with_name(bundle_path.name + ".tmp")
+    with GLBBundle(bundle_path) as bundle:
+        before = len(bundle._map)
+        index = {"version": BUNDLE_VERSION, "parts": {}}
+        with open(temp, 'wb') as f:
+            f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0))
+            for name in bundle.names():
+                f.write(b'\0' * (-f.tell() % ALIGNMENT))
+                offset = f.tell()
+                part = bundle.read(name)
+                f.write(part)
+                part.release()
+                index["parts"][name] = dict(bundle.parts[name], offset=offset)
+            index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+            index_offset = f.tell()
+            f.write(index_bytes)
+            f.write(TRAILER.pack(INDEX_MAGIC, index_offset, len(index_bytes)))
+    os.replace(temp, bundle_path)
+    return before, bundle_path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack GLBs into an indexed bundle and read parts back',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1]
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack = commands.add_parser('pack', help='Add new and changed GLBs from a directory')
+    pack.add_argument('bundle')
+    pack.add_argument('directory')
+    listing = commands.add_parser('list', help='List parts with their offsets')
+    listing.add_argument('bundle')
+    listing.add_argument('--json', action='store_true', help='Print the index as JSON')
+    extract = commands.add_parser('extract', help='Write one part to a file')
+    extract.add_argument('bundle')
+    extract.add_argument('name')
+    extract.add_argument('-o', '--output', help='Output file (default: the part file name)')
+    compact_parser = commands.add_parser('compact', help='Reclaim space from replaced parts')
+    compact_parser.add_argument('bundle')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'pack':
+            if not Path(args.directory).is_dir():
+                print(f"ERROR: Not a directory: {args.directory}")
+                return 1
+            written = pack_directory(args.bundle, args.directory)
+            with GLBBundle(args.bundle) as bundle:
+                stats = bundle.stats()
+            print(f"Bundled {len(written)} new or changed part(s) into {args.bundle} "
+                  f"({stats['parts']} parts, {stats['file_bytes'] / 1e6:.2f} MB)")
+        elif args.command == 'list':
+            with GLBBundle(args.bundle) as bundle:
+                if args.json:
+                    print(json.dumps(bundle.index, indent=2))
+                    return 0
+                for name in bundle.names():
+                    offset, length = bundle.locate(name)
+                    print(f"  {offset:>12} {length:>10}  {name}")
+                stats = bundle.stats()
+            dead = stats['file_bytes'] - stats['live_bytes']
+            print(f"{stats['parts']} parts, {stats['live_bytes'] / 1e6:.2f} MB of GLB data, "
+                  f"{dead / 1e6:.2f} MB reclaimable with compact")
+        elif args.command == 'extract':
+            with GLBBundle(args.bundle) as bundle:
+                output = args.output or Path(args.name).name
+                part = bundle.read(args.name)
+                with open(output, 'wb') as f:
+                    f.write(part)
+                part.release()
+            print(f"✓ {args.name} -> {output}")
+        elif args.command == 'compact':
+            before, after = compact(args.bundle)
+            print(f"Compacted {args.bundle}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+    except KeyError as e:
+        print(f"ERROR: No part named {e} in {args.bundle}")
+        return 1
+    except (OSError, BundleError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+GLB container reading and writing
+Splits a binary glTF (.glb) file into its JSON document and binary chunk and puts them
+back together. Pure Python, so it can be used by the wrapper tools without KeyShot.
+
+GLB layout (all little-endian):
+    header  magic "glTF", version 2, total length
+    chunk   length, type "JSON", UTF-8 JSON padded with spaces to 4 bytes
+    chunk   length, type "BIN\\0", binary buffer padded with zeros to 4 bytes (optional)
+"""
+
+import json
+import struct
+
+GLB_MAGIC = b'glTF'
+CHUNK_JSON = b'JSON'
+CHUNK_BIN = b'BIN\0'
+
+
+class GLBError(ValueError):
+    """Raised when data is not a valid GLB container"""
+
+
+def read_glb(data):
+    """
+    Parse GLB bytes
+
+    Args:
+        data: Contents of a .glb file
+
+    Returns:
+        tuple: (glTF JSON document as a dict, binary chunk as bytes or None)
+    """
+    if len(data) < 20:
+        raise GLBError("File too short to be a GLB")
+
+    magic, version, length = struct.unpack_from('<4sII', data, 0)
+    if magic != GLB_MAGIC:
+        raise GLBError("Missing glTF magic")
+    if version != 2:
+        raise GLBError(f"Unsupported GLB version {version}")
+    if length > len(data):
+        raise GLBError("Truncated GLB")
+
+    gltf = None
+    binary = None
+    offset = 12
+    while offset + 8 <= length:
+        chunk_length, chunk_type = struct.unpack_from('<I4s', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON and gltf is None:
+            gltf = json.loads(bytes(chunk).decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and binary is None:
+            binary = bytes(chunk)
+        offset += 8 + chunk_length
+
+    if gltf is None:
+        raise GLBError("GLB has no JSON chunk")
+    return gltf, binary
+
+
+def write_glb(gltf, binary=None):
+    """
+    Build GLB bytes
+
+    Args:
+        gltf: glTF JSON document
+        binary: Binary buffer, or None for a JSON-only GLB
+
+    Returns:
+        bytes: Contents of a .glb file
+    """
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * ((4 - len(json_chunk) % 4) % 4)
+
+    parts = [struct.pack('<I4s', len(json_chunk), CHUNK_JSON), json_chunk]
+    if binary is not None:
+        binary = binary + b'\0' * ((4 - len(binary) % 4) % 4)
+        parts += [struct.pack('<I4s', len(binary), CHUNK_BIN), binary]
+
+    body = b''.join(parts)
+    return struct.pack('<4sII', GLB_MAGIC, 2, 12 + len(body)) + body
+
+
+def read_glb_file(path):
+    """
+    Parse a .glb file
+
+    Args:
+        path: GLB file path
+
+    Returns:
+        tuple: (glTF JSON document, binary chunk or None)
+    """
+    with open(path, 'rb') as f:
+        return read_glb(f.read())
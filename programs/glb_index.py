@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+SQLite metadata index of converted GLBs
+Records what the web app and reports need to know about each GLB (triangle and vertex
+counts, bounding box, material names, texture sizes) together with the source model,
+its Creo iteration, the export options and the conversion timings, so listing
+hundreds of items is a query instead of parsing every GLB.
+
+The KeyShot script adds an entry after every successful export when it is given an
+index (keyshot_convert.py --index PATH). Existing output directories are added with
+`backfill`, which reads the batch manifest to find each GLB's source.
+
+Only the GLB's JSON and the image headers are read; geometry counts and bounds come
+from the accessors, so Draco-compressed meshes are indexed without decoding them.
+Used by the KeyShot script too, so it must only depend on the standard library.
+
+Usage:
+  python glb_index.py backfill models.sqlite ./gltf_output [./more_output ...]
+  python glb_index.py query models.sqlite --material "Steel" --min-triangles 100000 --latest
+  python glb_index.py show models.sqlite ./gltf_output/door.glb
+"""
+
+import argparse
+import base64
+import json
+import os
+import sqlite3
+import struct
+import sys
+import time
+from pathlib import Path
+
+from creo_files import parse_creo_name
+from glb_container import GLBError, read_glb
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS glbs (
+    source TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    output_bytes INTEGER,
+    triangles INTEGER,
+    vertices INTEGER,
+    meshes INTEGER,
+    nodes INTEGER,
+    min_x REAL, min_y REAL, min_z REAL,
+    max_x REAL, max_y REAL, max_z REAL,
+    materials TEXT,
+    textures INTEGER,
+    texture_max_size INTEGER,
+    texture_bytes INTEGER,
+    texture_sizes TEXT,
+    material TEXT,
+    export_options TEXT,
+    stages TEXT,
+    seconds REAL,
+    converted_at TEXT,
+    PRIMARY KEY (source, iteration, output)
+);
+CREATE INDEX IF NOT EXISTS glbs_output ON glbs (output);
+"""
+
+COLUMNS = ("source", "iteration", "output", "output_bytes", "triangles", "vertices", "meshes",
+           "nodes", "min_x", "min_y", "min_z", "max_x", "max_y", "max_z", "materials", "textures",
+           "texture_max_size", "texture_bytes", "texture_sizes", "material", "export_options",
+           "stages", "seconds", "converted_at")
+
+# Triangles per primitive for the glTF primitive modes that draw triangles
+TRIANGLES, TRIANGLE_STRIP, TRIANGLE_FAN = 4, 5, 6
+
+
+def _multiply(a, b):
+    # 4x4 matrices in glTF's column-major order
+    return [sum(a[k * 4 + row] * b[col * 4 + k] for k in range(4)) for col in range(4) for row in range(4)]
+
+
+def _node_matrix(node):
+    if "matrix" in node:
+        return list(node["matrix"])
+    tx, ty, tz = node.get("translation", (0, 0, 0))
+    x, y, z, w = node.get("rotation", (0, 0, 0, 1))
+    sx, sy, sz = node.get("scale", (1, 1, 1))
+    return [
+        (1 - 2 * (y * y + z * z)) * sx, (2 * (x * y + z * w)) * sx, (2 * (x * z - y * w)) * sx, 0,
+        (2 * (x * y - z * w)) * sy, (1 - 2 * (x * x + z * z)) * sy, (2 * (y * z + x * w)) * sy, 0,
+        (2 * (x * z + y * w)) * sz, (2 * (y * z - x * w)) * sz, (1 - 2 * (x * x + y * y)) * sz, 0,
+        tx, ty, tz, 1,
+    ]
+
+
+def _image_size(data):
+    # (width, height) from a PNG or JPEG header, or None
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = data[offset + 1]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
+
+
+def _image_bytes(gltf, binary, image, base_dir):
+    if "bufferView" in image:
+        view = gltf["bufferViews"][image["bufferView"]]
+        start = view.get("byteOffset", 0)
+        buffer = gltf["buffers"][view.get("buffer", 0)]
+        if "uri" in buffer:
+            # Shared part library buffer (see glb_library.py)
+            try:
+                with open(Path(base_dir) / buffer["uri"], 'rb') as f:
+                    f.seek(start)
+                    return f.read(view["byteLength"])
+            except OSError:
+                return b''
+        return (binary or b'')[start:start + view["byteLength"]]
+    uri = image.get("uri", "")
+    if uri.startswith("data:"):
+        return base64.b64decode(uri.split(",", 1)[1])
+    try:
+        with open(Path(base_dir) / uri, 'rb') as f:
+            return f.read()
+    except OSError:
+        return b''
+
+
+def glb_metadata(path):
+    """
+    Read the indexed facts about one GLB
+
+    Args:
+        path: GLB file
+
+    Returns:
+        dict: output_bytes, triangles, vertices, meshes, nodes, min_x..max_z (world-space
+              bounding box of the default scene, None if there is no geometry), materials
+              (names), textures, texture_max_size, texture_bytes and texture_sizes
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    gltf, binary = read_glb(data)
+    accessors = gltf.get("accessors", [])
+    meshes = gltf.get("meshes", [])
+    nodes = gltf.get("nodes", [])
+
+    triangles = 0
+    vertices = 0
+    corners = []
+
+    def visit(node_index, parent, depth=0):
+        nonlocal triangles, vertices
+        if depth > len(nodes):
+            return  # malformed cyclic hierarchy
+        node = nodes[node_index]
+        matrix = _multiply(parent, _node_matrix(node))
+        if "mesh" in node:
+            for primitive in meshes[node["mesh"]].get("primitives", []):
+                position = accessors[primitive["attributes"]["POSITION"]] if "POSITION" in primitive.get("attributes", {}) else None
+                count = accessors[primitive["indices"]]["count"] if "indices" in primitive else (position or {}).get("count", 0)
+                mode = primitive.get("mode", TRIANGLES)
+                if mode == TRIANGLES:
+                    triangles += count // 3
+                elif mode in (TRIANGLE_STRIP, TRIANGLE_FAN):
+                    triangles += max(count - 2, 0)
+                if position:
+                    vertices += position.get("count", 0)
+                    if "min" in position and "max" in position:
+                        low, high = position["min"], position["max"]
+                        for x in (low[0], high[0]):
+                            for y in (low[1], high[1]):
+                                for z in (low[2], high[2]):
+                                    corners.append([sum(matrix[k * 4 + row] * v for k, v in enumerate((x, y, z, 1)))
+                                                    for row in range(3)])
+        for child in node.get("children", []):
+            visit(child, matrix, depth + 1)
+
+    identity = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1]
+    scenes = gltf.get("scenes", [])
+    if scenes:
+        roots = scenes[gltf.get("scene", 0)].get("nodes", [])
+    else:
+        children = {child for node in nodes for child in node.get("children", [])}
+        roots = [n for n in range(len(nodes)) if n not in children]
+    for root in roots:
+        visit(root, identity)
+
+    sizes = []
+    texture_bytes = 0
+    for image in gltf.get("images", []):
+        image_data = _image_bytes(gltf, binary, image, Path(path).parent)
+        texture_bytes += len(image_data)
+        size = _image_size(image_data)
+        if size:
+            sizes.append(list(size))
+
+    bounds = [None] * 6
+    if corners:
+        bounds = [min(c[i] for c in corners) for i in range(3)] + [max(c[i] for c in corners) for i in range(3)]
+    return dict(zip(("min_x", "min_y", "min_z", "max_x", "max_y", "max_z"), bounds),
+                output_bytes=len(data),
+                triangles=triangles,
+                vertices=vertices,
+                meshes=len(meshes),
+                nodes=len(nodes),
+                materials=[m.get("name", "") for m in gltf.get("materials", [])],
+                textures=len(gltf.get("images", [])),
+                texture_max_size=max((max(s) for s in sizes), default=None),
+                texture_bytes=texture_bytes,
+                texture_sizes=sizes)
+
+
+def source_key(source):
+    """
+    Split a Creo source path into the indexed (model path, iteration)
+
+    Args:
+        source: Creo file path such as "/vault/door.asm.12"
+
+    Returns:
+        tuple: ("/vault/door.asm", 12); unrecognised names keep their path with iteration 0
+    """
+    source = Path(source)
+    parsed = parse_creo_name(source.name)
+    if not parsed:
+        return str(source), 0
+    return str(source.with_name(parsed[0])), parsed[1]
+
+
+class GLBIndex:
+    """Connection to an index database (created on first use)"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database file
+        """
+        self.path = str(path)
+        # Several KeyShot workers may write at once; wait for each other's transactions
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def record(self, source, output, export_options=None, material=None, stages=None, seconds=None):
+        """
+        Index one converted GLB, replacing an earlier entry for the same source iteration and output
+
+        Args:
+            source: Creo file the GLB was converted from
+            output: GLB file
+            export_options: Export options used
+            material: Material name or material map that was applied
+            stages: Seconds per conversion stage
+            seconds: Total conversion time
+        """
+        model, iteration = source_key(source)
+        row = glb_metadata(output)
+        row.update(source=model, iteration=iteration, output=str(Path(output).resolve()),
+                   materials=json.dumps(row["materials"]), texture_sizes=json.dumps(row["texture_sizes"]),
+                   material=material, export_options=json.dumps(export_options or {}, sort_keys=True),
+                   stages=json.dumps(stages or {}), seconds=seconds,
+                   converted_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with self.db:
+            self.db.execute(f"INSERT OR REPLACE INTO glbs ({', '.join(COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                            [row[column] for column in COLUMNS])
+
+    def refresh(self, output):
+        """
+        Re-read the GLB facts of an output that changed after it was indexed (e.g. optimized),
+        keeping its source, options and timings
+
+        Args:
+            output: GLB file
+
+        Returns:
+            int: Number of entries updated
+        """
+        row = glb_metadata(output)
+        row.update(materials=json.dumps(row["materials"]), texture_sizes=json.dumps(row["texture_sizes"]))
+        columns = [column for column in COLUMNS if column in row]
+        with self.db:
+            cursor = self.db.execute(f"UPDATE glbs SET {', '.join(f'{c} = ?' for c in columns)} WHERE output = ?",
+                                     [row[c] for c in columns] + [str(Path(output).resolve())])
+        return cursor.rowcount
+
+    def query(self, source=None, material=None, min_triangles=None, max_triangles=None, latest=False,
+              order="source", limit=None):
+        """
+        Find indexed GLBs
+
+        Args:
+            source: SQL LIKE pattern for the source model path ("*" also works as wildcard)
+            material: Material name used in the GLB
+            min_triangles: Lower triangle bound
+            max_triangles: Upper triangle bound
+            latest: Only the newest indexed iteration of each source
+            order: Column to sort by (descending for counts and sizes)
+            limit: Maximum number of rows
+
+        Returns:
+            list: Rows as dicts
+        """
+        where, params = [], []
+        if source:
+            where.append("source LIKE ?")
+            params.append(source.replace("*", "%"))
+        if material:
+            where.append("materials LIKE ?")
+            params.append(f"%{json.dumps(material)}%")
+        if min_triangles is not None:
+            where.append("triangles >= ?")
+            params.append(min_triangles)
+        if max_triangles is not None:
+            where.append("triangles <= ?")
+            params.append(max_triangles)
+        if latest:
+            where.append("iteration = (SELECT MAX(iteration) FROM glbs AS newer WHERE newer.source = glbs.source)")
+        if order not in COLUMNS:
+            raise ValueError(f"Cannot sort by {order}")
+        direction = "ASC" if order in ("source", "output", "iteration", "converted_at") else "DESC"
+        sql = "SELECT * FROM glbs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} {direction}, source, iteration"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def get(self, path):
+        """Return the entries for a GLB output path or a source model path"""
+        path = str(Path(path).resolve()) if Path(path).exists() else str(path)
+        model, _ = source_key(path)
+        rows = self.db.execute("SELECT * FROM glbs WHERE output = ? OR source = ? ORDER BY iteration",
+                               (path, model))
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.db.close()
+
+
+def record_conversion(index_path, source, outputs, export_options=None, material=None, stages=None,
+                      seconds=None):
+    """
+    Index the outputs of one successful conversion; never raises, so indexing problems
+    cannot fail a conversion
+
+    Args:
+        index_path: SQLite database file
+        source: Creo file that was converted
+        outputs: GLB files written for it
+        export_options, material, stages, seconds: See GLBIndex.record()
+
+    Returns:
+        bool: True if every output was indexed
+    """
+    try:
+        index = GLBIndex(index_path)
+        try:
+            for output in outputs:
+                if str(output).lower().endswith('.glb'):
+                    index.record(source, output, export_options, material, stages, seconds)
+        finally:
+            index.close()
+        return True
+    except (OSError, GLBError, ValueError, KeyError, IndexError, sqlite3.Error) as e:
+        print(f"WARNING: Could not update GLB index {index_path}: {e}")
+        return False
+
+
+def refresh_outputs(index_path, outputs):
+    """
+    Update the indexed facts of outputs rewritten after conversion; never raises
+
+    Args:
+        index_path: SQLite database file
+        outputs: GLB files that changed
+    """
+    try:
+        index = GLBIndex(index_path)
+        try:
+            for output in outputs:
+                if str(output).lower().endswith('.glb'):
+                    index.refresh(output)
+        finally:
+            index.close()
+    except (OSError, GLBError, ValueError, KeyError, IndexError, sqlite3.Error) as e:
+        print(f"WARNING: Could not update GLB index {index_path}: {e}")
+
+
+def backfill(index_path, output_dir):
+    """
+    Index every GLB in an existing output directory
+
+    Sources are taken from the directory's batch manifest (.keyshot-manifest.jsonl);
+    GLBs it does not list are indexed under their own path with iteration 0.
+
+    Args:
+        index_path: SQLite database file
+        output_dir: Batch output directory
+
+    Returns:
+        tuple: (indexed count, list of (path, error) for GLBs that could not be read)
+    """
+    output_dir = Path(output_dir)
+    sources = {}
+    manifest = output_dir / ".keyshot-manifest.jsonl"
+    if manifest.exists():
+        with open(manifest, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("status") == "ok":
+                    sources[str(Path(entry["output"]).resolve())] = entry["source"]
+    # Variant outputs (<name>_<variant>.glb) belong to the manifest's first output <name>.glb
+    by_stem = {(Path(out).parent, Path(out).stem): src for out, src in sources.items()}
+
+    index = GLBIndex(index_path)
+    indexed, errors = 0, []
+    try:
+        for path in sorted(output_dir.rglob('*.glb')):
+            resolved = Path(path).resolve()
+            source = sources.get(str(resolved))
+            if source is None:
+                stem = resolved.stem
+                # Longest first, so door_frame_low.glb belongs to door_frame.glb, not door.glb
+                prefixes = [stem[:i] for i in range(len(stem) - 1, 0, -1) if stem[i] == "_"]
+                source = next((by_stem[(resolved.parent, prefix)] for prefix in prefixes
+                               if (resolved.parent, prefix) in by_stem), str(resolved))
+            try:
+                index.record(source, resolved)
+                indexed += 1
+            except (OSError, GLBError, ValueError, KeyError, IndexError) as e:
+                errors.append((path, str(e)))
+    finally:
+        index.close()
+    return indexed, errors
+
+
+def _format_row(row):
+    size = "-"
+    if row["min_x"] is not None:
+        size = " x ".join(f"{row[f'max_{a}'] - row[f'min_{a}']:.4g}" for a in "xyz")
+    texture = f"{row['textures']} tex" + (f" max {row['texture_max_size']}px" if row["texture_max_size"] else "")
+    return (f"{row['source']} #{row['iteration']}  {row['triangles']:>9,} tris  {size:<24}  "
+            f"{texture:<18}  {', '.join(json.loads(row['materials'])) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Query and fill the SQLite index of converted GLBs',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1]
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    fill = commands.add_parser('backfill', help='Index the GLBs in existing output directories')
+    fill.add_argument('index')
+    fill.add_argument('directories', nargs='+')
+    query = commands.add_parser('query', help='List indexed GLBs')
+    query.add_argument('index')
+    query.add_argument('--source', help='Source path pattern (* as wildcard)')
+    query.add_argument('--material', help='Only GLBs using this material name')
+    query.add_argument('--min-triangles', type=int)
+    query.add_argument('--max-triangles', type=int)
+    query.add_argument('--latest', action='store_true', help='Only the newest iteration of each source')
+    query.add_argument('--sort', default='source', choices=COLUMNS, metavar='COLUMN',
+                       help='Sort by this column (counts and sizes largest first)')
+    query.add_argument('--limit', type=int)
+    query.add_argument('--json', action='store_true', help='Print full rows as JSON')
+    show = commands.add_parser('show', help='Show everything indexed for a GLB or source')
+    show.add_argument('index')
+    show.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'backfill':
+        failed = 0
+        for directory in args.directories:
+            if not Path(directory).is_dir():
+                print(f"✗ Not a directory: {directory}")
+                failed += 1
+                continue
+            indexed, errors = backfill(args.index, directory)
+            print(f"✓ {directory}: indexed {indexed} GLB(s)")
+            for path, error in errors:
+                print(f"  ✗ {path}: {error}")
+            failed += len(errors)
+        return 1 if failed else 0
+
+    if not os.path.exists(args.index):
+        print(f"ERROR: Index not found: {args.index}")
+        return 1
+    index = GLBIndex(args.index)
+    try:
+        if args.command == 'query':
+            rows = index.query(args.source, args.material, args.min_triangles, args.max_triangles,
+                               args.latest, args.sort, args.limit)
+            if args.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                for row in rows:
+                    print(_format_row(row))
+                print(f"{len(rows)} GLB(s)")
+        else:
+            rows = index.get(args.path)
+            if not rows:
+                print(f"Nothing indexed for {args.path}")
+                return 1
+            print(json.dumps(rows, indent=2))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
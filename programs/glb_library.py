@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Shared part library for assembly GLBs (storage and download size only)
+Door and frame assemblies contain the same hinges, closers and strikes again and again.
+Within one GLB, glb_optimize.py already merges identical meshes so every occurrence is a
+node that instances one mesh. This module shares them across GLBs: mesh and texture data
+that appears in more than one GLB of an output directory is moved into a content-addressed
+part library and referenced from each GLB as an external glTF buffer, so the viewer
+downloads (and the browser caches) every shared part only once.
+
+Each mesh's binary data (vertex and index data, Draco data and its textures' images) is
+one library file named after the SHA-256 of its contents, so identical parts converge on
+the same file no matter which assembly they were exported from, and a changed part never
+overwrites what other GLBs still reference. Only meshes of at least --min-size bytes are
+shared, so small parts do not turn into many small requests.
+
+Run it after optimizing (optimized GLBs are needed for identical parts to match). GLBs
+that reference the library cannot be bundled: their external buffers would not resolve
+from inside a bundle.
+
+This only deduplicates after the fact. KeyShot still imports, tessellates and bakes
+every assembly as a whole, so repeated components are not converted only once and
+conversion time is unchanged; only storage and download size go down.
+
+A library records every directory shared into it, and prune only removes parts that no
+GLB in any of those directories references, so a library used by several output
+directories can be pruned from any one of them.
+
+Usage:
+  python glb_library.py share ./gltf_output                # library in ./gltf_output/parts
+  python glb_library.py share ./gltf_output --library ./public/parts --min-size 16384
+  python glb_library.py prune ./gltf_output                # remove parts no GLB references
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+from batch_manifest import MANIFEST_NAME, BatchManifest
+from glb_container import GLBError, read_glb, write_glb
+
+LIBRARY_NAME = "parts"
+# Directories whose GLBs may reference the library, kept in the library
+USERS_NAME = ".users.json"
+DEFAULT_MIN_BYTES = 64 * 1024
+ALIGNMENT = 4
+
+
+def _texture_images(gltf, material_index):
+    material = gltf["materials"][material_index]
+    images = []
+    pending = [material]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if key.endswith("Texture") and isinstance(child, dict) and "index" in child:
+                    texture = gltf["textures"][child["index"]]
+                    sources = [texture.get("source")] + [ext.get("source") for ext in texture.get("extensions", {}).values()
+                                                         if isinstance(ext, dict)]
+                    images.extend(source for source in sources if source is not None)
+                else:
+                    pending.append(child)
+        elif isinstance(value, list):
+            pending.extend(value)
+    return images
+
+
+def _mesh_views(gltf, mesh):
+    """Return the bufferViews a mesh's data lives in, in first-use order"""
+    views = []
+
+    def add(index):
+        if index is not None and index not in views:
+            views.append(index)
+
+    def add_accessor(index):
+        accessor = gltf["accessors"][index]
+        add(accessor.get("bufferView"))
+        for part in ("indices", "values"):
+            add(accessor.get("sparse", {}).get(part, {}).get("bufferView"))
+
+    for primitive in mesh.get("primitives", []):
+        for index in primitive.get("attributes", {}).values():
+            add_accessor(index)
+        if "indices" in primitive:
+            add_accessor(primitive["indices"])
+        for target in primitive.get("targets", []):
+            for index in target.values():
+                add_accessor(index)
+        add(primitive.get("extensions", {}).get("KHR_draco_mesh_compression", {}).get("bufferView"))
+        if "material" in primitive:
+            for image in _texture_images(gltf, primitive["material"]):
+                add(gltf["images"][image].get("bufferView"))
+    return views
+
+
+def _pack(chunks):
+    # (packed bytes, offset of each chunk) with every chunk aligned for any component type
+    offsets = []
+    data = bytearray()
+    for chunk in chunks:
+        data += b'\0' * (-len(data) % ALIGNMENT)
+        offsets.append(len(data))
+        data += chunk
+    return bytes(data), offsets
+
+
+def _load(path):
+    """
+    Read a GLB and split it into the parts that could be shared
+
+    Returns:
+        tuple: (gltf, {view index: bytes} of embedded views, list of (hash, view indices, part bytes))
+    """
+    gltf, binary = read_glb(Path(path).read_bytes())
+    views = {}
+    for index, view in enumerate(gltf.get("bufferViews", [])):
+        buffer = gltf["buffers"][view["buffer"]]
+        if "uri" not in buffer:
+            start = view.get("byteOffset", 0)
+            views[index] = (binary or b'')[start:start + view["byteLength"]]
+
+    parts = []
+    claimed = set()
+    for mesh in gltf.get("meshes", []):
+        # A view shared by two meshes of this GLB stays with the first
+        indices = [v for v in _mesh_views(gltf, mesh) if v in views and v not in claimed]
+        if not indices:
+            continue
+        claimed.update(indices)
+        data, _ = _pack(views[v] for v in indices)
+        parts.append((hashlib.sha256(data).hexdigest()[:32], indices, data))
+    return gltf, views, parts
+
+
+def _write_atomic(path, data):
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _library_users(library_dir):
+    try:
+        with open(library_dir / USERS_NAME, encoding='utf-8') as f:
+            return [Path(user) for user in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def _add_library_user(library_dir, directory):
+    users = _library_users(library_dir)
+    if directory not in users:
+        users.append(directory)
+        _write_atomic(library_dir / USERS_NAME, json.dumps([str(user) for user in users], indent=2).encode('utf-8'))
+
+
+def _externalize(path, gltf, views, parts, library_dir):
+    """Move the given parts of one GLB into the library and rewrite the GLB"""
+    path = Path(path)
+    moved = set()
+    external = []
+    for part_hash, indices, data in parts:
+        part_path = library_dir / f"{part_hash}.bin"
+        if not part_path.exists():
+            _write_atomic(part_path, data)
+        _, offsets = _pack(views[v] for v in indices)
+        external.append((part_path, len(data), dict(zip(indices, offsets))))
+        moved.update(indices)
+
+    # Embedded views that stay are repacked into buffer 0; existing external buffers keep
+    # their (renumbered) entries
+    old_buffers = gltf["buffers"]
+    buffers = []
+    embedded = [v for v in sorted(views) if v not in moved]
+    binary = None
+    if embedded:
+        binary, offsets = _pack(views[v] for v in embedded)
+        buffers.append({"byteLength": len(binary)})
+        for v, offset in zip(embedded, offsets):
+            gltf["bufferViews"][v].update(buffer=0, byteOffset=offset)
+    renumbered = {}
+    for index, view in enumerate(gltf["bufferViews"]):
+        buffer = old_buffers[view["buffer"]]
+        if index in views or "uri" not in buffer:
+            continue
+        if view["buffer"] not in renumbered:
+            renumbered[view["buffer"]] = len(buffers)
+            buffers.append(buffer)
+        view["buffer"] = renumbered[view["buffer"]]
+    for part_path, length, offsets in external:
+        uri = Path(os.path.relpath(part_path, path.parent)).as_posix()
+        buffers.append({"uri": uri, "byteLength": length})
+        for v, offset in offsets.items():
+            gltf["bufferViews"][v].update(buffer=len(buffers) - 1, byteOffset=offset)
+    gltf["buffers"] = buffers
+    _write_atomic(path, write_glb(gltf, binary))
+
+
+def share_parts(directory, library_dir=None, min_bytes=DEFAULT_MIN_BYTES):
+    """
+    Move mesh data used by more than one GLB of a directory into the part library
+
+    Args:
+        directory: Directory with GLBs (searched recursively; the library is skipped)
+        library_dir: Part library (default: <directory>/parts)
+        min_bytes: Smallest mesh data worth sharing
+
+    Returns:
+        dict: rewritten (GLB paths), parts (library files referenced), saved_bytes (data
+              no longer stored twice) and errors (list of (path, message))
+    """
+    directory = Path(directory).resolve()
+    library_dir = Path(library_dir).resolve() if library_dir else directory / LIBRARY_NAME
+    glbs = sorted(path for path in directory.rglob('*.glb') if library_dir not in path.parents)
+
+    # Pass 1: which parts occur in which GLBs (only their hashes are kept)
+    users = Counter()
+    errors = []
+    for path in glbs:
+        try:
+            _, _, parts = _load(path)
+        except (OSError, GLBError, ValueError, KeyError, IndexError) as e:
+            errors.append((path, str(e)))
+            continue
+        users.update({part_hash for part_hash, _, data in parts if len(data) >= min_bytes})
+    existing = {path.stem for path in library_dir.glob('*.bin')} if library_dir.exists() else set()
+
+    # Pass 2: rewrite the GLBs whose parts are used elsewhere or already in the library
+    stats = {"rewritten": [], "parts": set(), "saved_bytes": 0, "errors": errors}
+    failed = {path for path, _ in errors}
+    for path in glbs:
+        if path in failed:
+            continue
+        try:
+            gltf, views, parts = _load(path)
+            shared = [part for part in parts if len(part[2]) >= min_bytes
+                      and (users[part[0]] > 1 or part[0] in existing)]
+            if not shared:
+                continue
+            library_dir.mkdir(parents=True, exist_ok=True)
+            for part_hash, _, data in shared:
+                if part_hash in stats["parts"] or part_hash in existing:
+                    stats["saved_bytes"] += len(data)
+                stats["parts"].add(part_hash)
+            _externalize(path, gltf, views, shared, library_dir)
+            stats["rewritten"].append(path)
+        except (OSError, GLBError, ValueError, KeyError, IndexError) as e:
+            errors.append((path, str(e)))
+    stats["parts"] = len(stats["parts"])
+    if library_dir.exists():
+        _add_library_user(library_dir, directory)
+    # Keep --incremental from reconverting every GLB that was just rewritten
+    if stats["rewritten"] and (directory / MANIFEST_NAME).exists():
+        BatchManifest(directory, None).refresh_outputs(stats["rewritten"])
+    return stats
+
+
+def prune(directories, library_dir=None):
+    """
+    Delete library files that no GLB references any more
+
+    GLBs are read from the given directories and from every directory recorded as having
+    shared into the library. Nothing is deleted when a GLB cannot be read, since its
+    references are unknown.
+
+    Args:
+        directories: Directory (or list of directories) with GLBs
+        library_dir: Part library (default: <first directory>/parts)
+
+    Returns:
+        dict: removed (files deleted), freed (bytes) and errors (list of (path, message))
+
+    Raises:
+        ValueError: If the library lies outside the directories and records no users, so
+                    GLBs elsewhere might still reference it
+    """
+    if isinstance(directories, (str, Path)):
+        directories = [directories]
+    directories = [Path(directory).resolve() for directory in directories]
+    library_dir = Path(library_dir).resolve() if library_dir else directories[0] / LIBRARY_NAME
+    stats = {"removed": 0, "freed": 0, "errors": []}
+    if not library_dir.exists():
+        return stats
+    users = _library_users(library_dir)
+    if not users and not any(directory in library_dir.parents for directory in directories):
+        raise ValueError(f"{library_dir} is outside {', '.join(map(str, directories))} and does not record "
+                         f"which directories use it; run 'share' on each of them first")
+    for user in users:
+        if user not in directories and user.is_dir():
+            directories.append(user)
+
+    referenced = set()
+    for directory in directories:
+        for path in directory.rglob('*.glb'):
+            try:
+                gltf, _ = read_glb(path.read_bytes())
+            except (OSError, GLBError, ValueError) as e:
+                stats["errors"].append((path, str(e)))
+                continue
+            for buffer in gltf.get("buffers", []):
+                if "uri" in buffer:
+                    referenced.add((path.parent / buffer["uri"]).resolve())
+    if stats["errors"]:
+        return stats
+    for part in library_dir.glob('*.bin'):
+        if part.resolve() not in referenced:
+            stats["freed"] += part.stat().st_size
+            part.unlink()
+            stats["removed"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Share mesh data between GLBs through a part library',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1]
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    share = commands.add_parser('share', help='Move mesh data used by several GLBs into the library')
+    share.add_argument('directory')
+    share.add_argument('--library', help=f'Part library directory (default: <directory>/{LIBRARY_NAME})')
+    share.add_argument('--min-size', type=int, default=DEFAULT_MIN_BYTES, metavar='BYTES',
+                       help=f'Only share meshes with at least this much data (default: {DEFAULT_MIN_BYTES})')
+    prune_parser = commands.add_parser('prune', help='Remove library parts no GLB references')
+    prune_parser.add_argument('directory', nargs='+',
+                              help='Directories with GLBs using the library (those that shared into it are added)')
+    prune_parser.add_argument('--library', help=f'Part library directory (default: <directory>/{LIBRARY_NAME})')
+    args = parser.parse_args()
+
+    directories = args.directory if args.command == 'prune' else [args.directory]
+    for directory in directories:
+        if not Path(directory).is_dir():
+            print(f"ERROR: Not a directory: {directory}")
+            return 1
+    if args.command == 'share':
+        stats = share_parts(args.directory, args.library, args.min_size)
+        print(f"Shared {stats['parts']} part(s) between {len(stats['rewritten'])} GLB(s), "
+              f"{stats['saved_bytes'] / 1e6:.2f} MB no longer stored twice")
+        for path, error in stats["errors"]:
+            print(f"  ✗ {path}: {error}")
+        return 1 if stats["errors"] else 0
+    try:
+        stats = prune(directories, args.library)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    if stats["errors"]:
+        for path, error in stats["errors"]:
+            print(f"WARNING: Skipped {path}: {error}")
+        print("Nothing removed: the references of the skipped GLB(s) are unknown")
+        return 1
+    print(f"Removed {stats['removed']} unreferenced part(s), {stats['freed'] / 1e6:.2f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
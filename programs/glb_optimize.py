@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+GLB post-processing optimizer
+Shrinks the GLBs written by KeyShot before they are served to the web viewer:
+
+- identical bufferViews, accessors, images, samplers, textures and materials are merged,
+  and so are identical meshes, so repeated components become nodes instancing one mesh
+- nodes, meshes, materials, accessors, textures, images and bufferViews that nothing
+  in a scene references are dropped, and the binary buffer is repacked
+- optionally (--quantize) normals, tangents and texture coordinates are stored as
+  normalized integers using KHR_mesh_quantization
+
+Pure Python; runs in the wrapper after export (keyshot_convert.py --optimize) or standalone:
+  python glb_optimize.py model.glb [more.glb ...] [--quantize]
+"""
+
+import argparse
+import array
+import json
+import os
+import sys
+from pathlib import Path
+
+from glb_container import GLBError, read_glb, write_glb
+
+# Index-referenced arrays that may be deduplicated and pruned
+PRUNABLE = ("nodes", "meshes", "skins", "accessors", "bufferViews", "materials", "textures", "images", "samplers")
+
+FLOAT = 5126
+BYTE = 5120
+UNSIGNED_SHORT = 5123
+ARRAY_BUFFER = 34962
+TYPE_COMPONENTS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+
+
+def _texture_infos(value):
+    """Yield every textureInfo dict in a material (baseColorTexture, normalTexture, ...)"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key.endswith("Texture") and isinstance(child, dict) and "index" in child:
+                yield child
+            yield from _texture_infos(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _texture_infos(child)
+
+
+def _references(gltf):
+    """
+    List every index reference in a glTF document
+
+    Returns:
+        list: (owner kind, owner index, holder, key, target kind); holder[key] is the index
+    """
+    refs = []
+
+    def add(owner, index, holder, key, target):
+        refs.append((owner, index, holder, key, target))
+
+    for i, scene in enumerate(gltf.get("scenes", [])):
+        for n in range(len(scene.get("nodes", []))):
+            add("scenes", i, scene["nodes"], n, "nodes")
+
+    for i, node in enumerate(gltf.get("nodes", [])):
+        for n in range(len(node.get("children", []))):
+            add("nodes", i, node["children"], n, "nodes")
+        if "mesh" in node:
+            add("nodes", i, node, "mesh", "meshes")
+        if "skin" in node:
+            add("nodes", i, node, "skin", "skins")
+
+    for i, mesh in enumerate(gltf.get("meshes", [])):
+        for primitive in mesh.get("primitives", []):
+            for name in primitive.get("attributes", {}):
+                add("meshes", i, primitive["attributes"], name, "accessors")
+            if "indices" in primitive:
+                add("meshes", i, primitive, "indices", "accessors")
+            if "material" in primitive:
+                add("meshes", i, primitive, "material", "materials")
+            for target in primitive.get("targets", []):
+                for name in target:
+                    add("meshes", i, target, name, "accessors")
+            extensions = primitive.get("extensions", {})
+            draco = extensions.get("KHR_draco_mesh_compression")
+            if draco and "bufferView" in draco:
+                add("meshes", i, draco, "bufferView", "bufferViews")
+            for mapping in extensions.get("KHR_materials_variants", {}).get("mappings", []):
+                if "material" in mapping:
+                    add("meshes", i, mapping, "material", "materials")
+
+    for i, skin in enumerate(gltf.get("skins", [])):
+        if "inverseBindMatrices" in skin:
+            add("skins", i, skin, "inverseBindMatrices", "accessors")
+        for n in range(len(skin.get("joints", []))):
+            add("skins", i, skin["joints"], n, "nodes")
+        if "skeleton" in skin:
+            add("skins", i, skin, "skeleton", "nodes")
+
+    for i, animation in enumerate(gltf.get("animations", [])):
+        for channel in animation.get("channels", []):
+            if "node" in channel.get("target", {}):
+                add("animations", i, channel["target"], "node", "nodes")
+        for sampler in animation.get("samplers", []):
+            add("animations", i, sampler, "input", "accessors")
+            add("animations", i, sampler, "output", "accessors")
+
+    for i, material in enumerate(gltf.get("materials", [])):
+        for info in _texture_infos(material):
+            add("materials", i, info, "index", "textures")
+
+    for i, texture in enumerate(gltf.get("textures", [])):
+        if "source" in texture:
+            add("textures", i, texture, "source", "images")
+        if "sampler" in texture:
+            add("textures", i, texture, "sampler", "samplers")
+        for extension in texture.get("extensions", {}).values():
+            if isinstance(extension, dict) and "source" in extension:
+                add("textures", i, extension, "source", "images")
+
+    for i, image in enumerate(gltf.get("images", [])):
+        if "bufferView" in image:
+            add("images", i, image, "bufferView", "bufferViews")
+
+    for i, accessor in enumerate(gltf.get("accessors", [])):
+        if "bufferView" in accessor:
+            add("accessors", i, accessor, "bufferView", "bufferViews")
+        sparse = accessor.get("sparse", {})
+        for part in ("indices", "values"):
+            if "bufferView" in sparse.get(part, {}):
+                add("accessors", i, sparse[part], "bufferView", "bufferViews")
+
+    return refs
+
+
+def _deduplicate(gltf, refs, kind, key_fn):
+    """
+    Point every reference to an item at the first identical item
+
+    Args:
+        gltf: glTF document
+        refs: References from _references()
+        kind: Top-level array to deduplicate
+        key_fn: Returns a hashable identity for an item
+
+    Returns:
+        int: Number of duplicates found
+    """
+    first = {}
+    mapping = {}
+    for index, item in enumerate(gltf.get(kind, [])):
+        mapping[index] = first.setdefault(key_fn(item), index)
+
+    duplicates = sum(1 for index, canonical in mapping.items() if index != canonical)
+    if duplicates:
+        for _, _, holder, key, target in refs:
+            if target == kind:
+                holder[key] = mapping[holder[key]]
+    return duplicates
+
+
+def _json_key(exclude=("name",)):
+    def key(item):
+        return json.dumps({k: v for k, v in item.items() if k not in exclude}, sort_keys=True)
+    return key
+
+
+def _live_items(gltf, refs):
+    """
+    Find the items reachable from the document's scenes (and animations)
+
+    Returns:
+        dict: kind -> set of live indices
+    """
+    live = {kind: set() for kind in PRUNABLE}
+
+    # A document without scenes is a library of nodes; keep all of them
+    if not gltf.get("scenes"):
+        live["nodes"] = set(range(len(gltf.get("nodes", []))))
+
+    changed = True
+    while changed:
+        changed = False
+        for owner, index, holder, key, target in refs:
+            if target not in PRUNABLE:
+                continue
+            if owner in PRUNABLE and index not in live[owner]:
+                continue
+            if holder[key] not in live[target]:
+                live[target].add(holder[key])
+                changed = True
+    return live
+
+
+def _compact(gltf, refs, live):
+    """
+    Drop dead items and renumber references to the survivors
+
+    Returns:
+        dict: kind -> number of items removed
+    """
+    removed = {}
+    for kind in PRUNABLE:
+        items = gltf.get(kind)
+        if not items:
+            continue
+        keep = sorted(live[kind])
+        if len(keep) == len(items):
+            continue
+
+        mapping = {old: new for new, old in enumerate(keep)}
+        for owner, index, holder, key, target in refs:
+            if target == kind and (owner not in PRUNABLE or index in live[owner]):
+                holder[key] = mapping[holder[key]]
+
+        removed[kind] = len(items) - len(keep)
+        if keep:
+            gltf[kind] = [items[old] for old in keep]
+        else:
+            del gltf[kind]
+    return removed
+
+
+def _read_floats(gltf, accessor):
+    """Read a float accessor into an array('f'), honouring byteStride"""
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    data = view["_data"]
+    element = 4 * TYPE_COMPONENTS[accessor["type"]]
+    stride = view.get("byteStride") or element
+    offset = accessor.get("byteOffset", 0)
+
+    values = array.array('f')
+    if stride == element:
+        values.frombytes(data[offset:offset + accessor["count"] * element])
+    else:
+        for n in range(accessor["count"]):
+            start = offset + n * stride
+            values.frombytes(data[start:start + element])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _quantize_accessor(gltf, index, semantic):
+    """
+    Re-encode one float vertex attribute as normalized integers
+
+    Returns:
+        int: Index of the new accessor, or None if the attribute was left alone
+    """
+    accessor = gltf["accessors"][index]
+    if accessor.get("componentType") != FLOAT or "bufferView" not in accessor or "sparse" in accessor:
+        return None
+
+    values = _read_floats(gltf, accessor)
+
+    if semantic in ("NORMAL", "TANGENT"):
+        components = TYPE_COMPONENTS[accessor["type"]]
+        if components not in (3, 4):
+            return None
+        quantized = array.array('b')
+        for n in range(accessor["count"]):
+            for c in range(components):
+                quantized.append(max(-127, min(127, round(values[n * components + c] * 127))))
+            if components == 3:
+                quantized.append(0)  # vertex attributes must be 4-byte aligned
+        component_type = BYTE
+        stride = 4
+    else:
+        if accessor["type"] != "VEC2" or (values and (min(values) < 0.0 or max(values) > 1.0)):
+            return None
+        quantized = array.array('H', (round(v * 65535) for v in values))
+        component_type = UNSIGNED_SHORT
+        stride = None
+
+    if sys.byteorder == 'big':
+        quantized.byteswap()
+
+    view = {"buffer": 0, "target": ARRAY_BUFFER, "_data": quantized.tobytes()}
+    if stride:
+        view["byteStride"] = stride
+    gltf["bufferViews"].append(view)
+
+    new_accessor = {
+        "bufferView": len(gltf["bufferViews"]) - 1,
+        "componentType": component_type,
+        "normalized": True,
+        "count": accessor["count"],
+        "type": accessor["type"],
+    }
+    if "name" in accessor:
+        new_accessor["name"] = accessor["name"]
+    gltf["accessors"].append(new_accessor)
+    return len(gltf["accessors"]) - 1
+
+
+def _quantize(gltf):
+    """
+    Quantize NORMAL, TANGENT and TEXCOORD_n attributes of every non-Draco primitive
+
+    Returns:
+        int: Number of accessors quantized
+    """
+    converted = {}
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if "KHR_draco_mesh_compression" in primitive.get("extensions", {}):
+                continue
+            attributes = primitive.get("attributes", {})
+            for semantic, index in list(attributes.items()):
+                if semantic not in ("NORMAL", "TANGENT") and not semantic.startswith("TEXCOORD_"):
+                    continue
+                if index not in converted:
+                    converted[index] = _quantize_accessor(gltf, index, semantic)
+                if converted[index] is not None:
+                    attributes[semantic] = converted[index]
+
+    count = sum(1 for index in converted.values() if index is not None)
+    if count:
+        for key in ("extensionsUsed", "extensionsRequired"):
+            extensions = gltf.setdefault(key, [])
+            if "KHR_mesh_quantization" not in extensions:
+                extensions.append("KHR_mesh_quantization")
+    return count
+
+
+def _repack(gltf, original_buffer):
+    """Write the surviving bufferViews into one new binary buffer"""
+    chunks = []
+    offset = 0
+    for view in gltf.get("bufferViews", []):
+        data = view.pop("_data")
+        padding = (4 - offset % 4) % 4
+        if padding:
+            chunks.append(b'\0' * padding)
+            offset += padding
+        view["buffer"] = 0
+        view["byteOffset"] = offset
+        view["byteLength"] = len(data)
+        chunks.append(data)
+        offset += len(data)
+
+    if not gltf.get("bufferViews"):
+        gltf.pop("buffers", None)
+        return None
+
+    binary = b''.join(chunks)
+    buffer = {k: v for k, v in original_buffer.items() if k != "uri"}
+    buffer["byteLength"] = len(binary)
+    gltf["buffers"] = [buffer]
+    return binary
+
+
+def optimize_glb(data, quantize=False):
+    """
+    Optimize GLB bytes
+
+    Args:
+        data: Contents of a .glb file
+        quantize: Also quantize normals, tangents and texture coordinates
+
+    Returns:
+        tuple: (optimized GLB bytes, stats dict)
+    """
+    gltf, binary = read_glb(data)
+
+    buffers = gltf.get("buffers", [])
+    if len(buffers) > 1 or (buffers and "uri" in buffers[0]):
+        raise GLBError("Only GLBs with a single embedded buffer can be optimized")
+    if gltf.get("bufferViews") and binary is None:
+        raise GLBError("GLB has bufferViews but no binary chunk")
+
+    for view in gltf.get("bufferViews", []):
+        start = view.get("byteOffset", 0)
+        view["_data"] = binary[start:start + view["byteLength"]]
+
+    stats = {}
+    if quantize:
+        stats["quantized_accessors"] = _quantize(gltf)
+
+    refs = _references(gltf)
+    stats["duplicates"] = {
+        "bufferViews": _deduplicate(gltf, refs, "bufferViews",
+                                    lambda v: (v["_data"], v.get("byteStride"), v.get("target"))),
+        "accessors": _deduplicate(gltf, refs, "accessors", _json_key()),
+        "images": _deduplicate(gltf, refs, "images", _json_key()),
+        "samplers": _deduplicate(gltf, refs, "samplers", _json_key()),
+        "textures": _deduplicate(gltf, refs, "textures", _json_key()),
+        "materials": _deduplicate(gltf, refs, "materials", _json_key(exclude=())),
+        # After accessors and materials, so repeated components compare equal
+        "meshes": _deduplicate(gltf, refs, "meshes", _json_key()),
+    }
+
+    stats["removed"] = _compact(gltf, refs, _live_items(gltf, refs))
+    binary = _repack(gltf, buffers[0] if buffers else {})
+    return write_glb(gltf, binary), stats
+
+
+def optimize_file(path, quantize=False):
+    """
+    Optimize a GLB file in place
+
+    The file is replaced atomically (never rewritten in place), so a GLB hard-linked
+    from the conversion cache keeps its cached contents.
+
+    Args:
+        path: GLB file
+        quantize: Also quantize normals, tangents and texture coordinates
+
+    Returns:
+        dict: Stats including before_bytes, after_bytes and saved_bytes
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    optimized, stats = optimize_glb(data, quantize)
+
+    stats["before_bytes"] = len(data)
+    if len(optimized) < len(data):
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp.write_bytes(optimized)
+        os.replace(temp, path)
+        stats["after_bytes"] = len(optimized)
+    else:
+        stats["after_bytes"] = len(data)
+    stats["saved_bytes"] = stats["before_bytes"] - stats["after_bytes"]
+    return stats
+
+
+def describe(stats):
+    """One-line summary of optimize_file() stats"""
+    before, after = stats["before_bytes"], stats["after_bytes"]
+    percent = 100 * stats["saved_bytes"] / before if before else 0
+    return f"{before / 1e6:.2f} MB -> {after / 1e6:.2f} MB (saved {percent:.1f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimize GLB files for the web viewer')
+    parser.add_argument('files', nargs='+', help='GLB files to optimize in place')
+    parser.add_argument('--quantize', action='store_true',
+                       help='Quantize normals, tangents and texture coordinates (KHR_mesh_quantization)')
+    args = parser.parse_args()
+
+    total_saved = 0
+    failed = 0
+    for file in args.files:
+        try:
+            stats = optimize_file(file, args.quantize)
+        except (OSError, GLBError, ValueError) as e:
+            print(f"✗ {file}: {e}")
+            failed += 1
+            continue
+        total_saved += stats["saved_bytes"]
+        print(f"✓ {file}: {describe(stats)}")
+
+    print(f"Total saved: {total_saved / 1e6:.2f} MB")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
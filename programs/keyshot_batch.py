@@ -0,0 +1,434 @@
+"""
+Parallel batch conversion for the KeyShot wrapper
+Runs one or more persistent KeyShot workers, each pulling Creo files from a shared work queue
+
+Used by keyshot_convert.py for --batch (with --jobs N for more than one worker).
+"""
+
+import itertools
+import math
+import queue
+import threading
+import time
+from pathlib import Path
+
+from keyshot_worker import KeyShotWorker
+from batch_manifest import BatchManifest, options_hash
+from creo_files import find_creo_files, model_key, output_file_for
+from batch_report import build_report, print_report, write_report
+from glb_container import GLBError
+from glb_optimize import optimize_file, describe
+from conversion_cache import hash_file
+from export_variants import variant_outputs
+from batch_quarantine import Quarantine, DEFAULT_QUARANTINE_AFTER
+from material_rules import load_material_rules, material_key
+from batch_progress import BatchProgress
+from batch_costs import CostModel
+from glb_index import record_conversion, refresh_outputs
+from batch_jobs import is_job_file, job_settings, read_job_file
+from quality_budget import QualityPlanner, job_budget
+
+REPORT_NAME = ".keyshot-report.json"
+
+# Jobs read ahead from a job list per worker
+JOB_FILE_LOOKAHEAD = 64
+# Workers wait this long for discovery to finish, so the longest files found by then go first
+DISPATCH_WARMUP_SECONDS = 15
+
+
+def run_parallel_batch(keyshot_path, script_path, input_dir, output_dir, export_options, material_name, jobs, *,
+                       cache=None, incremental=False, recursive=False, report_file=None, slowest=10,
+                       optimize=False, quantize=False, variants=None, timeout=None, retries=0,
+                       retry_backoff=5.0, quarantine_after=DEFAULT_QUARANTINE_AFTER,
+                       retry_quarantined=False, material_map=None, progress_interval=30,
+                       metrics_file=None, recycle_after=None, max_rss_mb=None, index=None, watch=None,
+                       budget=None):
+    """
+    Convert every Creo file in a directory, or every job of a job list, using N
+    concurrent KeyShot workers
+
+    Files are placed on a shared queue while discovery is still running; each worker
+    takes the file with the longest predicted conversion time (see batch_costs.py) as
+    soon as its previous conversion finishes, so a large assembly does not start last.
+    Workers start once discovery finishes, or after DISPATCH_WARMUP_SECONDS on a slow
+    input tree (or when a job list's read-ahead is full); files discovered after that
+    are only ordered among the files still queued. Each worker is a single KeyShot session that converts all of its
+    files, started only once it receives its first file.
+
+    Args:
+        keyshot_path: Path to KeyShot executable
+        script_path: Path to the KeyShot Python script
+        input_dir: Directory containing Creo files, or a CSV/JSON-lines job list with
+                   per-file settings (see batch_jobs.py) that is read as a stream
+        output_dir: Output directory for glTF files
+        export_options: Dictionary of export options
+        material_name: Optional material name to apply to all geometry before export
+        jobs: Number of concurrent KeyShot processes
+        cache: Optional ConversionCache; hits are copied into place without KeyShot
+        incremental: Skip files the output directory's manifest records as up to date
+        recursive: Also convert Creo files in subdirectories (output mirrors the tree)
+        report_file: Where to write the JSON performance report (default: <output_dir>/.keyshot-report.json)
+        slowest: Number of slowest inputs listed in the report
+        optimize: Run the GLB optimizer on every output after export
+        quantize: Also quantize vertex attributes when optimizing
+        variants: Optional list of export variants; each file is imported once and
+                  exported once per variant
+        timeout: Optional per-file wall-clock limit in seconds; KeyShot is killed and
+                 restarted when a file exceeds it
+        retries: Extra attempts for a failed file (the worker is restarted between attempts)
+        retry_backoff: Seconds to wait before the first retry, doubled for each further retry
+        quarantine_after: Skip files that failed in this many consecutive batches (0 = never)
+        retry_quarantined: Convert quarantined files anyway
+        material_map: Optional material mapping file; material_name then only applies to
+                      parts no rule matches
+        progress_interval: Seconds between live status lines (0 = off)
+        metrics_file: Optional Prometheus textfile kept up to date during the batch
+        recycle_after: Restart a worker's KeyShot after this many files, so memory held by
+                       the session is returned
+        max_rss_mb: Restart a worker's KeyShot after a file once its resident memory exceeds
+                    this many MB
+        index: Optional SQLite GLB index (see glb_index.py) every converted or cached
+               output is added to
+        watch: Optional FolderWatcher (see folder_watch.py); after the initial pass over
+               the input directory the batch keeps converting files as they are saved,
+               until interrupted with Ctrl+C
+        budget: Optional {"max_bytes", "max_seconds"} per file (see quality_budget.py);
+                each file starts with the settings predicted to fit and is exported
+                again with cheaper ones while it is over the size budget
+
+    Returns:
+        int: 0 if every file converted, 1 otherwise
+    """
+    output_path = Path(output_dir).resolve()
+    output_path.mkdir(parents=True, exist_ok=True)
+    if index:
+        index = Path(index).resolve()
+
+    if material_map:
+        material_map = Path(material_map).resolve()
+    material_rules = load_material_rules(material_map) if material_map else None
+    materials = material_key(material_name, material_rules)
+    job_file = input_dir if is_job_file(input_dir) else None
+
+    postprocess = {"optimize": True, "quantize": quantize} if optimize else None
+
+    def settings_hash(options, file_materials, file_variants):
+        # A budget changes the settings files end up with, so it is part of what makes an output up to date
+        if budget:
+            options = dict(options or {}, budget=budget)
+        return options_hash(options, file_materials, postprocess, file_variants)
+
+    manifest = BatchManifest(output_path, settings_hash(export_options, materials, variants))
+    defaults = (material_name, material_map, export_options, variants, None)
+    rules_by_map = {material_map: material_rules}
+    quarantine = Quarantine(output_path, quarantine_after)
+    costs = CostModel(output_path)
+    planner = QualityPlanner(output_path, costs=costs, **budget) if budget else None
+
+    def postprocess_output(output_file, result, lines):
+        if not optimize or not result["ok"]:
+            return
+        try:
+            stats = optimize_file(output_file, quantize)
+        except (OSError, GLBError, ValueError) as e:
+            lines.append(f"WARNING: Could not optimize {output_file.name}: {e}")
+            return
+        result["optimized_bytes"] = result.get("optimized_bytes", 0) + stats["after_bytes"]
+        result["bytes_saved"] = result.get("bytes_saved", 0) + stats["saved_bytes"]
+        lines.append(f"Optimized {output_file.name}: {describe(stats)}")
+
+    print(f"Running {jobs} KeyShot worker(s)")
+    print()
+
+    # A job list is only read as far ahead as the workers need, so it is never held in memory
+    work = queue.PriorityQueue(maxsize=jobs * JOB_FILE_LOOKAHEAD if job_file else 0)
+    order = itertools.count()
+    # Output file -> (newest Creo file, settings) queued for it but not yet taken by a worker
+    queued = {}
+    # Output file -> (model key, iteration, Creo file) of the model that writes it in this run
+    claims = {}
+    queued_lock = threading.Lock()
+    # Set once workers may start taking files
+    dispatch = threading.Event()
+    results = []
+    print_lock = threading.Lock()
+    progress = BatchProgress(jobs, metrics_file)
+
+    def convert_file(keyshot, creo_file, output_file, settings, on_event=None):
+        """Convert one file (all of its variants), using the cache when every output is cached"""
+        material_name, material_map, export_options, variants, option_hash = settings
+        material_rules = rules_by_map[material_map]
+        file_budget = None
+        if planner and not variants:
+            file_budget = job_budget(budget, export_options)
+            export_options = planner.choose(creo_file, export_options)
+        outputs = variant_outputs(output_file, export_options, variants)
+        output_paths = [path for path, _ in outputs]
+        lines = []
+        result = None
+
+        cache_keys = []
+        if cache:
+            input_sha256 = hash_file(creo_file)
+            file_materials = material_key(material_name, material_rules, creo_file)
+            cache_keys = [cache.key(creo_file, dict(options, budget=file_budget) if file_budget else options,
+                                    file_materials, input_sha256) for _, options in outputs]
+            if all(cache.fetch(key, path) for key, path in zip(cache_keys, output_paths)):
+                result = {"input": str(creo_file), "output": str(output_file),
+                          "ok": True, "cached": True, "seconds": 0.0, "stages": {},
+                          "output_bytes": sum(path.stat().st_size for path in output_paths)}
+                if index:
+                    record_conversion(index, creo_file, output_paths, export_options,
+                                      str(material_map) if material_map else material_name)
+            else:
+                for path in output_paths:
+                    cache.release(path)
+
+        if result is None:
+            attempt = 0
+            while True:
+                result, attempt_lines = keyshot.convert(creo_file, output_file, material_name,
+                                                        export_options, variants, timeout, material_map,
+                                                        on_event, index, file_budget)
+                lines.extend(attempt_lines)
+                if result["ok"] or attempt >= retries:
+                    break
+                delay = retry_backoff * 2 ** attempt
+                attempt += 1
+                lines.append(f"Attempt {attempt} failed ({result.get('error') or 'conversion failed'}), "
+                             f"retrying in {delay:g}s")
+                # Start the retry in a fresh KeyShot session
+                keyshot.close()
+                time.sleep(delay)
+            result["attempts"] = attempt + 1
+            quarantine.record(creo_file, result["ok"], result.get("error"))
+            if planner:
+                planner.record(creo_file, result)
+            if cache and result["ok"]:
+                for key, path in zip(cache_keys, output_paths):
+                    cache.store(key, path)
+
+        for path in output_paths:
+            postprocess_output(path, result, lines)
+        if index and optimize and result["ok"]:
+            refresh_outputs(index, output_paths)
+        manifest.record(creo_file, output_paths[0], result["ok"], option_hash)
+        return result, lines
+
+    def worker(worker_id):
+        keyshot = KeyShotWorker(keyshot_path, script_path, recycle_after, max_rss_mb)
+        try:
+            while True:
+                dispatch.wait()
+                _, _, job = keyshot.take(work)
+                if job is None:
+                    return
+                output_file, predicted = job
+                with queued_lock:
+                    creo_file, settings = queued.pop(output_file)
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+
+                def on_event(event):
+                    progress.worker_event(worker_id, event)
+
+                try:
+                    result, lines = convert_file(keyshot, creo_file, output_file, settings, on_event)
+                except Exception as e:
+                    # Record the file as failed and keep the worker going
+                    result = {"input": str(creo_file), "output": str(output_file), "ok": False,
+                              "error": str(e), "seconds": 0.0, "stages": {}, "output_bytes": None}
+                    lines = []
+                    manifest.record(creo_file, output_file, False)
+                result["worker"] = worker_id
+                result["predicted_seconds"] = round(predicted, 1)
+                if result["ok"] and not result.get("cached"):
+                    costs.record(creo_file, result["seconds"])
+                progress.file_done(worker_id, result)
+
+                # Print each file's output as one block so workers do not interleave
+                with print_lock:
+                    results.append(result)
+                    status = "✓" if result["ok"] else "✗"
+                    timing = "cached" if result.get("cached") else f"{result['seconds']:.1f}s"
+                    print(f"[worker {worker_id}] {status} {creo_file.name} ({timing})")
+                    for line in lines:
+                        print(f"[worker {worker_id}]   {line}")
+                    if result.get("error"):
+                        print(f"[worker {worker_id}]   {result['error']}")
+                    print()
+        finally:
+            keyshot.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n + 1,)) for n in range(jobs)]
+    for thread in threads:
+        thread.start()
+    progress.start(progress_interval, print_lock)
+    warmup = threading.Timer(DISPATCH_WARMUP_SECONDS, dispatch.set)
+    warmup.daemon = True
+    warmup.start()
+
+    def enqueue(creo_file, skip_up_to_date, output_file=None, settings=defaults, job_row=False):
+        """
+        Queue a file unless it is up to date, quarantined or superseded
+
+        Only a newer iteration of the same model (a job-list row) or the same model saved
+        again (discovery, --watch) may take over an output another file already writes.
+
+        Raises:
+            ValueError: If a different model (e.g. door.prt next to door.asm) or an
+                        earlier job-list row already writes the same output
+        """
+        output_file = Path(output_file or output_file_for(creo_file, input_dir, output_path))
+        key, iteration = model_key(creo_file)
+        with queued_lock:
+            claim = claims.get(output_file)
+            if claim is not None:
+                if claim[0] != key or (job_row and iteration <= claim[1]):
+                    progress.discovered(queued=False)
+                    raise ValueError(f"{output_file.name} is already written by "
+                                     f"{'an earlier row for ' if job_row else ''}{claim[2]}")
+                if iteration < claim[1]:
+                    progress.discovered(queued=False)
+                    return False
+            claims[output_file] = (key, iteration, creo_file)
+        first_output = variant_outputs(output_file, None, settings[3])[0][0]
+        if skip_up_to_date and manifest.is_up_to_date(creo_file, first_output, settings[4]):
+            progress.discovered(queued=False)
+            return False
+        if not retry_quarantined and quarantine.is_quarantined(creo_file):
+            quarantined.append(creo_file)
+            progress.discovered(queued=False)
+            return False
+        with queued_lock:
+            # A newer iteration of the model still waiting in the queue takes its place
+            replaces = output_file in queued
+            queued[output_file] = (creo_file, settings)
+        if replaces:
+            progress.discovered(queued=False)
+            return False
+        progress.discovered()
+        predicted = costs.predict(creo_file)
+        if work.full():
+            dispatch.set()  # a job list's read-ahead is full, the workers have to drain it
+        work.put((-predicted, next(order), (output_file, predicted)))
+        return True
+
+    # Feed the workers while discovery is still walking the input tree
+    found_count = 0
+    queued_count = 0
+    quarantined = []
+    invalid = []
+    clashes = []
+    try:
+        if job_file:
+            for line_number, job in read_job_file(job_file, output_path):
+                found_count += 1
+                if isinstance(job, Exception):
+                    invalid.append(f"line {line_number}: {job}")
+                    continue
+                settings = job_settings(job, export_options, material_name, material_map, variants)
+                if settings[1] not in rules_by_map:
+                    rules_by_map[settings[1]] = load_material_rules(settings[1])
+                job_materials = material_key(settings[0], rules_by_map[settings[1]])
+                settings += (settings_hash(settings[2], job_materials, settings[3]),)
+                try:
+                    queued_count += enqueue(job["input"], incremental, job["output"], settings, job_row=True)
+                except ValueError as e:
+                    invalid.append(f"line {line_number}: {e}")
+        else:
+            for creo_file in find_creo_files(input_dir, recursive):
+                found_count += 1
+                try:
+                    queued_count += enqueue(creo_file, incremental or watch is not None)
+                except ValueError as e:
+                    clashes.append(f"{creo_file.name}: {e}")
+        dispatch.set()
+
+        if found_count:
+            with print_lock:
+                print(f"{'Read' if job_file else 'Found'} {found_count} {'jobs' if job_file else 'Creo files'}, "
+                      f"{queued_count} to convert")
+                if invalid:
+                    print(f"Skipped {len(invalid)} invalid job(s):")
+                    for error in invalid[:10]:
+                        print(f"  {error}")
+                if clashes:
+                    print(f"WARNING: Skipped {len(clashes)} file(s) whose output another model already writes:")
+                    for clash in clashes[:10]:
+                        print(f"  {clash}")
+                if quarantined:
+                    print(f"Skipped {len(quarantined)} quarantined file(s) (see {quarantine.path.name}, "
+                          f"use --retry-quarantined to try them again)")
+                print()
+
+        if watch is not None:
+            with print_lock:
+                print(f"Watching {input_dir} for new Creo iterations ({watch.mode}), press Ctrl+C to stop")
+                print()
+            try:
+                for creo_file in watch.changes():
+                    found_count += 1
+                    try:
+                        if enqueue(creo_file, True):
+                            with print_lock:
+                                print(f"Queued {creo_file.name}")
+                    except ValueError as e:
+                        clashes.append(f"{creo_file.name}: {e}")
+                        with print_lock:
+                            print(f"WARNING: Skipped {creo_file.name}: {e}")
+            except KeyboardInterrupt:
+                with print_lock:
+                    print("Stopped watching, finishing queued files")
+            finally:
+                watch.close()
+    finally:
+        warmup.cancel()
+        dispatch.set()
+        progress.discovery_finished()
+        for _ in threads:
+            work.put((math.inf, next(order), None))
+
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    progress.stop()
+    manifest.compact()
+    costs.save()
+    if planner:
+        planner.save()
+
+    if found_count == 0:
+        print(f"No Creo files found in {input_dir}")
+        return 0
+    if not results and invalid:
+        print(f"No valid jobs in {input_dir}")
+        return 1
+
+    success_count = sum(1 for r in results if r["ok"])
+    failed = [r for r in results if not r["ok"]]
+
+    print(f"Batch conversion complete:")
+    print(f"  Successful: {success_count}")
+    print(f"  Failed: {len(failed)}")
+    if quarantined:
+        print(f"  Quarantined: {len(quarantined)}")
+    if invalid:
+        print(f"  Invalid jobs: {len(invalid)}")
+    if clashes:
+        print(f"  Output clashes: {len(clashes)}")
+    print(f"  Workers: {jobs}")
+    print(f"  Wall time: {elapsed:.1f}s")
+    if cache:
+        print(f"  Cache hits: {cache.hits}")
+    for r in failed:
+        print(f"  ✗ {Path(r['input']).name}" + (f" ({r['error']})" if r.get("error") else ""))
+
+    report = build_report(results, elapsed, slowest)
+    report_path = Path(report_file) if report_file else output_path / REPORT_NAME
+    print()
+    print_report(report)
+    write_report(report, report_path)
+    print(f"  Report written to {report_path}")
+
+    return 1 if failed or invalid or clashes else 0
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+KeyShot conversion pipeline benchmarks
+Measures Creo file discovery time, end-to-end batch throughput and wrapper overhead over
+synthetic directories, using the simulated KeyShot in keyshot_sim/ (no license needed).
+
+Examples:
+  # Default suite (discovery up to 10,000 files, batches up to 1,000 files)
+  python keyshot_benchmark.py
+
+  # Batch throughput with realistic latencies and 4 workers
+  python keyshot_benchmark.py --batch-sizes 100 --jobs 1,4 --import-seconds 0.05 --export-seconds 0.1
+
+  # Save results for comparison between branches
+  python keyshot_benchmark.py --json bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from creo_files import find_creo_files
+from keyshot_batch import run_parallel_batch
+
+PROGRAMS_DIR = Path(__file__).resolve().parent
+FAKE_KEYSHOT = PROGRAMS_DIR / "keyshot_sim" / "keyshot"
+SCRIPT_PATH = PROGRAMS_DIR / "creo_to_gltf_keyshot.py"
+
+
+def make_synthetic_tree(root, file_count, iterations=3, input_bytes=1024, per_dir=500):
+    """
+    Create a directory of fake Creo files
+
+    Args:
+        root: Directory to create files in
+        file_count: Total number of files to create
+        iterations: Iterations per model (part.prt.1 ... part.prt.N)
+        input_bytes: Size of each file
+        per_dir: Files per subdirectory
+
+    Returns:
+        int: Number of distinct models created
+    """
+    root = Path(root)
+    payload = b'\0' * input_bytes
+    models = 0
+    written = 0
+    while written < file_count:
+        directory = root / f"dir{written // per_dir:03d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        extension = "asm" if models % 5 == 0 else "prt"
+        for iteration in range(1, iterations + 1):
+            if written >= file_count:
+                break
+            (directory / f"model{models:05d}.{extension}.{iteration}").write_bytes(payload)
+            written += 1
+        models += 1
+    return models
+
+
+def legacy_discovery(input_dir):
+    """The original 200-glob discovery loop, kept as a baseline"""
+    input_path = Path(input_dir).resolve()
+    creo_files = list(input_path.glob("*.prt")) + list(input_path.glob("*.asm"))
+    for i in range(1, 100):
+        creo_files.extend(input_path.glob(f"*.prt.{i}"))
+        creo_files.extend(input_path.glob(f"*.asm.{i}"))
+    return creo_files
+
+
+def bench_discovery(sizes, repeat=3):
+    """
+    Time discovery over flat directories of increasing size
+
+    Args:
+        sizes: File counts to test
+        repeat: Runs per measurement (the fastest is kept)
+
+    Returns:
+        list: One result dict per size
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_synthetic_tree(tmp, size, per_dir=size)
+            directory = Path(tmp) / "dir000"
+
+            def best_of(fn):
+                times = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    found = fn()
+                    times.append(time.perf_counter() - started)
+                return min(times), len(found)
+
+            scandir_seconds, models = best_of(lambda: list(find_creo_files(directory)))
+            legacy_seconds, legacy_files = best_of(lambda: legacy_discovery(directory))
+
+        results.append({
+            "files": size,
+            "models": models,
+            "scandir_ms": round(scandir_seconds * 1000, 2),
+            "legacy_glob_ms": round(legacy_seconds * 1000, 2),
+            "legacy_files": legacy_files,
+        })
+    return results
+
+
+def bench_batch(sizes, jobs_list, sim_env):
+    """
+    Run end-to-end batches through the wrapper against the simulated KeyShot
+
+    Args:
+        sizes: Numbers of models per batch
+        jobs_list: Worker counts to test
+        sim_env: LUX_SIM_* settings passed to the fake KeyShot
+
+    Returns:
+        list: One result dict per (size, jobs) combination
+    """
+    os.environ.update({k: str(v) for k, v in sim_env.items()})
+    per_file = sim_env["LUX_SIM_IMPORT_SECONDS"] + sim_env["LUX_SIM_EXPORT_SECONDS"]
+
+    results = []
+    for size in sizes:
+        for jobs in jobs_list:
+            with tempfile.TemporaryDirectory() as tmp:
+                input_dir = Path(tmp) / "in"
+                make_synthetic_tree(input_dir, size, iterations=1)
+
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exit_code = run_parallel_batch(str(FAKE_KEYSHOT), SCRIPT_PATH, input_dir,
+                                                   Path(tmp) / "out", {}, None, jobs, recursive=True)
+                wall = time.perf_counter() - started
+
+            # Best possible wall time if the wrapper added nothing
+            ideal = sim_env["LUX_SIM_STARTUP_SECONDS"] + math.ceil(size / jobs) * per_file
+            results.append({
+                "files": size,
+                "jobs": jobs,
+                "exit_code": exit_code,
+                "wall_seconds": round(wall, 3),
+                "files_per_hour": round(size / wall * 3600),
+                "overhead_ms_per_file": round(max(0.0, wall - ideal) * jobs / size * 1000, 2),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the KeyShot conversion pipeline with a simulated KeyShot',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Examples:", 1)[1]
+    )
+    parser.add_argument('--discovery-sizes', default='10,100,1000,10000',
+                       help='File counts for the discovery benchmark (default: 10,100,1000,10000)')
+    parser.add_argument('--batch-sizes', default='10,100,1000',
+                       help='File counts for the batch benchmark (default: 10,100,1000)')
+    parser.add_argument('--jobs', default='1,4',
+                       help='Worker counts for the batch benchmark (default: 1,4)')
+    parser.add_argument('--startup-seconds', type=float, default=0.0,
+                       help='Simulated KeyShot startup time (default: 0)')
+    parser.add_argument('--import-seconds', type=float, default=0.0,
+                       help='Simulated import time per file (default: 0)')
+    parser.add_argument('--export-seconds', type=float, default=0.0,
+                       help='Simulated export time per file (default: 0)')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                       help='Fraction of simulated imports that fail (default: 0)')
+    parser.add_argument('--output-bytes', type=int, default=4096,
+                       help='Size of each simulated GLB (default: 4096)')
+    parser.add_argument('--json',
+                       help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    def int_list(value):
+        return [int(v) for v in value.split(',') if v.strip()]
+
+    sim_env = {
+        "LUX_SIM_STARTUP_SECONDS": args.startup_seconds,
+        "LUX_SIM_IMPORT_SECONDS": args.import_seconds,
+        "LUX_SIM_EXPORT_SECONDS": args.export_seconds,
+        "LUX_SIM_IMPORT_FAILURE_RATE": args.failure_rate,
+        "LUX_SIM_OUTPUT_BYTES": args.output_bytes,
+    }
+
+    print("Discovery (one flat directory, 3 iterations per model):")
+    print(f"  {'files':>7} {'models':>7} {'scandir ms':>11} {'200-glob ms':>12}")
+    discovery = bench_discovery(int_list(args.discovery_sizes))
+    for r in discovery:
+        print(f"  {r['files']:>7} {r['models']:>7} {r['scandir_ms']:>11.2f} {r['legacy_glob_ms']:>12.2f}")
+    print()
+
+    print("End-to-end batch (simulated KeyShot):")
+    print(f"  {'files':>7} {'jobs':>5} {'wall s':>8} {'files/hour':>11} {'overhead ms/file':>17}")
+    batch = bench_batch(int_list(args.batch_sizes), int_list(args.jobs), sim_env)
+    for r in batch:
+        print(f"  {r['files']:>7} {r['jobs']:>5} {r['wall_seconds']:>8.2f} {r['files_per_hour']:>11} "
+              f"{r['overhead_ms_per_file']:>17.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"settings": sim_env, "discovery": discovery, "batch": batch}, f, indent=2)
+        print()
+        print(f"Results written to {args.json}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
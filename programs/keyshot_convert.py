@@ -9,38 +9,114 @@ This is the main script you should run - it calls KeyShot with the conversion sc
 import subprocess
 import sys
 import os
+import threading
 from pathlib import Path
 import argparse
 
-def find_keyshot():
-    """Try to find KeyShot executable"""
-    common_paths = [
-        'keyshot',
-        'keyshot.exe',
-        '/usr/local/bin/keyshot',
-        'C:\\Program Files\\KeyShot\\bin\\keyshot.exe',
-        'C:\\Program Files\\KeyShot11\\bin\\keyshot.exe',
-        'C:\\Program Files\\KeyShot10\\bin\\keyshot.exe',
-        'C:\\Program Files\\KeyShot 2024\\bin\\keyshot.exe',
-        '/Applications/KeyShot.app/Contents/MacOS/KeyShot',
-        '/Applications/KeyShot11.app/Contents/MacOS/KeyShot',
-    ]
-    
-    for path in common_paths:
-        if os.path.exists(path):
-            return path
-        try:
-            result = subprocess.run([path, '-version'], 
-                                  capture_output=True, 
-                                  timeout=5)
-            if result.returncode == 0:
-                return path
-        except (FileNotFoundError, subprocess.TimeoutExpired):
+from keyshot_batch import run_parallel_batch
+from conversion_cache import ConversionCache, DEFAULT_CACHE_SIZE_MB
+from keyshot_install import find_keyshot, get_keyshot_version
+from glb_container import GLBError
+from glb_optimize import optimize_file, describe
+from export_variants import parse_variants, variant_outputs
+from batch_quarantine import DEFAULT_QUARANTINE_AFTER
+from material_rules import load_material_rules, material_key
+from keyshot_worker import parse_event
+from keyshot_slots import SlotTimeout, configure as configure_slots, get_limiter
+from glb_bundle import BundleError, GLBBundle, pack_directory
+from glb_index import record_conversion, refresh_outputs
+from folder_watch import FolderWatcher, DEFAULT_SETTLE_SECONDS
+from batch_jobs import is_job_file
+from glb_library import share_parts
+from quality_budget import QualityPlanner, job_budget, parse_size
+from batch_report import settings_label
+from distributed_batch import run_coordinator, run_node, CONNECT_TIMEOUT_SECONDS, DEFAULT_PORT, DEFAULT_NODE_TIMEOUT
+
+def export_options_to_args(export_options, material_name=None, variants_spec=None, material_map=None,
+                           index=None, budget=None):
+    """
+    Convert export options back into KeyShot script command line arguments
+
+    Args:
+        export_options: Dictionary of export options
+        material_name: Optional material name to apply to all geometry
+        variants_spec: Optional --variants specification
+        material_map: Optional material mapping file
+        index: Optional SQLite GLB index the outputs are added to
+        budget: Optional {"max_bytes", "max_seconds", "allow_draco"} size/time budget
+
+    Returns:
+        list: Script arguments (--material, --dpi, ...)
+    """
+    script_args = []
+    if material_name:
+        script_args.extend(['--material', material_name])
+    if material_map:
+        script_args.extend(['--material-map', str(material_map)])
+    if 'dpi' in export_options:
+        script_args.extend(['--dpi', str(export_options['dpi'])])
+    if 'num_samples' in export_options:
+        script_args.extend(['--samples', str(export_options['num_samples'])])
+    if export_options.get('occlusion') is False:
+        script_args.append('--no-occlusion')
+    if export_options.get('draco_compression') is False:
+        script_args.append('--no-compression')
+    if variants_spec:
+        script_args.extend(['--variants', variants_spec])
+    if index:
+        script_args.extend(['--index', str(index)])
+    if budget and budget.get("max_bytes"):
+        script_args.extend(['--max-size', str(budget["max_bytes"])])
+    if budget and budget.get("max_seconds"):
+        script_args.extend(['--max-seconds', str(budget["max_seconds"])])
+    if budget and budget.get("allow_draco") is False:
+        script_args.append('--budget-no-draco')
+    return script_args
+
+def optimize_output(output_file, quantize=False):
+    """
+    Run the GLB optimizer on a single converted file and report the savings
+
+    Args:
+        output_file: Exported GLB
+        quantize: Also quantize vertex attributes
+    """
+    if Path(output_file).suffix.lower() != '.glb':
+        print("WARNING: --optimize only supports .glb output, skipping")
+        return
+    try:
+        stats = optimize_file(output_file, quantize)
+    except (OSError, GLBError, ValueError) as e:
+        print(f"WARNING: Could not optimize {output_file}: {e}")
+        return
+    print(f"✓ Optimized: {describe(stats)}")
+
+def print_keyshot_output(stream):
+    """
+    Print KeyShot's output, turning progress events into short status lines
+
+    Args:
+        stream: KeyShot's stdout
+    """
+    for line in stream:
+        line = line.rstrip("\n")
+        event = parse_event(line)
+        if event is None:
+            print(line, flush=True)
             continue
-    
-    return None
+        name = event.get("event")
+        if name == "discovered":
+            print(f"[progress] {event['count']} files to convert", flush=True)
+        elif name == "stage":
+            print(f"[progress] {Path(event['input']).name}: {event['stage']} done in {event['seconds']:.1f}s",
+                  flush=True)
+        elif name == "finished":
+            size = f", {event['output_bytes'] / 1e6:.2f} MB" if event.get("output_bytes") is not None else ""
+            print(f"[progress] {Path(event['input']).name}: finished in {event['seconds']:.1f}s{size}", flush=True)
+        elif name == "failed":
+            print(f"[progress] {Path(event['input']).name}: failed ({event.get('error')})", flush=True)
 
-def run_keyshot_conversion(keyshot_path, script_path, args):
+def run_keyshot_conversion(keyshot_path, script_path, args, timeout=None):
     """
     Run KeyShot in headless mode with the conversion script
     
@@ -48,6 +124,7 @@ def run_keyshot_conversion(keyshot_path, script_path, args):
         keyshot_path: Path to KeyShot executable
         script_path: Path to the KeyShot Python script
         args: Additional arguments for the script
+        timeout: Optional wall-clock limit in seconds; KeyShot is killed when it is exceeded
     """
     # Build the command
     # KeyShot headless mode: keyshot -script script.py arg1 arg2 ...
@@ -57,19 +134,45 @@ def run_keyshot_conversion(keyshot_path, script_path, args):
     print(f"Command: {' '.join(cmd)}")
     print()
     
-    # Run the command
+    # Wait for a free host-wide KeyShot slot (see keyshot_slots.py)
     try:
-        result = subprocess.run(
+        slot = get_limiter().acquire(purpose="keyshot_convert")
+    except SlotTimeout as e:
+        print(f"ERROR: {e}")
+        return 1
+    try:
+        return _run_keyshot_process(cmd, timeout)
+    finally:
+        if slot:
+            slot.release()
+
+def _run_keyshot_process(cmd, timeout):
+    # Run the command, reading its output on a separate thread
+    try:
+        process = subprocess.Popen(
             cmd,
-            stdout=sys.stdout,
-            stderr=sys.stderr,
-            text=True
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors='replace',
+            bufsize=1
         )
-        
-        return result.returncode
     except Exception as e:
         print(f"Error running KeyShot: {e}")
         return 1
+    
+    reader = threading.Thread(target=print_keyshot_output, args=(process.stdout,), daemon=True)
+    reader.start()
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        reader.join()
+        print(f"ERROR: KeyShot did not finish within {timeout:g}s and was stopped")
+        return 1
+    reader.join()
+    return returncode
 
 def main():
     parser = argparse.ArgumentParser(
@@ -89,6 +192,42 @@ Examples:
   # Batch convert directory with material
   python keyshot_convert.py --batch ./creo_files ./gltf_output --material "Steel"
 
+  # Assign materials per part from name/glob rules, "Steel" for everything else
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --material-map materials.json --material "Steel"
+
+  # Batch convert using 8 KeyShot processes in parallel
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --jobs 8
+
+  # Batch convert a whole directory tree (output mirrors the subdirectories)
+  python keyshot_convert.py --batch ./vault ./gltf_output --recursive
+
+  # Nightly rebuild: only convert new or changed files, resume interrupted runs
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --incremental
+
+  # Mixed orders: per-file materials and quality from a CSV or JSON-lines job list
+  python keyshot_convert.py --batch orders.csv ./gltf_output --jobs 4
+
+  # Reuse earlier conversions of unchanged files
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --cache-dir ~/.cache/keyshot-glb
+
+  # Export low/medium/high quality GLBs from a single import (model_low.glb, ...)
+  python keyshot_convert.py model.prt model.glb --variants lod
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --variants "web:dpi=72,samples=8;print:dpi=300,samples=64"
+
+  # Overnight batch: give up on a file after 30 minutes, retry failures twice
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --timeout 1800 --retries 2
+
+  # Show progress every 10 seconds and export it for monitoring
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --jobs 4 --progress-interval 10 \
+    --metrics-file /var/lib/node_exporter/textfile/keyshot.prom
+
+  # Spread a batch over several workstations: one coordinator, one node per workstation
+  python keyshot_convert.py --batch //server/vault //server/gltf --listen 7700 --recursive
+  python keyshot_convert.py --join coordinator-host:7700 --jobs 2
+
+  # Remove duplicate and unused data from the exported GLBs
+  python keyshot_convert.py --batch ./creo_files ./gltf_output --optimize --quantize
+
   # Specify KeyShot path
   python keyshot_convert.py model.prt output.glb --keyshot /path/to/keyshot
 
@@ -102,13 +241,15 @@ Requirements:
     )
     
     parser.add_argument('input', nargs='?', 
-                       help='Input Creo file or directory (with --batch)')
+                       help='Input Creo file, or directory or .csv/.jsonl job list (with --batch)')
     parser.add_argument('output', nargs='?',
                        help='Output glTF file or directory')
     parser.add_argument('--batch', action='store_true',
                        help='Batch convert all Creo files in input directory')
     parser.add_argument('--keyshot', 
                        help='Path to KeyShot executable')
+    parser.add_argument('--refresh-keyshot', action='store_true',
+                       help='Ignore the cached KeyShot location and search again')
     parser.add_argument('--script',
                        help='Path to KeyShot conversion script (default: creo_to_gltf_keyshot.py)')
     parser.add_argument('--dpi', type=int,
@@ -119,67 +260,353 @@ Requirements:
                        help='Disable ambient occlusion')
     parser.add_argument('--no-compression', action='store_true',
                        help='Disable Draco geometry compression')
+    parser.add_argument('--max-size', metavar='SIZE',
+                       help='Size budget per GLB (e.g. 5MB): choose lower settings for each file to fit and export again while it is larger '
+                            '(batches learn from their results; a single file only uses what batches learned)')
+    parser.add_argument('--max-seconds', type=float, metavar='N',
+                       help='Time budget per file: choose settings predicted to convert within N seconds')
     parser.add_argument('--material',
                        help='Material name to apply to all geometry before export (e.g., "Stainless Steel Brushed Fine 90°")')
+    parser.add_argument('--material-map',
+                       help='JSON file of part-name/glob rules mapped to materials; --material is used for parts no rule matches')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Number of KeyShot processes to run in parallel with --batch (default: 1); longest '
+                            'predicted files go first, among those listed before the workers start (up to 15s)')
+    parser.add_argument('--recursive', action='store_true',
+                       help='With --batch, also convert Creo files in subdirectories')
+    parser.add_argument('--incremental', action='store_true',
+                       help='With --batch, skip files the output manifest records as already converted')
+    parser.add_argument('--report',
+                       help='With --batch, write the JSON performance report here (default: <output>/.keyshot-report.json)')
+    parser.add_argument('--slowest', type=int, default=10,
+                       help='Number of slowest inputs listed in the batch report (default: 10)')
+    parser.add_argument('--progress-interval', type=float, default=30,
+                       help='With --batch, seconds between live progress lines (files/min, ETA, workers), 0 to disable (default: 30)')
+    parser.add_argument('--metrics-file',
+                       help='With --batch, keep a Prometheus textfile with the live progress here')
+    parser.add_argument('--variants',
+                       help='Export several quality levels from one import: "lod" or "name:dpi=N,samples=N;name:..."')
+    parser.add_argument('--optimize', action='store_true',
+                       help='Remove duplicate and unused data from each exported GLB')
+    parser.add_argument('--quantize', action='store_true',
+                       help='With --optimize, also quantize normals and texture coordinates')
+    parser.add_argument('--timeout', type=float,
+                       help='Stop KeyShot when one file takes longer than this many seconds')
+    parser.add_argument('--retries', type=int, default=0,
+                       help='With --batch, retry a failed file this many times (default: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=5.0,
+                       help='Seconds before the first retry, doubled for each further retry (default: 5)')
+    parser.add_argument('--quarantine-after', type=int, default=DEFAULT_QUARANTINE_AFTER,
+                       help=f'With --batch, skip files that failed in this many consecutive batches, 0 to never skip (default: {DEFAULT_QUARANTINE_AFTER})')
+    parser.add_argument('--retry-quarantined', action='store_true',
+                       help='With --batch, also convert files on the quarantine list')
+    parser.add_argument('--recycle-after', type=int, metavar='N',
+                       help='With --batch or --join, restart each KeyShot worker after N files')
+    parser.add_argument('--max-rss', type=float, metavar='MB',
+                       help='With --batch or --join, restart a KeyShot worker once its resident memory exceeds this many MB')
+    parser.add_argument('--listen', metavar='[HOST:]PORT',
+                       help=f'With --batch, coordinate the batch across nodes that --join this port (e.g. {DEFAULT_PORT})')
+    parser.add_argument('--join', metavar='HOST:PORT',
+                       help='Run as a node: convert jobs from a coordinator with --jobs KeyShot workers')
+    parser.add_argument('--node-name',
+                       help='With --join, name shown by the coordinator (default: host name)')
+    parser.add_argument('--cluster-token', default=os.environ.get('KEYSHOT_CLUSTER_TOKEN'),
+                       help='Shared secret between coordinator and nodes (default: $KEYSHOT_CLUSTER_TOKEN)')
+    parser.add_argument('--path-map', action='append', default=[], metavar='FROM=TO',
+                       help='With --join, translate coordinator path prefixes to local ones (repeatable)')
+    parser.add_argument('--node-timeout', type=float, default=DEFAULT_NODE_TIMEOUT,
+                       help=f'With --listen, seconds without a heartbeat before a node\'s jobs are reassigned (default: {DEFAULT_NODE_TIMEOUT})')
+    parser.add_argument('--connect-timeout', type=float, default=CONNECT_TIMEOUT_SECONDS,
+                       help=f'With --join, seconds to keep retrying an unreachable or lost coordinator (default: {CONNECT_TIMEOUT_SECONDS})')
+    parser.add_argument('--share-parts', action='store_true',
+                       help='With --batch, move mesh data used by several GLBs into a shared part library (reduces storage and download size, not conversion time)')
+    parser.add_argument('--part-library', metavar='DIR',
+                       help='Part library for --share-parts (default: <output>/parts)')
+    parser.add_argument('--bundle', metavar='PATH',
+                       help='With --batch, add new and changed GLBs to this indexed bundle afterwards')
+    parser.add_argument('--index', metavar='PATH',
+                       help='Add every converted GLB to this SQLite metadata index (see glb_index.py)')
+    parser.add_argument('--watch', action='store_true',
+                       help='With --batch, keep running and convert new Creo iterations as they are saved')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS, metavar='SECONDS',
+                       help=f'With --watch, wait until a file has been unchanged this long (default: {DEFAULT_SETTLE_SECONDS:g})')
+    parser.add_argument('--poll-interval', type=float, metavar='SECONDS',
+                       help='With --watch, poll the input tree instead of using inotify (for network shares)')
+    parser.add_argument('--slot-timeout', type=float,
+                       help='Give up when no host-wide KeyShot slot becomes free within this many seconds (default: wait)')
+    parser.add_argument('--slot-dir',
+                       help='Shared slot directory of the host-wide KeyShot limit (default: see keyshot_slots.py)')
+    parser.add_argument('--cache-dir',
+                       help='Cache converted GLBs here and reuse them for unchanged inputs and options')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB,
+                       help=f'Cache size limit in MB, least recently used entries are evicted (default: {DEFAULT_CACHE_SIZE_MB})')
 
     args = parser.parse_args()
+
+    if args.jobs < 1:
+        print("ERROR: --jobs must be at least 1")
+        sys.exit(1)
+    if args.jobs > 1 and not (args.batch or args.join):
+        print("ERROR: --jobs can only be used with --batch or --join")
+        sys.exit(1)
+    if args.listen and not args.batch:
+        print("ERROR: --listen can only be used with --batch")
+        sys.exit(1)
+    if args.listen and (args.optimize or args.cache_dir or args.retries):
+        print("ERROR: --optimize, --cache-dir and --retries are not supported with --listen")
+        sys.exit(1)
+    if args.join and (args.batch or args.input or args.output):
+        print("ERROR: --join takes its jobs from the coordinator; do not pass --batch or files")
+        sys.exit(1)
+    path_map = []
+    for mapping in args.path_map:
+        remote, separator, local = mapping.partition('=')
+        if not separator or not remote:
+            print(f"ERROR: Invalid --path-map '{mapping}', expected FROM=TO")
+            sys.exit(1)
+        path_map.append((remote, local))
+    variants = None
+    if args.variants:
+        try:
+            variants = parse_variants(args.variants)
+        except ValueError as e:
+            print(f"ERROR: Invalid --variants: {e}")
+            sys.exit(1)
+    material_rules = None
+    if args.material_map:
+        try:
+            material_rules = load_material_rules(args.material_map)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Invalid --material-map: {e}")
+            sys.exit(1)
+        args.material_map = str(Path(args.material_map).resolve())
+    if args.quantize and not args.optimize:
+        print("ERROR: --quantize requires --optimize")
+        sys.exit(1)
+    if args.timeout is not None and args.timeout <= 0:
+        print("ERROR: --timeout must be greater than 0")
+        sys.exit(1)
+    if args.retries < 0:
+        print("ERROR: --retries cannot be negative")
+        sys.exit(1)
+    if args.recycle_after is not None and args.recycle_after < 1:
+        print("ERROR: --recycle-after must be at least 1")
+        sys.exit(1)
+    if args.max_rss is not None and args.max_rss <= 0:
+        print("ERROR: --max-rss must be greater than 0")
+        sys.exit(1)
+    if (args.recycle_after or args.max_rss) and not (args.join or (args.batch and not args.listen)):
+        print("ERROR: --recycle-after and --max-rss can only be used with --batch or --join")
+        sys.exit(1)
+    if args.slot_timeout is not None and args.slot_timeout < 0:
+        print("ERROR: --slot-timeout cannot be negative")
+        sys.exit(1)
+    configure_slots(args.slot_dir, args.slot_timeout)
+    if args.bundle and not args.batch:
+        print("ERROR: --bundle can only be used with --batch")
+        sys.exit(1)
+    if (args.share_parts or args.part_library) and not args.batch:
+        print("ERROR: --share-parts and --part-library can only be used with --batch")
+        sys.exit(1)
+    if (args.share_parts or args.part_library) and args.bundle:
+        print("ERROR: --share-parts cannot be combined with --bundle: the part library's external "
+              "buffers do not resolve from inside a bundle")
+        sys.exit(1)
+    if args.index and args.join:
+        print("ERROR: --index is kept by the coordinator; pass it with --listen instead of --join")
+        sys.exit(1)
+    if args.index:
+        args.index = str(Path(args.index).resolve())
+    if args.watch and (not args.batch or args.listen):
+        print("ERROR: --watch can only be used with --batch (not with --listen)")
+        sys.exit(1)
+    if args.settle < 0 or (args.poll_interval is not None and args.poll_interval <= 0):
+        print("ERROR: --settle cannot be negative and --poll-interval must be greater than 0")
+        sys.exit(1)
+    budget = None
+    if args.max_size or args.max_seconds is not None:
+        try:
+            max_bytes = parse_size(args.max_size) if args.max_size else None
+        except ValueError as e:
+            print(f"ERROR: Invalid --max-size: {e}")
+            sys.exit(1)
+        if args.max_seconds is not None and args.max_seconds <= 0:
+            print("ERROR: --max-seconds must be greater than 0")
+            sys.exit(1)
+        if args.listen or args.join or variants:
+            print("ERROR: --max-size and --max-seconds are not supported with --listen, --join or --variants")
+            sys.exit(1)
+        budget = {"max_bytes": max_bytes, "max_seconds": args.max_seconds}
+    if (args.incremental or args.recursive) and not args.batch:
+        print("ERROR: --incremental and --recursive can only be used with --batch")
+        sys.exit(1)
     
-    # Find KeyShot
-    keyshot_path = args.keyshot or find_keyshot()
+    # Find KeyShot (a --listen coordinator only hands out jobs and does not need it)
+    keyshot_path = None
+    keyshot_version = None
+    script_path = None
+    if not args.listen:
+        keyshot_path = args.keyshot or find_keyshot(refresh=args.refresh_keyshot)
     
-    if not keyshot_path:
-        print("ERROR: Could not find KeyShot.")
-        print("Please install KeyShot or specify the path with --keyshot")
-        print()
-        print("KeyShot can be downloaded from: https://www.keyshot.com/")
-        print("Note: KeyShot Pro license is required for scripting features")
-        sys.exit(1)
+        if not keyshot_path:
+            print("ERROR: Could not find KeyShot.")
+            print("Please install KeyShot or specify the path with --keyshot")
+            print()
+            print("KeyShot can be downloaded from: https://www.keyshot.com/")
+            print("Note: KeyShot Pro license is required for scripting features")
+            sys.exit(1)
     
-    print(f"Using KeyShot: {keyshot_path}")
-    print()
+        keyshot_version = get_keyshot_version(keyshot_path)
+        print(f"Using KeyShot: {keyshot_path} ({keyshot_version})")
+        print()
     
-    # Find the conversion script
-    if args.script:
-        script_path = args.script
-    else:
-        # Look for script in same directory as this wrapper
-        script_dir = Path(__file__).parent
-        script_path = script_dir / "creo_to_gltf_keyshot.py"
+        # Find the conversion script
+        if args.script:
+            script_path = args.script
+        else:
+            # Look for script in same directory as this wrapper
+            script_dir = Path(__file__).parent
+            script_path = script_dir / "creo_to_gltf_keyshot.py"
         
-        if not script_path.exists():
-            print(f"ERROR: Conversion script not found: {script_path}")
-            print("Please ensure creo_to_gltf_keyshot.py is in the same directory")
-            sys.exit(1)
+            if not script_path.exists():
+                print(f"ERROR: Conversion script not found: {script_path}")
+                print("Please ensure creo_to_gltf_keyshot.py is in the same directory")
+                sys.exit(1)
     
-    # Build arguments for the KeyShot script
-    script_args = []
+    if args.join:
+        exit_code = run_node(args.join, keyshot_path, script_path, args.jobs, args.node_name,
+                             args.cluster_token, path_map, args.recycle_after, args.max_rss,
+                             args.connect_timeout)
+        sys.exit(exit_code)
     
     if args.batch:
         if not args.input or not args.output:
             print("ERROR: --batch requires input and output directories")
             sys.exit(1)
-        script_args.extend(['--batch', args.input, args.output])
+        if is_job_file(args.input) and (args.listen or args.watch):
+            print("ERROR: --listen and --watch need an input directory, not a job list")
+            sys.exit(1)
     else:
         if not args.input or not args.output:
             print("ERROR: Input and output files are required")
             print("Use --help for usage information")
             sys.exit(1)
-        script_args.extend([args.input, args.output])
     
-    # Add optional arguments
-    if args.material:
-        script_args.extend(['--material', args.material])
+    # Collect export options (keys match the KeyShot script's export options)
+    export_options = {}
     if args.dpi:
-        script_args.extend(['--dpi', str(args.dpi)])
+        export_options['dpi'] = args.dpi
     if args.samples:
-        script_args.extend(['--samples', str(args.samples)])
+        export_options['num_samples'] = args.samples
     if args.no_occlusion:
-        script_args.append('--no-occlusion')
+        export_options['occlusion'] = False
     if args.no_compression:
-        script_args.append('--no-compression')
+        export_options['draco_compression'] = False
+    
+    cache = None
+    if args.cache_dir:
+        cache = ConversionCache(args.cache_dir, args.cache_size, keyshot_version)
     
     # Run the conversion
-    exit_code = run_keyshot_conversion(keyshot_path, str(script_path), script_args)
+    if args.batch and args.listen:
+        # Jobs are handed out to the nodes that join; this machine only coordinates
+        exit_code = run_coordinator(args.listen, args.input, args.output, export_options, args.material,
+                                    args.cluster_token, args.incremental, args.recursive, args.report,
+                                    args.slowest, variants, args.timeout, args.material_map,
+                                    args.node_timeout, args.index)
+    elif args.batch:
+        # Batch jobs are streamed to persistent KeyShot workers
+        watch = None
+        if args.watch:
+            if not Path(args.input).is_dir():
+                print(f"ERROR: Input directory not found: {args.input}")
+                sys.exit(1)
+            watch = FolderWatcher(args.input, args.recursive, args.settle, args.poll_interval)
+        exit_code = run_parallel_batch(keyshot_path, script_path, args.input, args.output,
+                                       export_options, args.material, args.jobs,
+                                       cache=cache,
+                                       incremental=args.incremental,
+                                       recursive=args.recursive,
+                                       report_file=args.report,
+                                       slowest=args.slowest,
+                                       optimize=args.optimize,
+                                       quantize=args.quantize,
+                                       variants=variants,
+                                       timeout=args.timeout,
+                                       retries=args.retries,
+                                       retry_backoff=args.retry_backoff,
+                                       quarantine_after=args.quarantine_after,
+                                       retry_quarantined=args.retry_quarantined,
+                                       material_map=args.material_map,
+                                       progress_interval=args.progress_interval,
+                                       metrics_file=args.metrics_file,
+                                       recycle_after=args.recycle_after,
+                                       max_rss_mb=args.max_rss,
+                                       index=args.index,
+                                       watch=watch,
+                                       budget=budget)
+    else:
+        # Start from the settings the output directory's history predicts to fit the budget
+        # (the history is only recorded by batches; a single file just reads it)
+        if budget:
+            budget = job_budget(budget, export_options)
+            export_options = QualityPlanner(Path(args.output).resolve().parent, budget["max_bytes"],
+                                            budget["max_seconds"]).choose(args.input, export_options)
+            print(f"Budget: starting at {settings_label(export_options)}")
+        # One output per variant (or just the requested output)
+        outputs = variant_outputs(args.output, export_options, variants)
+        cache_keys = []
+        if cache and os.path.isfile(args.input) and Path(args.output).suffix.lower() == '.glb':
+            materials = material_key(args.material, material_rules, args.input)
+            cache_keys = [cache.key(args.input, dict(options, budget=budget) if budget else options, materials)
+                          for _, options in outputs]
+            if all(cache.fetch(key, path) for key, (path, _) in zip(cache_keys, outputs)):
+                print(f"✓ Using cached conversion for {args.input}")
+                if args.optimize:
+                    for path, _ in outputs:
+                        optimize_output(path, args.quantize)
+                if args.index:
+                    record_conversion(args.index, args.input, [path for path, _ in outputs], export_options,
+                                      args.material_map or args.material)
+                sys.exit(0)
+            for path, _ in outputs:
+                cache.release(path)
+        
+        script_args = [args.input, args.output] + export_options_to_args(export_options, args.material,
+                                                                         args.variants, args.material_map,
+                                                                         args.index, budget)
+        exit_code = run_keyshot_conversion(keyshot_path, str(script_path), script_args, args.timeout)
+        
+        if exit_code == 0:
+            for key, (path, _) in zip(cache_keys, outputs):
+                cache.store(key, path)
+            if args.optimize:
+                for path, _ in outputs:
+                    optimize_output(path, args.quantize)
+                if args.index:
+                    refresh_outputs(args.index, [path for path, _ in outputs])
+    
+    # Share repeated components between the batch's GLBs, also after partial failures
+    if args.share_parts or args.part_library:
+        stats = share_parts(args.output, args.part_library)
+        print(f"Shared {stats['parts']} part(s) between {len(stats['rewritten'])} GLB(s), "
+              f"{stats['saved_bytes'] / 1e6:.2f} MB no longer stored twice")
+        for path, error in stats["errors"]:
+            print(f"  ✗ {path}: {error}")
+        if args.index and stats["rewritten"]:
+            refresh_outputs(args.index, stats["rewritten"])
+    
+    # Pack the batch's GLBs into the bundle, also after partial failures
+    if args.bundle:
+        try:
+            written = pack_directory(args.bundle, args.output)
+            with GLBBundle(args.bundle) as bundle:
+                stats = bundle.stats()
+            print(f"Bundled {len(written)} new or changed GLB(s) into {args.bundle} "
+                  f"({stats['parts']} parts, {stats['file_bytes'] / 1e6:.2f} MB)")
+        except (OSError, BundleError) as e:
+            print(f"ERROR: Could not update bundle {args.bundle}: {e}")
+            exit_code = 1
     
     if exit_code == 0:
         print()
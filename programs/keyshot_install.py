@@ -0,0 +1,174 @@
+"""
+KeyShot installation discovery
+Finds the KeyShot executable and its version, remembering the result in a small on-disk
+cache so repeated wrapper invocations do not probe every install location again.
+
+Lookup order:
+    1. keyshot / keyshot.exe on PATH
+    2. The previously discovered executable, if its mtime is unchanged
+    3. The common install locations, probed in parallel
+
+Versions are cached per executable and invalidated when the executable's mtime changes;
+a probe that fails or times out is not cached.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PATH_NAMES = ['keyshot', 'keyshot.exe']
+
+COMMON_PATHS = [
+    '/usr/local/bin/keyshot',
+    'C:\\Program Files\\KeyShot\\bin\\keyshot.exe',
+    'C:\\Program Files\\KeyShot11\\bin\\keyshot.exe',
+    'C:\\Program Files\\KeyShot10\\bin\\keyshot.exe',
+    'C:\\Program Files\\KeyShot 2024\\bin\\keyshot.exe',
+    '/Applications/KeyShot.app/Contents/MacOS/KeyShot',
+    '/Applications/KeyShot11.app/Contents/MacOS/KeyShot',
+]
+
+VERSION_TIMEOUT = 5
+
+
+def default_cache_file():
+    """Return the path of the discovery cache file for this user"""
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        base = Path(os.environ['LOCALAPPDATA'])
+    else:
+        base = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    return base / 'keyshot_convert' / 'keyshot_install.json'
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file, cache):
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp, cache_file)
+    except OSError:
+        pass  # the cache is only an optimisation
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def probe_version(keyshot_path):
+    """
+    Run `keyshot -version`
+
+    Args:
+        keyshot_path: Path to KeyShot executable
+
+    Returns:
+        str: First line of the output, or None if KeyShot did not answer
+    """
+    try:
+        result = subprocess.run([keyshot_path, '-version'],
+                              capture_output=True,
+                              text=True,
+                              timeout=VERSION_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    lines = result.stdout.strip().splitlines()
+    return lines[0].strip() if lines else ""
+
+
+def get_keyshot_version(keyshot_path, cache_file=None):
+    """
+    Return the KeyShot version, using the cache while the executable is unchanged
+
+    Args:
+        keyshot_path: Path to KeyShot executable
+        cache_file: Discovery cache (default: default_cache_file())
+
+    Returns:
+        str: Version string, or "unknown"
+    """
+    cache_file = Path(cache_file) if cache_file else default_cache_file()
+    resolved = shutil.which(keyshot_path) or keyshot_path
+    resolved = os.path.abspath(resolved)
+    mtime = _mtime(resolved)
+
+    cache = _load_cache(cache_file)
+    entry = cache.get("executables", {}).get(resolved)
+    # "unknown" was cached for failed probes by earlier versions; probe those again
+    if entry and mtime is not None and entry.get("mtime") == mtime and entry.get("version") not in (None, "unknown"):
+        return entry["version"]
+
+    version = probe_version(resolved)
+    # Only cache a version KeyShot reported: a slow or failed probe must not hide a later
+    # version change from the conversion cache key
+    if version and mtime is not None:
+        cache.setdefault("executables", {})[resolved] = {"mtime": mtime, "version": version}
+        _save_cache(cache_file, cache)
+    return version or "unknown"
+
+
+def find_keyshot(refresh=False, cache_file=None):
+    """
+    Try to find KeyShot executable
+
+    Args:
+        refresh: Ignore the cached location and probe again
+        cache_file: Discovery cache (default: default_cache_file())
+
+    Returns:
+        str: Path to KeyShot, or None if it could not be found
+    """
+    cache_file = Path(cache_file) if cache_file else default_cache_file()
+
+    # 1. PATH lookup only stats a few files
+    for name in PATH_NAMES:
+        found = shutil.which(name)
+        if found:
+            return found
+
+    # 2. Last known location, if the executable has not changed
+    cache = {} if refresh else _load_cache(cache_file)
+    cached = cache.get("keyshot")
+    if cached:
+        entry = cache.get("executables", {}).get(cached, {})
+        if entry.get("mtime") is not None and entry.get("mtime") == _mtime(cached):
+            return cached
+
+    # 3. Probe the common install locations at the same time
+    candidates = [path for path in COMMON_PATHS if os.path.exists(path)]
+    if not candidates:
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+        versions = list(pool.map(probe_version, candidates))
+
+    # Prefer the first location (in priority order) that answered, else the first that exists
+    answered = [path for path, version in zip(candidates, versions) if version is not None]
+    found = answered[0] if answered else candidates[0]
+
+    cache = _load_cache(cache_file)
+    cache["keyshot"] = found
+    executables = cache.setdefault("executables", {})
+    for path, version in zip(candidates, versions):
+        mtime = _mtime(path)
+        if mtime is not None:
+            executables[path] = {"mtime": mtime, "version": version or "unknown"}
+    _save_cache(cache_file, cache)
+
+    return found
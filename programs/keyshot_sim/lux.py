@@ -0,0 +1,157 @@
+"""
+Simulated KeyShot `lux` scripting module
+A stand-in for the parts of the lux API used by creo_to_gltf_keyshot.py, so the conversion
+pipeline can be run and benchmarked on a machine without KeyShot or a Pro license.
+
+Behaviour is configured with environment variables:
+    LUX_SIM_IMPORT_SECONDS          Import latency (default: 0)
+    LUX_SIM_IMPORT_SECONDS_PER_MB   Extra import latency per MB of input (default: 0)
+    LUX_SIM_EXPORT_SECONDS          Export latency (default: 0)
+    LUX_SIM_IMPORT_FAILURE_RATE     Fraction of inputs that fail to import, 0-1 (default: 0)
+    LUX_SIM_EXPORT_FAILURE_RATE     Fraction of exports that fail, 0-1 (default: 0)
+    LUX_SIM_OUTPUT_BYTES            Approximate size of each exported GLB at 150 dpi (default: 4096);
+                                    scales with the square of the export's dpi
+    LUX_SIM_SEED                    Seed for the failure draws (default: 0)
+    LUX_SIM_MATERIAL_API            Material calls this "version" supports
+                                    (default: scene_tree,mapping,direct)
+    LUX_SIM_IMPORT_MEMORY_MB        Memory each import adds to the scene until newScene() (default: 0)
+    LUX_SIM_LEAK_MB                 Memory each import leaks for the life of the process (default: 0)
+
+Failures are drawn per input path, so the same file fails the same way on every run.
+Inputs whose name contains "corrupt" always fail to import; inputs whose name contains
+"hang" never finish importing (for testing --timeout).
+"""
+
+import json
+import os
+import random
+import struct
+import time
+
+EXPORT_BAKING = 1
+EXPORT_OUTPUT_TEXTURES = 2
+EXPORT_GLTF = 3
+
+_scene = {"objects": [], "materials": {}, "imports": [], "memory": []}
+_leaked = []
+
+
+def _setting(name, default):
+    return type(default)(os.environ.get(f"LUX_SIM_{name}", default))
+
+
+def _require(api):
+    supported = _setting('MATERIAL_API', "scene_tree,mapping,direct").split(',')
+    if api not in supported:
+        raise AttributeError(f"Simulated KeyShot version has no {api} material API")
+
+
+def _draw(path, purpose):
+    """Deterministic random number in [0, 1) for a path and purpose"""
+    return random.Random(f"{_setting('SEED', 0)}:{purpose}:{path}").random()
+
+
+def build_glb(size_bytes=0, mesh_name="Part", material_name="Default"):
+    """
+    Build a small valid GLB containing one triangle, padded to roughly size_bytes
+
+    Args:
+        size_bytes: Target file size; the binary buffer is padded to reach it
+        mesh_name: Name of the mesh and node
+        material_name: Name of the glTF material
+
+    Returns:
+        bytes: GLB file contents
+    """
+    positions = struct.pack('<9f', 0, 0, 0, 1, 0, 0, 0, 1, 0)
+    padding = max(0, size_bytes - 512)
+    padding += (4 - padding % 4) % 4
+    binary = positions + bytes(padding)
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "lux simulator"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "name": mesh_name}],
+        "meshes": [{"name": mesh_name, "primitives": [{"attributes": {"POSITION": 0}, "material": 0}]}],
+        "materials": [{"name": material_name, "pbrMetallicRoughness": {"metallicFactor": 0.5}}],
+        "accessors": [{"bufferView": 0, "componentType": 5126, "count": 3, "type": "VEC3",
+                       "min": [0, 0, 0], "max": [1, 1, 0]}],
+        "bufferViews": [{"buffer": 0, "byteOffset": 0, "byteLength": len(positions)}],
+        "buffers": [{"byteLength": len(binary)}],
+    }
+
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * ((4 - len(json_chunk) % 4) % 4)
+
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return (struct.pack('<4sII', b'glTF', 2, total)
+            + struct.pack('<I4s', len(json_chunk), b'JSON') + json_chunk
+            + struct.pack('<I4s', len(binary), b'BIN\0') + binary)
+
+
+class _SceneTree:
+    def setMaterial(self, material_name, link=False):
+        _require("scene_tree")
+        for obj in _scene["objects"]:
+            _scene["materials"][obj] = material_name
+
+
+def getImportOptions():
+    return {}
+
+
+def newScene():
+    _scene["objects"] = []
+    _scene["materials"] = {}
+    _scene["imports"] = []
+    _scene["memory"] = []
+
+
+def importFile(path, opts=None):
+    size = os.path.getsize(path)
+    time.sleep(_setting('IMPORT_SECONDS', 0.0) + _setting('IMPORT_SECONDS_PER_MB', 0.0) * size / 1e6)
+    while "hang" in os.path.basename(path):
+        time.sleep(60)
+
+    if "corrupt" in os.path.basename(path) or _draw(path, "import") < _setting('IMPORT_FAILURE_RATE', 0.0):
+        raise RuntimeError(f"Simulated import failure: {path}")
+
+    name = os.path.basename(path).split('.')[0]
+    _scene["imports"].append(path)
+    _scene["objects"].append(name)
+    # Filled (not zeroed) so the pages count towards the process's resident memory
+    _scene["memory"].append(b"\1" * int(_setting('IMPORT_MEMORY_MB', 0.0) * 1e6))
+    _leaked.append(b"\1" * int(_setting('LEAK_MB', 0.0) * 1e6))
+
+
+def getSceneTree():
+    return _SceneTree()
+
+
+def getObjects():
+    return list(_scene["objects"])
+
+
+def applyMaterialMapping(mapping, link=False):
+    _require("mapping")
+    _scene["materials"].update(mapping)
+
+
+def setObjectMaterial(material_name, obj, link=False):
+    _require("direct")
+    _scene["materials"][obj] = material_name
+
+
+def exportFile(path, format=None, mode=None):
+    time.sleep(_setting('EXPORT_SECONDS', 0.0))
+
+    source = _scene["imports"][-1] if _scene["imports"] else path
+    if _draw(source, "export") < _setting('EXPORT_FAILURE_RATE', 0.0):
+        raise RuntimeError(f"Simulated export failure: {path}")
+
+    name = _scene["objects"][-1] if _scene["objects"] else "Part"
+    with open(path, 'wb') as f:
+        # Baked textures grow with the square of the resolution
+        scale = ((mode or {}).get("dpi", 150) / 150) ** 2
+        f.write(build_glb(int(_setting('OUTPUT_BYTES', 4096) * scale), name, _scene["materials"].get(name, "Default")))
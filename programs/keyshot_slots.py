@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Host-wide KeyShot slot limiter
+Limits how many KeyShot processes all wrapper invocations on one machine (cron jobs,
+users, the conversion service) run at the same time, so the machine does not thrash and
+license seats do not run out.
+
+The limit is stored in a shared directory together with one lock file per slot. A
+process holds a slot by holding an OS file lock (flock, or msvcrt on Windows), so slots
+of crashed processes are freed automatically. Processes waiting for a slot take a
+numbered ticket and are served in FIFO order.
+
+Usage:
+  python keyshot_slots.py --set 4      # allow 4 concurrent KeyShot processes on this host
+  python keyshot_slots.py              # show the slot holders and the waiting queue
+  python keyshot_slots.py --set 0      # remove the limit
+
+Without a limit every KeyShot process starts immediately, as before.
+"""
+
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _try_lock(f):
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(f):
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+CONFIG_NAME = "slots.json"
+POLL_SECONDS = 0.5
+
+
+class SlotTimeout(TimeoutError):
+    """No slot became free within the wait timeout"""
+
+
+def default_slot_dir():
+    """Return the slot directory shared by all users of this machine"""
+    if os.environ.get('KEYSHOT_SLOT_DIR'):
+        return Path(os.environ['KEYSHOT_SLOT_DIR'])
+    if os.name == 'nt' and os.environ.get('PROGRAMDATA'):
+        return Path(os.environ['PROGRAMDATA']) / 'keyshot_convert' / 'slots'
+    return Path(tempfile.gettempdir()) / 'keyshot_convert_slots'
+
+
+def _open_shared(path):
+    # Lock files are opened by every user of the machine
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        os.chmod(path, 0o666)
+    except OSError:
+        pass
+    return os.fdopen(fd, 'r+b')
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    try:
+        os.chmod(temp, 0o666)
+    except OSError:
+        pass
+    os.replace(temp, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class Slot:
+    """A held KeyShot slot; release it when the KeyShot process has exited"""
+
+    def __init__(self, index, lock_file, info_path):
+        self.index = index
+        self._lock_file = lock_file
+        self._info_path = info_path
+
+    def release(self):
+        """Give the slot back"""
+        if self._lock_file is None:
+            return
+        _remove(self._info_path)
+        try:
+            _unlock(self._lock_file)
+        except OSError:
+            pass
+        self._lock_file.close()
+        self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class SlotLimiter:
+    """Host-wide limit on concurrent KeyShot processes"""
+
+    def __init__(self, slot_dir=None, timeout=None):
+        """
+        Args:
+            slot_dir: Shared directory (default: default_slot_dir())
+            timeout: Default seconds to wait for a slot, None to wait indefinitely
+        """
+        self.slot_dir = Path(slot_dir) if slot_dir else default_slot_dir()
+        self.timeout = timeout
+
+    def _prepare(self):
+        if not self.slot_dir.exists():
+            (self.slot_dir / 'waiting').mkdir(parents=True, exist_ok=True)
+            for path in (self.slot_dir, self.slot_dir / 'waiting'):
+                try:
+                    os.chmod(path, 0o1777)
+                except OSError:
+                    pass
+        (self.slot_dir / 'waiting').mkdir(exist_ok=True)
+
+    def limit(self):
+        """Return the configured number of slots (0 = unlimited)"""
+        config = _read_json(self.slot_dir / CONFIG_NAME) or {}
+        return int(config.get("slots") or 0)
+
+    def set_limit(self, slots):
+        """
+        Set the number of slots for every invocation on this host
+
+        Args:
+            slots: Maximum concurrent KeyShot processes, 0 to remove the limit
+        """
+        self._prepare()
+        _write_json(self.slot_dir / CONFIG_NAME, {"slots": slots})
+
+    def _holder(self, purpose):
+        return {
+            "pid": os.getpid(),
+            "user": getpass.getuser(),
+            "host": socket.gethostname(),
+            "purpose": purpose,
+            "command": " ".join(sys.argv),
+            "since": time.time(),
+        }
+
+    @contextlib.contextmanager
+    def _queue_lock(self):
+        # Serialises handing out tickets and removing dead ones
+        with _open_shared(self.slot_dir / 'queue.lock') as counter:
+            while not _try_lock(counter):
+                time.sleep(0.05)
+            try:
+                yield counter
+            finally:
+                _unlock(counter)
+
+    def _take_ticket(self, holder):
+        """
+        Take the next ticket and lock its file before any other process can see it unlocked
+
+        Returns:
+            tuple: (ticket number, ticket lock path, open and locked ticket file)
+        """
+        with self._queue_lock() as counter:
+            counter.seek(1)
+            ticket = int(counter.read().strip() or 0) + 1
+            counter.seek(1)
+            counter.truncate()
+            counter.write(str(ticket).encode('ascii'))
+            counter.flush()
+            ticket_path = self.slot_dir / 'waiting' / f"{ticket:012d}.lock"
+            ticket_file = _open_shared(ticket_path)
+            _try_lock(ticket_file)
+        _write_json(ticket_path.with_suffix('.json'), holder)
+        return ticket, ticket_path, ticket_file
+
+    def _is_dead(self, lock_path):
+        # A ticket whose lock is free belongs to a process that died
+        try:
+            with _open_shared(lock_path) as f:
+                if _try_lock(f):
+                    _unlock(f)
+                    return True
+        except OSError:
+            pass
+        return False
+
+    def _waiters(self):
+        # Live waiting tickets in order; tickets of processes that died are removed
+        tickets = sorted((self.slot_dir / 'waiting').glob('*.lock'))
+        dead = [lock_path for lock_path in tickets if self._is_dead(lock_path)]
+        if dead:
+            # Check again under the queue lock: a ticket that was just handed out is locked
+            # by then, so it is never mistaken for a dead one
+            with self._queue_lock():
+                for lock_path in dead:
+                    if self._is_dead(lock_path):
+                        _remove(lock_path)
+                        _remove(lock_path.with_suffix('.json'))
+        return [(int(lock_path.stem), lock_path) for lock_path in tickets if lock_path.exists()]
+
+    def _try_slots(self, limit, holder):
+        for index in range(limit):
+            lock_path = self.slot_dir / f"slot-{index}.lock"
+            lock_file = _open_shared(lock_path)
+            if _try_lock(lock_file):
+                info_path = lock_path.with_suffix('.json')
+                _write_json(info_path, dict(holder, since=time.time()))
+                return Slot(index, lock_file, info_path)
+            lock_file.close()
+        return None
+
+    def acquire(self, timeout=None, purpose="KeyShot"):
+        """
+        Wait in line for a free slot
+
+        Args:
+            timeout: Seconds to wait (default: the limiter's timeout)
+            purpose: What the slot is for, shown by the status listing
+
+        Returns:
+            Slot: The held slot, or None when no limit is configured
+
+        Raises:
+            SlotTimeout: If no slot became free in time
+        """
+        limit = self.limit()
+        if not limit:
+            return None
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        self._prepare()
+        holder = self._holder(purpose)
+        ticket, ticket_path, ticket_file = self._take_ticket(holder)
+        try:
+            while True:
+                ahead = [t for t, _ in self._waiters() if t < ticket]
+                if not ahead and limit:
+                    slot = self._try_slots(limit, holder)
+                    if slot:
+                        return slot
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise SlotTimeout(f"No KeyShot slot became free within {timeout:g}s "
+                                      f"(limit {limit}, see keyshot_slots.py)")
+                time.sleep(POLL_SECONDS)
+                limit = self.limit()
+                if not limit:
+                    return None
+        finally:
+            _remove(ticket_path.with_suffix('.json'))
+            try:
+                _unlock(ticket_file)
+            except OSError:
+                pass
+            ticket_file.close()
+            _remove(ticket_path)
+
+    def status(self):
+        """
+        Describe the slots and the waiting queue
+
+        Returns:
+            dict: {"limit", "slots": [{"slot", "holder"}], "waiting": [holder, ...]}
+        """
+        limit = self.limit()
+        slots = []
+        for index in range(limit):
+            lock_path = self.slot_dir / f"slot-{index}.lock"
+            holder = None
+            if lock_path.exists():
+                with _open_shared(lock_path) as f:
+                    if _try_lock(f):
+                        _unlock(f)
+                    else:
+                        holder = _read_json(lock_path.with_suffix('.json')) or {}
+            slots.append({"slot": index, "holder": holder})
+        waiting = []
+        if (self.slot_dir / 'waiting').exists():
+            for ticket, lock_path in self._waiters():
+                waiting.append(dict(_read_json(lock_path.with_suffix('.json')) or {}, ticket=ticket))
+        return {"limit": limit, "slots": slots, "waiting": waiting}
+
+
+_limiter = None
+
+
+def get_limiter():
+    """Return the limiter used by this process (see configure())"""
+    global _limiter
+    if _limiter is None:
+        _limiter = SlotLimiter()
+    return _limiter
+
+
+def configure(slot_dir=None, timeout=None):
+    """
+    Set the slot directory and wait timeout for every KeyShot started by this process
+
+    Args:
+        slot_dir: Shared directory (default: default_slot_dir())
+        timeout: Seconds to wait for a slot, None to wait indefinitely
+    """
+    global _limiter
+    _limiter = SlotLimiter(slot_dir, timeout)
+
+
+def _describe_holder(holder):
+    age = time.time() - holder.get("since", time.time())
+    return (f"pid {holder.get('pid')} {holder.get('user')}@{holder.get('host')}, "
+            f"{holder.get('purpose')}, {age / 60:.0f} min: {holder.get('command')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show or set the host-wide limit on concurrent KeyShot processes',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1]
+    )
+    parser.add_argument('--set', type=int, metavar='N',
+                       help='Allow N concurrent KeyShot processes on this host (0 = unlimited)')
+    parser.add_argument('--slot-dir',
+                       help=f'Shared slot directory (default: {default_slot_dir()})')
+    parser.add_argument('--json', action='store_true',
+                       help='Print the status as JSON')
+    args = parser.parse_args()
+
+    limiter = SlotLimiter(args.slot_dir)
+    if args.set is not None:
+        if args.set < 0:
+            print("ERROR: --set cannot be negative")
+            sys.exit(1)
+        limiter.set_limit(args.set)
+
+    status = limiter.status()
+    if args.json:
+        print(json.dumps(status, indent=2))
+        return
+
+    if not status["limit"]:
+        print(f"No KeyShot slot limit on this host ({limiter.slot_dir})")
+        return
+    busy = sum(1 for s in status["slots"] if s["holder"] is not None)
+    print(f"KeyShot slots: {busy}/{status['limit']} in use ({limiter.slot_dir})")
+    for s in status["slots"]:
+        print(f"  slot {s['slot']}: " + (_describe_holder(s["holder"]) if s["holder"] is not None else "free"))
+    if status["waiting"]:
+        print(f"Waiting ({len(status['waiting'])}, first in line first):")
+        for holder in status["waiting"]:
+            print(f"  #{holder['ticket']}: {_describe_holder(holder)}")
+
+
+if __name__ == '__main__':
+    main()
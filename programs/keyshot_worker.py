@@ -0,0 +1,352 @@
+"""
+Persistent KeyShot worker client
+Keeps one headless KeyShot session running creo_to_gltf_keyshot.py --worker and sends it
+conversion jobs over stdin, so KeyShot startup and license checkout are paid once per worker
+instead of once per file.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from keyshot_slots import SlotTimeout, get_limiter
+
+# Must match EVENT_PREFIX in creo_to_gltf_keyshot.py
+EVENT_PREFIX = "@@keyshot "
+# With a host slot limit, an idle worker stops KeyShot after this long so others can use the slot
+IDLE_RELEASE_SECONDS = 30
+
+
+def parse_event(line):
+    """
+    Parse a machine-readable event line written by the KeyShot script
+
+    Args:
+        line: One line of KeyShot output
+
+    Returns:
+        dict: The event, or None if the line is ordinary log output
+    """
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+
+
+def process_rss(pid):
+    """
+    Return the resident memory of a running process
+
+    Args:
+        pid: Process id
+
+    Returns:
+        int: Resident set size in bytes, or None if it cannot be read
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open(f"/proc/{pid}/status", encoding='ascii', errors='replace') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                    "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                    "PagefileUsage", "PeakPagefileUsage")]
+
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        psapi = ctypes.WinDLL('psapi', use_last_error=True)
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            if not psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return None
+            return counters.WorkingSetSize
+        finally:
+            kernel32.CloseHandle(handle)
+
+    # macOS and other Unix systems
+    try:
+        output = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True,
+                                text=True, timeout=10).stdout
+        return int(output.strip()) * 1024
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+class KeyShotWorker:
+    """
+    A long-lived KeyShot process that converts one job at a time
+
+    The process is started lazily on the first job and restarted automatically
+    if it exits (for example after a KeyShot crash). While the process runs it holds
+    one of the host's KeyShot slots (see keyshot_slots.py). To keep long sessions from
+    growing without bound, KeyShot can be restarted after a number of files or when
+    its resident memory exceeds a limit; the next job then starts a fresh session.
+    """
+
+    def __init__(self, keyshot_path, script_path, recycle_after=None, max_rss_mb=None):
+        """
+        Args:
+            keyshot_path: Path to KeyShot executable
+            script_path: Path to the KeyShot Python script
+            recycle_after: Restart KeyShot after this many files (None = never)
+            max_rss_mb: Restart KeyShot after a file once its resident memory exceeds
+                        this many MB (None = never)
+        """
+        self.keyshot_path = keyshot_path
+        self.script_path = str(script_path)
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.process = None
+        self.slot = None
+        self.jobs_sent = 0
+        self.session_jobs = 0
+
+    def start(self):
+        """
+        Start the KeyShot worker process, waiting for a free host slot first
+
+        Raises:
+            SlotTimeout: If no slot became free within the configured slot timeout
+        """
+        if self.slot is None:
+            self.slot = get_limiter().acquire(purpose="KeyShot worker")
+        cmd = [self.keyshot_path, '-script', self.script_path, '--worker']
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors='replace',
+                bufsize=1
+            )
+        except OSError:
+            self._release_slot()
+            raise
+        self.session_jobs = 0
+
+    def take(self, jobs):
+        """
+        Wait for the next item of a job queue
+
+        The host slot is only taken once a job arrives and KeyShot starts; when the queue
+        stays empty for IDLE_RELEASE_SECONDS, KeyShot is stopped and its slot given back.
+
+        Args:
+            jobs: queue.Queue (or PriorityQueue) the worker takes its jobs from
+
+        Returns:
+            The queue item
+        """
+        if self.slot is None:
+            return jobs.get()
+        try:
+            return jobs.get(timeout=IDLE_RELEASE_SECONDS)
+        except queue.Empty:
+            self.close()
+            return jobs.get()
+
+    def _release_slot(self):
+        if self.slot:
+            self.slot.release()
+            self.slot = None
+
+    def is_alive(self):
+        """Return True if the KeyShot process is running"""
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self):
+        """Kill the KeyShot process (e.g. when a file exceeds its time budget)"""
+        if self.is_alive():
+            self.process.kill()
+
+    def convert(self, input_file, output_file, material_name=None, export_options=None, variants=None,
+                timeout=None, material_map=None, on_event=None, index=None, budget=None):
+        """
+        Convert one file in the running KeyShot session
+
+        Args:
+            input_file: Creo file to convert
+            output_file: Output .glb file
+            material_name: Optional material name to apply to all geometry
+            export_options: Dictionary of export options
+            variants: Optional list of export variants (one import, several exports)
+            timeout: Optional wall-clock limit in seconds; KeyShot is killed when it is
+                     exceeded and restarted for the next job
+            material_map: Optional material mapping file (see material_rules.py)
+            on_event: Optional callback called with every event (started, stage, finished,
+                      failed, ...) as soon as KeyShot prints it
+            index: Optional SQLite GLB index (see glb_index.py) KeyShot adds the outputs to
+            budget: Optional {"max_bytes", "max_seconds", "allow_draco"} (see quality_budget.job_budget())
+
+        Returns:
+            tuple: (result dict, list of log lines printed while converting)
+
+        The result includes "stages" (seconds per stage), "output_bytes" and "quality"
+        (the settings the output ended up with) when the KeyShot script reported them, "rss_mb" when a memory limit is set and
+        "recycled" (the reason) when KeyShot was restarted after this job.
+        """
+        if not self.is_alive():
+            try:
+                self.start()
+            except SlotTimeout as e:
+                return {
+                    "input": str(input_file),
+                    "output": str(output_file),
+                    "ok": False,
+                    "error": str(e),
+                    "seconds": 0.0,
+                    "stages": {},
+                    "output_bytes": None,
+                }, []
+
+        self.jobs_sent += 1
+        job = {
+            "id": self.jobs_sent,
+            "input": str(input_file),
+            "output": str(output_file),
+            "material": material_name,
+            "export_options": export_options or {},
+        }
+        if variants:
+            job["variants"] = variants
+        if material_map:
+            job["material_map"] = str(material_map)
+        if index:
+            job["index"] = str(index)
+        if budget:
+            job["budget"] = budget
+
+        started = time.monotonic()
+        lines = []
+        stage_event = {}
+        failed_event = {}
+        timer = None
+        answer = None
+        if timeout:
+            timer = threading.Timer(timeout, self.kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+
+            for line in self.process.stdout:
+                line = line.rstrip("\n")
+                event = parse_event(line)
+                if event is None:
+                    lines.append(line)
+                    continue
+                if on_event:
+                    on_event(event)
+                if event.get("event") == "stages":
+                    stage_event = event
+                elif event.get("event") == "failed":
+                    failed_event = event
+                elif event.get("event") == "result" and event.get("id") == job["id"]:
+                    if not event.get("ok") and not event.get("error"):
+                        event["error"] = failed_event.get("error")
+                    event["stages"] = stage_event.get("stages", {})
+                    event["output_bytes"] = stage_event.get("output_bytes")
+                    event["outputs"] = stage_event.get("outputs", [])
+                    event["quality"] = stage_event.get("quality")
+                    answer = event
+                    break
+        except OSError as e:
+            lines.append(f"Error talking to KeyShot: {e}")
+        finally:
+            if timer:
+                timer.cancel()
+
+        if answer is not None:
+            self._after_job(answer, lines)
+            return answer, lines
+
+        # The process went away before answering
+        returncode = self.process.wait()
+        self.process = None
+        self._release_slot()
+        seconds = time.monotonic() - started
+        timed_out = bool(timeout) and seconds >= timeout
+        if timed_out:
+            error = f"Timed out after {timeout:g}s"
+        else:
+            error = f"KeyShot worker exited with code {returncode}"
+        return {
+            "id": job["id"],
+            "input": job["input"],
+            "output": job["output"],
+            "ok": False,
+            "error": error,
+            "timed_out": timed_out,
+            "seconds": round(seconds, 3),
+            "stages": stage_event.get("stages", {}),
+            "output_bytes": None,
+        }, lines
+
+    def _after_job(self, result, lines):
+        # Restart KeyShot before the next job once it has converted enough files or grown too large
+        self.session_jobs += 1
+        rss = process_rss(self.process.pid) if self.max_rss_mb else None
+        if rss is not None:
+            result["rss_mb"] = round(rss / (1024 * 1024), 1)
+        reason = None
+        if self.recycle_after and self.session_jobs >= self.recycle_after:
+            reason = f"after {self.session_jobs} files"
+        elif rss is not None and rss > self.max_rss_mb * 1024 * 1024:
+            reason = f"at {result['rss_mb']:.0f} MB resident memory (limit {self.max_rss_mb:g} MB)"
+        if reason:
+            lines.append(f"Restarting KeyShot {reason}")
+            result["recycled"] = reason
+            # Keep the host slot so the fresh session does not queue behind other invocations
+            self.close(release_slot=False)
+
+    def close(self, release_slot=True):
+        """
+        Ask the worker to finish and wait for KeyShot to exit
+
+        Args:
+            release_slot: Give back the host slot (False when KeyShot is restarted right away)
+        """
+        if self.process is None:
+            if release_slot:
+                self._release_slot()
+            return
+        try:
+            self.process.stdin.close()
+            # Drain anything KeyShot prints on shutdown so it cannot block on a full pipe
+            self.process.stdout.read()
+        except OSError:
+            pass
+        self.process.wait()
+        self.process = None
+        if release_slot:
+            self._release_slot()
@@ -0,0 +1,128 @@
+"""
+Rule-based material mapping
+Assigns KeyShot materials to parts by name, e.g. stainless fasteners and a powder-coated
+frame in the same assembly, from a JSON file passed with --material-map:
+
+    {
+      "rules": [
+        {"match": "*bolt*", "material": "Stainless Steel Brushed Fine 90°"},
+        {"match": "frame_*", "material": "Powder Coat Black"},
+        {"match": "handle.prt", "material": "Rubber Black"}
+      ],
+      "default": "Aluminum Brushed"
+    }
+
+`match` is a glob or an exact part name, compared case-insensitively with the object
+name with and without its Creo extension; an exact name such as "handle.prt" also
+matches the object "handle". The first matching rule wins; parts no rule matches get
+"default" (or the --material name), or keep their material if neither is set.
+
+Used by both the wrapper and the KeyShot script, so it must only depend on the standard library.
+"""
+
+import fnmatch
+import json
+import re
+
+from creo_files import model_stem, parse_creo_name
+
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+class MaterialRules:
+    """Ordered part-name rules, with a memo of names already resolved"""
+
+    def __init__(self, rules, default=None):
+        """
+        Args:
+            rules: List of (pattern, material name) pairs, first match wins
+            default: Material for parts no rule matches, or None to leave them unchanged
+        """
+        self.rules = list(rules)
+        self.default = default
+        self._patterns = [({pattern.lower()} if GLOB_CHARS.search(pattern) else self._alternatives(pattern), material)
+                          for pattern, material in self.rules]
+        self._resolved = {}
+
+    @staticmethod
+    def _alternatives(name):
+        # "Bracket.prt.3" also matches as "bracket.prt" and "bracket"
+        name = name.lower()
+        parsed = parse_creo_name(name)
+        return {name, parsed[0], model_stem(name)} if parsed else {name}
+
+    def with_default(self, default):
+        """Return these rules with a different fallback material (e.g. from --material)"""
+        return MaterialRules(self.rules, default or self.default)
+
+    def resolve(self, name):
+        """
+        Return the material for one part name
+
+        Args:
+            name: Object name as reported by KeyShot
+
+        Returns:
+            str: Material name, or None to leave the part unchanged
+        """
+        if name not in self._resolved:
+            candidates = self._alternatives(name)
+            material = self.default
+            for patterns, rule_material in self._patterns:
+                if any(fnmatch.fnmatchcase(candidate, pattern)
+                       for candidate in candidates for pattern in patterns):
+                    material = rule_material
+                    break
+            self._resolved[name] = material
+        return self._resolved[name]
+
+    def describe(self):
+        """Return a JSON-serialisable form, used in cache keys and the batch manifest"""
+        return {"rules": [list(rule) for rule in self.rules], "default": self.default}
+
+
+def load_material_rules(path):
+    """
+    Read a material mapping file
+
+    Args:
+        path: JSON file with "rules" and an optional "default"
+
+    Returns:
+        MaterialRules: The parsed rules
+
+    Raises:
+        ValueError: If the file is not a valid mapping
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+        raise ValueError(f"{path}: expected an object with a \"rules\" list")
+    rules = []
+    for n, rule in enumerate(data.get("rules", []), 1):
+        if not isinstance(rule, dict) or not rule.get("match") or not rule.get("material"):
+            raise ValueError(f"{path}: rule {n} needs \"match\" and \"material\"")
+        rules.append((rule["match"], rule["material"]))
+    return MaterialRules(rules, data.get("default"))
+
+
+def material_key(material_name=None, material_rules=None, source=None):
+    """
+    Describe the material settings of a conversion for cache keys and manifests
+
+    Args:
+        material_name: Optional material applied to all geometry (or unmatched parts)
+        material_rules: Optional MaterialRules
+        source: Creo file the key is for; with rules its model name is included, since
+                KeyShot names the top-level object after the file
+
+    Returns:
+        The material name when no rules are used, otherwise a JSON string of the rules
+    """
+    if not material_rules:
+        return material_name
+    description = material_rules.with_default(material_name).describe()
+    if source:
+        description["model"] = model_stem(source).lower()
+    return json.dumps(description, sort_keys=True)
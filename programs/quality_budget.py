@@ -0,0 +1,251 @@
+"""
+Per-file quality budget
+Chooses the baking resolution, sample count and Draco compression for each file so its
+GLB stays under a size budget (--max-size) and its conversion under a time budget
+(--max-seconds), instead of using the same settings for a tiny part and a large assembly.
+
+The wrapper picks the starting settings from the file's own earlier result when there is
+one (scaled by the change in input size), otherwise from its predicted conversion time
+(batch_costs.py) and the output size per input byte seen so far. The requested quality
+(--dpi/--samples, default 150 dpi / 32 samples) is the ceiling; the budget only lowers it.
+When the exported GLB is still over the size budget, the KeyShot script exports again
+with the next cheaper settings from the same import, as long as the time budget allows.
+
+Used by the KeyShot script too, so it must only depend on the standard library.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from creo_files import parse_creo_name
+
+QUALITY_NAME = ".keyshot-quality.json"
+
+# Cheaper settings tried in order, from the script's defaults down
+QUALITY_LEVELS = [
+    {"dpi": 300, "num_samples": 64},
+    {"dpi": 200, "num_samples": 48},
+    {"dpi": 150, "num_samples": 32},
+    {"dpi": 100, "num_samples": 16},
+    {"dpi": 72, "num_samples": 8},
+    {"dpi": 48, "num_samples": 4},
+]
+DEFAULT_QUALITY = {"dpi": 150, "num_samples": 32, "draco_compression": True}
+
+# Below this predicted size Draco is left off: the viewer's decode time outweighs the saving
+DRACO_MIN_BYTES = 256 * 1024
+# Output size with Draco relative to without (geometry only; textures are unaffected)
+DRACO_FACTOR = 0.6
+# Output bytes per input byte before any result is recorded
+DEFAULT_BYTES_PER_INPUT_BYTE = 1.0
+# Aim this far below the budget, since predictions are rough
+MARGIN = 0.9
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(text):
+    """
+    Parse a size such as "5MB", "750KB" or "1048576"
+
+    Returns:
+        int: Bytes
+
+    Raises:
+        ValueError: If the text is not a size
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(text), re.IGNORECASE)
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 5MB or 750KB")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def quality_of(options):
+    """Return the budget-controlled settings of a set of export options"""
+    merged = dict(DEFAULT_QUALITY)
+    merged.update({key: options[key] for key in DEFAULT_QUALITY if key in options})
+    return merged
+
+
+def _work(options):
+    # Relative baking work: texels (dpi squared) times samples per texel
+    return options["dpi"] ** 2 * options["num_samples"]
+
+
+def scale_bytes(output_bytes, old, new):
+    """Estimate the output size with other settings (textures scale with dpi squared)"""
+    scaled = output_bytes * (new["dpi"] / old["dpi"]) ** 2
+    if new["draco_compression"] and not old["draco_compression"]:
+        scaled *= DRACO_FACTOR
+    elif old["draco_compression"] and not new["draco_compression"]:
+        scaled /= DRACO_FACTOR
+    return scaled
+
+
+def scale_seconds(export_seconds, old, new):
+    """Estimate the export (baking) time with other settings"""
+    return export_seconds * _work(new) / _work(old)
+
+
+def cheaper(options, allow_draco=True):
+    """
+    Return the next cheaper settings to try when an export is over the size budget
+
+    Args:
+        options: Settings of the export that was too large
+        allow_draco: False if the user turned Draco off (--no-compression); it is then
+                     never turned on
+
+    Returns:
+        dict: Settings with Draco turned on first (if allowed), then the next lower
+              quality level; None if there is nothing cheaper
+    """
+    current = quality_of(options)
+    draco = current["draco_compression"] or allow_draco
+    if draco and not current["draco_compression"]:
+        return dict(current, draco_compression=True)
+    for level in QUALITY_LEVELS:
+        if level["dpi"] < current["dpi"]:
+            return dict(level, num_samples=min(level["num_samples"], current["num_samples"]),
+                        draco_compression=draco)
+    return None
+
+
+def job_budget(budget, export_options=None):
+    """
+    Return the budget sent to the KeyShot script for one file
+
+    Args:
+        budget: {"max_bytes", "max_seconds"}
+        export_options: The file's requested export options, before QualityPlanner.choose()
+
+    Returns:
+        dict: The budget plus "allow_draco", so re-exports keep Draco off when the user
+              turned it off
+    """
+    return dict(budget, allow_draco=quality_of(export_options or {})["draco_compression"])
+
+
+def _history_key(creo_file):
+    # Results carry over to the next iteration of the same model
+    creo_file = Path(creo_file)
+    parsed = parse_creo_name(creo_file.name)
+    return str(creo_file.with_name(parsed[0])) if parsed else str(creo_file)
+
+
+class QualityPlanner:
+    """Chooses per-file settings for a budget and learns from the results"""
+
+    def __init__(self, output_dir, max_bytes=None, max_seconds=None, costs=None):
+        """
+        Args:
+            output_dir: Batch output directory (the result history lives here)
+            max_bytes: Size budget per GLB
+            max_seconds: Time budget per conversion
+            costs: Optional CostModel used to predict times of files without history
+        """
+        self.path = Path(output_dir) / QUALITY_NAME
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.costs = costs
+        self.history = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.history = json.load(f)
+        except (OSError, ValueError):
+            self.history = {}
+        self.bytes_per_input_byte = self._size_ratio()
+
+    def _size_ratio(self):
+        # Median output bytes per input byte, normalised to the default settings
+        ratios = sorted(scale_bytes(entry["output_bytes"], entry["options"], DEFAULT_QUALITY) / entry["size"]
+                        for entry in self.history.values() if entry.get("size") and entry.get("output_bytes"))
+        return ratios[len(ratios) // 2] if ratios else DEFAULT_BYTES_PER_INPUT_BYTE
+
+    def _candidates(self, ceiling):
+        yield ceiling
+        for level in QUALITY_LEVELS:
+            if level["dpi"] < ceiling["dpi"]:
+                yield dict(level, num_samples=min(level["num_samples"], ceiling["num_samples"]))
+
+    def choose(self, creo_file, export_options=None):
+        """
+        Choose the settings to start a file with
+
+        Args:
+            creo_file: Creo file path
+            export_options: Requested export options (their quality is the ceiling)
+
+        Returns:
+            dict: export_options with dpi, num_samples and draco_compression chosen
+        """
+        try:
+            size = os.path.getsize(creo_file)
+        except OSError:
+            size = 0
+        entry = self.history.get(_history_key(creo_file))
+        if entry and entry.get("size"):
+            scale = size / entry["size"] if size else 1.0
+            base = entry["options"]
+            base_bytes = entry["output_bytes"] * scale
+            import_seconds = entry["import_seconds"] * scale
+            export_seconds = entry["export_seconds"] * scale
+        else:
+            base = DEFAULT_QUALITY
+            base_bytes = size * self.bytes_per_input_byte
+            # Without a stage split, count the whole predicted time as baking
+            import_seconds = 0.0
+            export_seconds = self.costs.predict(creo_file) if self.costs else 0.0
+
+        ceiling = quality_of(export_options or {})
+        chosen = None
+        for candidate in self._candidates(ceiling):
+            plain_bytes = scale_bytes(base_bytes, base, dict(candidate, draco_compression=False))
+            draco = ceiling["draco_compression"] and plain_bytes >= DRACO_MIN_BYTES
+            candidate = dict(candidate, draco_compression=draco)
+            chosen = candidate
+            fits_size = not self.max_bytes or scale_bytes(base_bytes, base, candidate) <= MARGIN * self.max_bytes
+            fits_time = (not self.max_seconds
+                         or import_seconds + scale_seconds(export_seconds, base, candidate) <= MARGIN * self.max_seconds)
+            if fits_size and fits_time:
+                break
+        return dict(export_options or {}, **chosen)
+
+    def record(self, creo_file, result):
+        """
+        Learn from a finished conversion
+
+        Args:
+            creo_file: Creo file path
+            result: Batch result with "quality", "stages" and "output_bytes"
+        """
+        quality = result.get("quality")
+        if not result.get("ok") or not quality or not result.get("output_bytes"):
+            return
+        try:
+            size = os.path.getsize(creo_file)
+        except OSError:
+            return
+        stages = result.get("stages", {})
+        exports = quality.get("exports") or 1
+        with self._lock:
+            self.history[_history_key(creo_file)] = {
+                "size": size,
+                "options": quality_of(quality["settings"]),
+                "output_bytes": result["output_bytes"],
+                "import_seconds": round(stages.get("import", 0.0) + stages.get("material", 0.0), 3),
+                # Time of one export with the final settings
+                "export_seconds": round(stages.get("export", 0.0) / exports, 3),
+            }
+
+    def save(self):
+        """Write the history atomically"""
+        with self._lock:
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f, indent=2)
+            os.replace(temp, self.path)